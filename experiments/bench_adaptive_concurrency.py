@@ -0,0 +1,51 @@
+# Benchmark: fixed vs adaptive (AIMD) gateway concurrency with several queries running at once.
+# Run from the repository root: python -m experiments.bench_adaptive_concurrency
+# The OData settings (ODATA_ENDPOINT etc.) must be set as for the app; the endpoint is replaced
+# by an in-process mock gateway that serves CAPACITY concurrent requests at full speed and
+# slows down with the square of the overload beyond that.
+import asyncio
+import time
+
+import src.utils.rate_limit as rate_limit
+from experiments.mock_gateway import MockGateway, make_rows
+from src.utils.appconfig import get_config_instance
+from src.utils.call import iter_odata_pages
+from src.utils.odata_client import get_odata_client
+
+
+config = get_config_instance()
+
+ROWS = 20000
+QUERIES = 4
+CAPACITY = 12
+QUERY = "$filter=CreateDate ge '20230101' and CreateDate le '20241231'&$count=true"
+
+async def run(adaptive: bool, gateway: MockGateway) -> float:
+    config.ODATA_ADAPTIVE_CONCURRENCY = adaptive
+    rate_limit.limiters.clear()
+    gateway.max_in_flight = 0
+    start = time.perf_counter()
+    async def pull():
+        return sum([len(page) async for page in iter_odata_pages(config.ODATA_ENDPOINT + QUERY, paging="skip")])
+    counts = await asyncio.gather(*(pull() for _ in range(QUERIES)))
+    assert counts == [ROWS] * QUERIES
+    return time.perf_counter() - start
+
+async def main():
+    config.ODATA_MAX_PAGE_SIZE = 100
+    gateway = MockGateway(make_rows(ROWS), latency=0.1, capacity=CAPACITY)
+    config.ODATA_ENDPOINT = await gateway.start()
+    await get_odata_client().start()
+    print(f"{QUERIES} concurrent queries of {ROWS} rows, gateway capacity {CAPACITY}, "
+          f"initial concurrency {config.ODATA_MAX_CONCURRENCY} per query")
+    try:
+        elapsed = await run(False, gateway)
+        print(f"fixed    : {elapsed:6.2f}s, peak {gateway.max_in_flight} requests in flight")
+        elapsed = await run(True, gateway)
+        print(f"adaptive : {elapsed:6.2f}s, peak {gateway.max_in_flight} requests in flight")
+        print(rate_limit.gateway_stats())
+    finally:
+        await get_odata_client().close()
+        await gateway.stop()
+
+asyncio.run(main())
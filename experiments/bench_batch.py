@@ -0,0 +1,55 @@
+# Benchmark: paged pulls over a high-latency link, one GET per page vs the $batch transport.
+# Run from the repository root: python -m experiments.bench_batch
+# The OData settings (ODATA_ENDPOINT etc.) must be set as for the app; the endpoint is replaced
+# by an in-process mock gateway that adds ROUND_TRIP seconds per HTTP request and LATENCY
+# seconds of processing per page, with 100-row pages. Each setting pulls one query, then
+# QUERIES different queries at once, whose pages can share batches.
+import asyncio
+import time
+
+from experiments.mock_gateway import MockGateway, make_rows
+from src.utils.appconfig import get_config_instance
+from src.utils.batch import batch_transports
+from src.utils.call import fetch_odata
+
+
+config = get_config_instance()
+
+ROWS = 20000
+ROUND_TRIP = 0.1
+LATENCY = 0.005
+QUERIES = 4
+QUERY = "$filter=CreateDate ge '20230101' and CreateDate le '20231231'&$count=true"
+SETTINGS = [
+    ("GET", False, "multipart", 1),
+    ("$batch K=10", True, "multipart", 10),
+    ("$batch K=25", True, "multipart", 25),
+    ("$batch v4 K=25", True, "json", 25),
+]
+
+async def run(queries: list, gateway: MockGateway):
+    gateway.requests = 0
+    start = time.perf_counter()
+    results = await asyncio.gather(*(fetch_odata(query) for query in queries))
+    return time.perf_counter() - start, gateway.requests, sum(len(rows) for rows in results)
+
+async def main():
+    config.RESULT_CACHE_ENABLED = False
+    config.ODATA_METADATA_ENABLED = False
+    config.ODATA_PARTITIONING = "off"
+    config.ODATA_MAX_PAGE_SIZE = 100
+    gateway = MockGateway(make_rows(ROWS), latency=LATENCY, round_trip=ROUND_TRIP)
+    config.ODATA_ENDPOINT = await gateway.start()
+    several = [f"{QUERY}&$orderby={field}" for field in ("ORDER_NO", "SUPPLIER", "MATERIAL", "UNIT_COST")[:QUERIES]]
+    await run([QUERY], gateway)  # warm up
+    print(f"{'transport':>15}  {'queries':>7}  {'time':>7}  {'HTTP requests':>13}  {'rows':>6}")
+    for name, enabled, format, size in SETTINGS:
+        config.ODATA_BATCH, config.ODATA_BATCH_FORMAT, config.ODATA_BATCH_SIZE = enabled, format, size
+        batch_transports.clear()
+        for queries in ([QUERY], several):
+            elapsed, requests, rows = await run(queries, gateway)
+            print(f"{name:>15}  {len(queries):>7}  {elapsed:>6.2f}s  {requests:>13}  {rows:>6}")
+    await gateway.stop()
+
+if __name__ == "__main__":
+    asyncio.run(main())
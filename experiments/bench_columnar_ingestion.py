@@ -0,0 +1,56 @@
+# Benchmark: page ingestion into a DataFrame, list of dicts + pd.DataFrame vs typed Arrow columns.
+# Run from the repository root: python -m experiments.bench_columnar_ingestion
+# Pages are generated ZC_GRN_PO_DET rows serialized as gateway JSON, so decoding is included.
+# Peak heap is measured with tracemalloc, which sees Python objects but not Arrow's own memory
+# pool, so the resulting DataFrame's size (memory_usage(deep=True)) is reported as well.
+import json
+import time
+import tracemalloc
+
+import orjson
+import pandas as pd
+
+from experiments.mock_gateway import make_rows
+from src.utils.columnar import ColumnarBuilder, to_pandas
+
+
+PAGE_SIZE = 1000
+
+def make_pages(count: int) -> list:
+    rows = make_rows(count)
+    return [json.dumps({"value": rows[i:i + PAGE_SIZE]}).encode() for i in range(0, count, PAGE_SIZE)]
+
+def ingest_dicts(pages: list) -> pd.DataFrame:
+    # The previous path: response.json() per page, extended into one list
+    rows = []
+    for body in pages:
+        rows.extend(json.loads(body)["value"])
+    return pd.DataFrame(rows)
+
+def ingest_columnar(pages: list) -> pd.DataFrame:
+    builder = ColumnarBuilder()
+    for body in pages:
+        builder.append(orjson.loads(body)["value"])
+    return to_pandas(builder.table())
+
+def measure(ingest, pages: list):
+    start = time.perf_counter()
+    df = ingest(pages)
+    elapsed = time.perf_counter() - start
+    del df
+    # Separate run for memory, as tracemalloc slows down allocation-heavy code
+    tracemalloc.start()
+    df = ingest(pages)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, df.memory_usage(deep=True).sum()
+
+if __name__ == "__main__":
+    # Warm up pyarrow and pandas so one-time initialization is not timed
+    ingest_columnar(make_pages(PAGE_SIZE))
+    print(f"{'rows':>8}  {'path':>9}  {'time':>7}  {'peak heap':>10}  {'DataFrame':>10}")
+    for count in (100_000, 300_000):
+        pages = make_pages(count)
+        for name, ingest in (("dicts", ingest_dicts), ("columnar", ingest_columnar)):
+            elapsed, peak, size = measure(ingest, pages)
+            print(f"{count:>8}  {name:>9}  {elapsed:>6.2f}s  {peak / 2**20:>8.1f}MB  {size / 2**20:>8.1f}MB")
@@ -0,0 +1,25 @@
+# Micro-benchmark: per-request cost of building the NL -> OData graph vs reusing the shared one.
+# Run from the repository root: python -m experiments.bench_graph_build
+# Uses a locally constructed AzureChatOpenAI client, so no LLM call or token fetch is made.
+import timeit
+from langchain_openai import AzureChatOpenAI
+
+import src.api.routes as routes
+
+
+llm = AzureChatOpenAI(
+    api_version="2023-05-15",
+    api_key="benchmark",
+    azure_deployment="gpt-4o",
+    azure_endpoint="http://localhost",
+)
+routes.get_llm = lambda: llm
+
+runs = 200
+build = timeit.timeit(lambda: routes.build_text2odata_graph(llm), number=runs) / runs
+routes.get_text2odata_graph()
+reuse = timeit.timeit(routes.get_text2odata_graph, number=runs) / runs
+
+print(f"Build per request : {build * 1e6:10.1f} us")
+print(f"Shared graph      : {reuse * 1e6:10.1f} us")
+print(f"Speedup           : {build / reuse:8.0f}x")
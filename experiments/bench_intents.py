@@ -0,0 +1,47 @@
+# Benchmark: count, exists and top-N questions answered by a full pull vs the intent fast paths.
+# Run from the repository root: python -m experiments.bench_intents
+# The OData settings (ODATA_ENDPOINT etc.) must be set as for the app; the endpoint is replaced
+# by an in-process mock gateway with LATENCY seconds per request.
+import asyncio
+import time
+
+from experiments.mock_gateway import MockGateway, make_rows
+from src.utils.appconfig import get_config_instance
+from src.utils.call import fetch_odata
+from src.utils.intents import plan_query
+
+
+config = get_config_instance()
+
+ROWS = 50000
+LATENCY = 0.05
+QUERY = "$filter=CreateDate ge '20230101' and CreateDate le '20231231'&$count=true"
+QUESTIONS = [
+    "how many orders were created in 2023",
+    "are there any orders from 2023",
+    "latest 10 orders in 2023",
+    "top 5 orders of 2023 by cost",
+]
+
+async def run(query: str, gateway: MockGateway):
+    gateway.requests = 0
+    start = time.perf_counter()
+    rows = await fetch_odata(query)
+    return time.perf_counter() - start, gateway.requests, len(rows)
+
+async def main():
+    config.RESULT_CACHE_ENABLED = False
+    config.ODATA_METADATA_ENABLED = False
+    gateway = MockGateway(make_rows(ROWS), latency=LATENCY)
+    config.ODATA_ENDPOINT = await gateway.start()
+    await run(QUERY, gateway)  # warm up
+    print(f"{'question':>40}  {'path':>6}  {'time':>7}  {'requests':>8}  {'rows':>6}")
+    for question in QUESTIONS:
+        plan = plan_query(QUERY, question)
+        for name, query in (("full", QUERY), (plan.intent, plan.query)):
+            elapsed, requests, rows = await run(query, gateway)
+            print(f"{question:>40}  {name:>6}  {elapsed:>6.3f}s  {requests:>8}  {rows:>6}")
+    await gateway.stop()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,51 @@
+# Benchmark: date-partitioned fetch vs plain $skip paging of a large date-ranged query.
+# Run from the repository root: python -m experiments.bench_partitioned_fetch
+# The OData settings (ODATA_ENDPOINT etc.) must be set as for the app; the endpoint is replaced
+# by an in-process mock gateway whose latency grows with the $skip offset.
+import asyncio
+import time
+
+from experiments.mock_gateway import MockGateway, make_rows
+from src.utils.appconfig import get_config_instance
+from src.utils.call import iter_odata_pages, iter_partitioned_pages
+from src.utils.odata_client import get_odata_client
+from src.utils.partitioning import plan_partitioning
+
+
+config = get_config_instance()
+
+ROWS = 200000
+QUERY = "$filter=CreateDate ge '20230101' and CreateDate le '20241231'&$count=true"
+SCENARIOS = [
+    # (latency per request, latency per skipped row)
+    (0.02, 0.0),
+    (0.02, 0.000002),
+    (0.02, 0.00001),
+]
+
+async def timed(pages) -> tuple:
+    start = time.perf_counter()
+    rows = [row async for page in pages for row in page]
+    return time.perf_counter() - start, rows
+
+async def main():
+    rows = make_rows(ROWS)
+    config.ODATA_MAX_PAGE_SIZE = 1000
+    print(f"{ROWS} rows, page size {config.ODATA_MAX_PAGE_SIZE}, {config.ODATA_MAX_CONCURRENCY} concurrent requests, "
+          f"partitions of at most {config.ODATA_PARTITION_MAX_ROWS} rows")
+    print(f"{'latency':>8} {'per offset':>11} {'skip paging':>12} {'partitioned':>12} {'speedup':>8}")
+    for latency, latency_per_offset in SCENARIOS:
+        gateway = MockGateway(rows, latency, latency_per_offset)
+        config.ODATA_ENDPOINT = await gateway.start()
+        await get_odata_client().start()
+        try:
+            skip_time, skip_rows = await timed(iter_odata_pages(config.ODATA_ENDPOINT + QUERY, paging="skip"))
+            partitioned_time, partitioned_rows = await timed(iter_partitioned_pages(*plan_partitioning(QUERY, "CreateDate")))
+            assert skip_rows == partitioned_rows, "partitioned fetch returned different rows"
+        finally:
+            await get_odata_client().close()
+            await gateway.stop()
+        print(f"{latency * 1000:6.0f}ms {latency_per_offset * 1e6:8.1f}us/row {skip_time:11.2f}s {partitioned_time:11.2f}s "
+              f"{skip_time / partitioned_time:7.1f}x")
+
+asyncio.run(main())
@@ -0,0 +1,53 @@
+# Benchmark: fetching a raw-row query with and without the $select projection planner.
+# Run from the repository root: python -m experiments.bench_projection
+# The OData settings (ODATA_ENDPOINT etc.) must be set as for the app; the endpoint is replaced
+# by an in-process mock gateway. WIDTH filler columns are added to every row to mimic a wide
+# CDS view, of which the question only needs a few columns.
+import asyncio
+import time
+
+from experiments.mock_gateway import MockGateway, make_rows
+from src.utils.appconfig import get_config_instance
+from src.utils.call import fetch_odata
+from src.utils.columnar import pages_to_table, to_pandas
+from src.utils.projection import plan_projection
+
+
+config = get_config_instance()
+
+ROWS = 50000
+WIDTH = 30
+QUESTION = "show supplier and cost for 2023"
+QUERY = "$filter=CreateDate ge '20230101' and CreateDate le '20231231'&$count=true"
+
+def make_wide_rows() -> list:
+    rows = make_rows(ROWS)
+    for i, row in enumerate(rows):
+        row.update({f"FIELD_{j:02d}": f"value {i % (j + 7)}" for j in range(WIDTH)})
+    return rows
+
+async def run(query: str, gateway: MockGateway):
+    gateway.bytes_sent = 0
+    start = time.perf_counter()
+    rows = await fetch_odata(query)
+    fetched = time.perf_counter() - start
+    df = to_pandas(pages_to_table([rows]))
+    return fetched, time.perf_counter() - start, gateway.bytes_sent, df.shape[1], df.memory_usage(deep=True).sum()
+
+async def main():
+    config.RESULT_CACHE_ENABLED = False
+    config.ODATA_METADATA_ENABLED = False
+    gateway = MockGateway(make_wide_rows(), latency=0.01)
+    config.ODATA_ENDPOINT = await gateway.start()
+    projected = plan_projection(QUERY, QUESTION)
+    print(f"{ROWS} rows of {len(gateway.rows[0])} columns, question: {QUESTION!r}")
+    print(f"Projected query: {projected}")
+    print(f"{'':>10}  {'fetch':>7}  {'+ frame':>7}  {'bytes':>9}  {'columns':>7}  {'frame':>8}")
+    await run(QUERY, gateway)  # warm up
+    for name, query in (("all", QUERY), ("projected", projected)):
+        fetched, total, sent, columns, size = await run(query, gateway)
+        print(f"{name:>10}  {fetched:>6.2f}s  {total:>6.2f}s  {sent / 2**20:>7.1f}MB  {columns:>7}  {size / 2**20:>6.1f}MB")
+    await gateway.stop()
+
+if __name__ == "__main__":
+    asyncio.run(main())
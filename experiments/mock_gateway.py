@@ -0,0 +1,351 @@
+# Local stand-in for the SAP OData gateway, for benchmarks and manual testing without SAP access.
+# Run from the repository root: python -m experiments.mock_gateway --rows 100000 --port 8765
+# then point the app at it with ODATA_ENDPOINT='http://127.0.0.1:8765/odata/ZC_GRN_PO_DET?'
+#
+# Serves generated ZC_GRN_PO_DET rows, indexed on CreateDate, and evaluates $filter, $select,
+# $orderby, $top, $skip and $count with the app's own OData parser. Page size follows
+# Prefer: odata.maxpagesize. Every response is delayed by latency + skip * latency_per_offset
+# seconds, mimicking a backend that reads and discards the skipped rows, so deep $skip pages
+# get slower. Beyond capacity concurrent requests the delay grows with the square of the
+# overload, so an overloaded backend serves fewer rows per second (work processes thrash), and
+# beyond throttle_above requests are rejected with 429. /odata/$metadata serves the entity's
+# schema with an ETag, and .../$count the number of matching rows.
+#
+# POST /odata/$batch accepts multipart/mixed (OData v2) and JSON (OData v4) batches of GETs.
+# Operations run one after another, as on SAP Gateway by default, or concurrently with
+# batch_parallel. round_trip seconds are added once per HTTP request, for a high-latency link,
+# and with csrf a POST needs the X-CSRF-Token handed out by GET /odata/ with X-CSRF-Token: Fetch.
+import argparse
+import asyncio
+import bisect
+import datetime
+import random
+import uuid
+from typing import Optional
+import orjson
+from aiohttp import web
+from yarl import URL
+
+from src.utils.odata_parser import BoolOp, Call, Compare, Field, Literal, Not, ODataQueryError, parse_odata_query
+from src.utils.partitioning import find_date_range, format_date
+from src.utils.batch import header_param
+
+
+def make_rows(count: int, start: datetime.date = datetime.date(2023, 1, 1), days: int = 730, seed: int = 0) -> list:
+    """Rows ordered by CreateDate, spread evenly over days days."""
+    generator = random.Random(seed)
+    rows = []
+    for i in range(count):
+        date = start + datetime.timedelta(days=i * days // count)
+        rows.append({
+            "ORDER_NO": f"45{i:08d}",
+            "ORDER_NO_ITEM": str(10 * (i % 5 + 1)),
+            "TSF_ENTITY_ID": f"E{i % 3}",
+            "PURCH_GRP": f"P{i % 12:02d}",
+            "SUPPLIER": f"S{i % 97:04d}",
+            "CreateDate": date.strftime("%Y%m%d"),
+            "MATERIAL": f"M{i % 1009:05d}",
+            "STORE_NAME": f"Store {i % 41}",
+            "UNIT_COST": f"{generator.uniform(1, 500):.2f}",
+            "MATERIAL_DESC": f"Material {i % 1009}",
+            "SUP_NAME": f"Supplier {i % 97}",
+        })
+    return rows
+
+FUNCTIONS = {
+    "contains": lambda a, b: b in a,
+    "startswith": lambda a, b: a.startswith(b),
+    "endswith": lambda a, b: a.endswith(b),
+    "substringof": lambda a, b: a in b,
+    "tolower": lambda a: a.lower(),
+    "toupper": lambda a: a.upper(),
+    "trim": lambda a: a.strip(),
+    "length": len,
+}
+COMPARE = {
+    "eq": lambda a, b: a == b,
+    "ne": lambda a, b: a != b,
+    "gt": lambda a, b: a > b,
+    "ge": lambda a, b: a >= b,
+    "lt": lambda a, b: a < b,
+    "le": lambda a, b: a <= b,
+}
+
+def evaluate(expression, row: dict):
+    if isinstance(expression, Field):
+        return row.get(expression.name)
+    if isinstance(expression, Literal):
+        return expression.value
+    if isinstance(expression, Compare):
+        left, right = evaluate(expression.left, row), evaluate(expression.right, row)
+        # Numeric literals against string columns such as UNIT_COST
+        if isinstance(right, (int, float)) and isinstance(left, str):
+            left = float(left)
+        return COMPARE[expression.op](left, right)
+    if isinstance(expression, BoolOp):
+        values = (evaluate(operand, row) for operand in expression.operands)
+        return all(values) if expression.op == "and" else any(values)
+    if isinstance(expression, Not):
+        return not evaluate(expression.operand, row)
+    if isinstance(expression, Call):
+        if expression.name not in FUNCTIONS:
+            raise ODataQueryError(f"Function {expression.name} is not supported by the mock gateway")
+        return FUNCTIONS[expression.name](*(evaluate(arg, row) for arg in expression.args))
+    raise ODataQueryError(f"Cannot evaluate {expression!r}")
+
+
+# $metadata of the generated entity, in the OData v2 EDMX form SAP gateways serve
+PROPERTIES = [
+    ("ORDER_NO", 'Type="Edm.String" Nullable="false" MaxLength="10" sap:label="Purchasing Document"'),
+    ("ORDER_NO_ITEM", 'Type="Edm.String" Nullable="false" MaxLength="5" sap:label="Item"'),
+    ("TSF_ENTITY_ID", 'Type="Edm.String" MaxLength="4" sap:label="Purchasing Org."'),
+    ("PURCH_GRP", 'Type="Edm.String" MaxLength="3" sap:label="Purchasing Group"'),
+    ("SUPPLIER", 'Type="Edm.String" MaxLength="10" sap:label="Supplier"'),
+    ("CreateDate", 'Type="Edm.String" MaxLength="8" sap:label="Created On"'),
+    ("MATERIAL", 'Type="Edm.String" MaxLength="40" sap:label="Material"'),
+    ("STORE_NAME", 'Type="Edm.String" MaxLength="30" sap:label="Plant Name"'),
+    ("UNIT_COST", 'Type="Edm.Decimal" Precision="13" Scale="2" sap:label="Net Price"'),
+    ("MATERIAL_DESC", 'Type="Edm.String" MaxLength="40" sap:label="Material Description"'),
+    ("SUP_NAME", 'Type="Edm.String" MaxLength="35" sap:label="Supplier Name"'),
+]
+
+def metadata_document() -> bytes:
+    properties = "".join(f'<Property Name="{name}" {attributes}/>' for name, attributes in PROPERTIES)
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>'
+        '<edmx:Edmx Version="1.0" xmlns:edmx="http://schemas.microsoft.com/ado/2007/06/edmx"'
+        ' xmlns:m="http://schemas.microsoft.com/ado/2007/08/dataservices/metadata" xmlns:sap="http://www.sap.com/Protocols/SAPData">'
+        '<edmx:DataServices m:DataServiceVersion="2.0">'
+        '<Schema Namespace="ZC_GRN_PO_DET_CDS" xmlns="http://schemas.microsoft.com/ado/2008/09/edm">'
+        '<EntityType Name="ZC_GRN_PO_DETType"><Key><PropertyRef Name="ORDER_NO"/><PropertyRef Name="ORDER_NO_ITEM"/></Key>'
+        f'{properties}</EntityType>'
+        '<EntityContainer Name="ZC_GRN_PO_DET_CDS_Entities" m:IsDefaultEntityContainer="true">'
+        '<EntitySet Name="ZC_GRN_PO_DET" EntityType="ZC_GRN_PO_DET_CDS.ZC_GRN_PO_DETType"/>'
+        '</EntityContainer></Schema></edmx:DataServices></edmx:Edmx>'
+    ).encode()
+
+
+def split_multipart(body: bytes, boundary: str) -> list:
+    parts = []
+    for part in body.split(b"--" + boundary.encode())[1:]:
+        if part.startswith(b"--"):
+            break
+        parts.append(part.replace(b"\r\n", b"\n").lstrip(b"\n").partition(b"\n\n")[2])
+    return parts
+
+def parse_operation(message: bytes) -> tuple:
+    """(url, headers) of an application/http part such as 'GET ZC_GRN_PO_DET?$top=10 HTTP/1.1'."""
+    request_line, *lines = message.decode().strip().split("\n")
+    headers = dict(line.split(":", 1) for line in lines if ":" in line)
+    return request_line.split()[1], {name.strip(): value.strip() for name, value in headers.items()}
+
+def encode_multipart_response(responses: list, boundary: str) -> bytes:
+    parts = []
+    for response in responses:
+        headers = [f"Content-Type: {response.content_type}", f"Content-Length: {len(response.body)}"]
+        headers += [f"{name}: {value}" for name, value in response.headers.items() if name == "Retry-After"]
+        parts.append(
+            f"--{boundary}\r\nContent-Type: application/http\r\nContent-Transfer-Encoding: binary\r\n\r\n"
+            f"HTTP/1.1 {response.status} {response.reason}\r\n" + "\r\n".join(headers) + "\r\n\r\n"
+        )
+        parts.append(response.body.decode() + "\r\n")
+    return ("".join(parts) + f"--{boundary}--\r\n").encode()
+
+
+class MockGateway:
+    def __init__(self, rows: list, latency: float = 0.02, latency_per_offset: float = 0.0, default_page_size: int = 100,
+                 capacity: Optional[int] = None, throttle_above: Optional[int] = None, round_trip: float = 0.0,
+                 batch_parallel: bool = False, csrf: bool = False):
+        self.rows = sorted(rows, key=lambda row: row["CreateDate"])
+        # CreateDate acts as an index: date ranges are narrowed by bisection before filtering
+        self._dates = [row["CreateDate"] for row in self.rows]
+        self.latency = latency
+        self.latency_per_offset = latency_per_offset
+        self.default_page_size = default_page_size
+        self.capacity = capacity
+        self.throttle_above = throttle_above
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.throttled = 0
+        self.bytes_sent = 0
+        # Filtered and sorted rows per ($filter, $orderby), so paging a result does not re-scan all rows
+        self._results = {}
+        self.metadata = metadata_document()
+        self.metadata_requests = 0
+        self.round_trip = round_trip
+        self.batch_parallel = batch_parallel
+        self.csrf_token = "mock-csrf-token" if csrf else None
+        self.batches = 0
+        self.batched_requests = 0
+
+    async def handle_metadata(self, request: web.Request) -> web.Response:
+        self.metadata_requests += 1
+        etag = f'W/"{hash(self.metadata) & 0xffffffff:08x}"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(body=self.metadata, content_type="application/xml", headers={"ETag": etag})
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        return await self.serve(request.query, request.headers)
+
+    async def serve(self, query, headers) -> web.Response:
+        if self.throttle_above is not None and self.in_flight >= self.throttle_above:
+            self.throttled += 1
+            return web.json_response({"error": {"message": "Too many requests"}}, status=429, headers={"Retry-After": "1"})
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            return await self.respond(query, headers)
+        finally:
+            self.in_flight -= 1
+
+    async def respond(self, query, headers) -> web.Response:
+        try:
+            parsed = parse_odata_query("&".join(f"{key}={value}" for key, value in query.items()))
+            if parsed.apply:
+                raise ODataQueryError("$apply is not supported by the mock gateway")
+            rows = self.query_rows(query.get("$filter"), query.get("$orderby"), parsed)
+        except (ODataQueryError, ValueError, TypeError) as e:
+            return web.json_response({"error": {"message": str(e)}}, status=400)
+
+        skip = parsed.skip or 0
+        top = len(rows) if parsed.top is None else parsed.top
+        page_size = self.default_page_size
+        prefer = headers.get("Prefer", "")
+        if "odata.maxpagesize=" in prefer:
+            page_size = int(prefer.split("odata.maxpagesize=")[1].split(",")[0])
+        page = rows[skip:skip + min(top, page_size)]
+        if parsed.select:
+            page = [{key: row[key] for key in parsed.select} for row in page]
+
+        delay = self.latency + skip * self.latency_per_offset
+        if self.capacity is not None:
+            delay *= max(1.0, self.in_flight / self.capacity) ** 2
+        await asyncio.sleep(delay)
+        body = {"value": page}
+        if parsed.count:
+            body["@odata.count"] = len(rows)
+        headers = {"Preference-Applied": f"odata.maxpagesize={page_size}"} if "odata.maxpagesize=" in prefer else None
+        response = web.json_response(body, headers=headers)
+        self.bytes_sent += len(response.body)
+        return response
+
+    async def handle_count(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        return await self.count(request.query)
+
+    async def count(self, query) -> web.Response:
+        # /$count: the number of matching rows as a plain-text number
+        try:
+            parsed = parse_odata_query("&".join(f"{key}={value}" for key, value in query.items()))
+            rows = self.query_rows(query.get("$filter"), None, parsed)
+        except (ODataQueryError, ValueError, TypeError) as e:
+            return web.json_response({"error": {"message": str(e)}}, status=400)
+        await asyncio.sleep(self.latency)
+        return web.Response(text=str(len(rows)), content_type="text/plain")
+
+    def query_rows(self, filter_text, orderby_text, parsed) -> list:
+        key = (filter_text, orderby_text)
+        if key not in self._results:
+            rows = self.rows
+            date_range = find_date_range(parsed, "CreateDate")
+            if date_range is not None:
+                start, end = (format_date(date) for date in date_range)
+                rows = rows[bisect.bisect_left(self._dates, start):bisect.bisect_right(self._dates, end)]
+            rows = [row for row in rows if parsed.filter is None or evaluate(parsed.filter, row)]
+            for field, direction in reversed(parsed.orderby):
+                rows.sort(key=lambda row: row.get(field) or "", reverse=direction == "desc")
+            self._results[key] = rows
+        return self._results[key]
+
+    async def handle_service(self, request: web.Request) -> web.Response:
+        # Service document; also hands out the CSRF token
+        headers = {"X-CSRF-Token": self.csrf_token} if self.csrf_token and request.headers.get("X-CSRF-Token") == "Fetch" else None
+        return web.json_response({"value": [{"name": "ZC_GRN_PO_DET", "url": "ZC_GRN_PO_DET"}]}, headers=headers)
+
+    async def handle_batch(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        if self.csrf_token is not None and request.headers.get("X-CSRF-Token") != self.csrf_token:
+            return web.Response(status=403, headers={"X-CSRF-Token": "Required"})
+        body = await request.read()
+        json_batch = request.content_type == "application/json"
+        if json_batch:
+            operations = [(operation["url"], operation.get("headers", {})) for operation in orjson.loads(body)["requests"]]
+        else:
+            operations = [parse_operation(part) for part in split_multipart(body, header_param(request.headers["Content-Type"], "boundary"))]
+        self.batches += 1
+        self.batched_requests += len(operations)
+        if self.batch_parallel:
+            responses = await asyncio.gather(*(self.operation(url, headers) for url, headers in operations))
+        else:
+            # SAP Gateway's default: the operations of a batch run one after another
+            responses = [await self.operation(url, headers) for url, headers in operations]
+
+        if json_batch:
+            response = web.json_response({"responses": [
+                {"id": str(i), "status": part.status, "headers": {"Content-Type": part.content_type},
+                 "body": orjson.loads(part.body) if part.content_type == "application/json" else part.body.decode()}
+                for i, part in enumerate(responses)
+            ]})
+        else:
+            boundary = f"batchresponse_{uuid.uuid4().hex}"
+            response = web.Response(
+                body=encode_multipart_response(responses, boundary), headers={"Content-Type": f"multipart/mixed; boundary={boundary}"}, status=202
+            )
+        self.bytes_sent += len(response.body)
+        return response
+
+    async def operation(self, url: str, headers: dict) -> web.Response:
+        target = URL(url, encoded=True)
+        if target.path == "ZC_GRN_PO_DET":
+            return await self.serve(target.query, headers)
+        if target.path == "ZC_GRN_PO_DET/$count":
+            return await self.count(target.query)
+        return web.json_response({"error": {"message": f"Resource not found: {target.path}"}}, status=404)
+
+    @web.middleware
+    async def delay_round_trip(self, request: web.Request, handler):
+        # Network round trip of a high-latency link, paid once per HTTP request
+        await asyncio.sleep(self.round_trip)
+        return await handler(request)
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self.delay_round_trip] if self.round_trip else [])
+        app.router.add_get("/odata/", self.handle_service)
+        app.router.add_post("/odata/$batch", self.handle_batch)
+        app.router.add_get("/odata/ZC_GRN_PO_DET", self.handle)
+        app.router.add_get("/odata/ZC_GRN_PO_DET/$count", self.handle_count)
+        app.router.add_get("/odata/$metadata", self.handle_metadata)
+        return app
+
+    async def start(self, port: int = 0) -> str:
+        """Serves on localhost and returns the endpoint URL to use as ODATA_ENDPOINT."""
+        self.runner = web.AppRunner(self.app())
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", port)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        return f"http://127.0.0.1:{port}/odata/ZC_GRN_PO_DET?"
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock SAP OData gateway")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds added to every response")
+    parser.add_argument("--latency-per-offset", type=float, default=0.000002, help="Seconds added per skipped row")
+    parser.add_argument("--capacity", type=int, default=None, help="Concurrent requests served without slowing down")
+    parser.add_argument("--throttle-above", type=int, default=None, help="Concurrent requests beyond which 429 is returned")
+    parser.add_argument("--round-trip", type=float, default=0.0, help="Seconds added once per HTTP request")
+    parser.add_argument("--batch-parallel", action="store_true", help="Run the operations of a $batch concurrently")
+    parser.add_argument("--csrf", action="store_true", help="Require an X-CSRF-Token for $batch")
+    args = parser.parse_args()
+    gateway = MockGateway(make_rows(args.rows), args.latency, args.latency_per_offset,
+                          capacity=args.capacity, throttle_above=args.throttle_above, round_trip=args.round_trip,
+                          batch_parallel=args.batch_parallel, csrf=args.csrf)
+    web.run_app(gateway.app(), host="127.0.0.1", port=args.port)
@@ -1,8 +1,26 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from src.api.routes import router
+from src.api.routes import router, get_text2odata_graph
+from src.utils.odata_client import get_odata_client
+from src.utils.semantic_cache import get_semantic_cache
+from src.utils.schema import aload_schema
 import uvicorn
 
-app = FastAPI(title="OData Query Converter")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled OData session for the lifetime of the server
+    odata_client = get_odata_client()
+    await odata_client.start()
+    # Entity schema from $metadata, for the prompt's field list and query validation
+    await aload_schema()
+    # Compile the NL -> OData graph once, before the first request
+    get_text2odata_graph()
+    yield
+    await odata_client.close()
+    get_semantic_cache().save()
+
+app = FastAPI(title="OData Query Converter", lifespan=lifespan)
 
 app.include_router(router)
 
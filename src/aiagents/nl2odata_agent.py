@@ -1,12 +1,14 @@
+import asyncio
 from typing import Annotated
 from typing_extensions import TypedDict
 from langgraph.graph.message import AnyMessage, add_messages
 from langchain_core.messages import ToolMessage
-from langchain_core.runnables import RunnableLambda, Runnable
+from langchain_core.runnables import RunnableLambda, Runnable, RunnableConfig
 from langgraph.prebuilt import ToolNode
 from langgraph.prebuilt import tools_condition
 from langgraph.graph import END, StateGraph, START
 from src.utils.utils import handle_tool_error
+from src.utils.budget import get_budget
 
 class State(TypedDict):
     messages: Annotated[list[AnyMessage], add_messages]
@@ -15,23 +17,66 @@ class OutputState(TypedDict):
     odata_query: str
 
 class Assistant:
-    def __init__(self, runnable: Runnable):
+    def __init__(self, runnable: Runnable, validate=None, max_attempts: int = 3):
         self.runnable = runnable
+        # Optional check of a final text answer; a ValueError is sent back to the LLM to fix
+        self.validate = validate
+        # LLM calls per node visit before the last answer is passed on as is
+        self.max_attempts = max_attempts
 
-    def __call__(self, state: State):
-        while True:
+    @staticmethod
+    def _is_empty(result) -> bool:
+        return not result.tool_calls and (
+            not result.content
+            or isinstance(result.content, list)
+            and not result.content[0].get("text")
+        )
+
+    def _feedback(self, result) -> str:
+        """Returns the message to send back to the LLM, or None if the result is usable."""
+        if self._is_empty(result):
+            return "Respond with a real output."
+        if self.validate and not result.tool_calls and isinstance(result.content, str):
+            try:
+                self.validate(result.content.strip())
+            except ValueError as e:
+                return f"Error: the OData query is invalid. {e}\n Please fix your mistakes."
+        return None
+
+    def __call__(self, state: State, config: RunnableConfig):
+        budget = get_budget(config)
+        for attempt in range(self.max_attempts):
+            if budget:
+                budget.charge_llm_call()
             result = self.runnable.invoke(state)
             
             
-            if not result.tool_calls and (
-                not result.content
-                or isinstance(result.content, list)
-                and not result.content[0].get("text")
-            ):
-                messages = state["messages"] + [("user", "Respond with a real output.")]
-                state = {**state, "messages": messages}
+            feedback = self._feedback(result)
+            if not feedback:
+                break
+            # Keep a rejected answer in the history so the LLM sees what to fix
+            rejected = [] if self._is_empty(result) else [result]
+            messages = state["messages"] + rejected + [("user", feedback)]
+            state = {**state, "messages": messages}
+
+        return {"messages": result}
+
+    async def acall(self, state: State, config: RunnableConfig):
+        budget = get_budget(config)
+        for attempt in range(self.max_attempts):
+            if budget:
+                budget.charge_llm_call()
+                result = await asyncio.wait_for(self.runnable.ainvoke(state), max(budget.remaining(), 0))
             else:
+                result = await self.runnable.ainvoke(state)
+
+            feedback = self._feedback(result)
+            if not feedback:
                 break
+            # Keep a rejected answer in the history so the LLM sees what to fix
+            rejected = [] if self._is_empty(result) else [result]
+            messages = state["messages"] + rejected + [("user", feedback)]
+            state = {**state, "messages": messages}
 
         return {"messages": result}
 
@@ -41,14 +86,31 @@ def create_tool_node_with_fallback(tools: list) -> dict:
         exception_key="error"
     )
 
-def create_graph(assistant_runnable, tools):
+def route_tool_result(tools: list):
+    """
+    Ends the run when a return_direct tool produced its output, so its result is the final
+    answer without another LLM round trip. Tool errors go back to the assistant to fix.
+    """
+    direct_tools = {tool.name for tool in tools if tool.return_direct}
+
+    def route(state: State):
+        message = state["messages"][-1]
+        if message.name in direct_tools and not str(message.content).startswith("Error"):
+            return END
+        return "Text2Odata"
+
+    return route
+
+def create_graph(assistant_runnable, tools, validate=None):
     builder = StateGraph(State)
-    builder.add_node("Text2Odata", Assistant(assistant_runnable))
+    assistant = Assistant(assistant_runnable, validate)
+    # Sync and async entry points, so graph.astream never blocks the event loop on the LLM
+    builder.add_node("Text2Odata", RunnableLambda(assistant, afunc=assistant.acall, name="Text2Odata"))
     builder.add_node("tools", create_tool_node_with_fallback(tools))
     
     builder.add_edge(START, "Text2Odata")
     builder.add_conditional_edges("Text2Odata", tools_condition)
-    builder.add_edge("tools", "Text2Odata")
+    builder.add_conditional_edges("tools", route_tool_result(tools))
 
     return builder.compile()
 
@@ -0,0 +1,93 @@
+import hashlib
+from typing import Optional
+from src.utils.schema import BUILTIN_ENTITY, DATE_FIELD, EntityType, get_entity_schema
+
+
+TEXT2ODATA_SYSTEM_PROMPT_TEMPLATE = """You are an OData query assistant that converts natural language to OData queries with grouping, filtering, 
+            and aggregation capabilities. 
+            Fields (name type: meaning):
+{fields}
+
+            Time Period Definitions:
+                - Q1: April 1 to June 30
+                - Q2: July 1 to September 30
+                - Q3: October 1 to December 31
+                - Q4: January 1 to March 31
+
+                - First Half or H1: April 1 to September 30
+                - Second Half or H2: October 1 to March 31
+                - Last Quarter: Previous 3 months from current date
+                - Last Year: Previous year from current date
+                - fiscal year : April 1 to next year's March 31
+                - YTD: January 1 to current date of current year
+            Process:
+                1. Thought: Analyze query requirements (filtering, grouping, aggregation, time period)
+                2. Action: Call the nl_to_odata tool once with the query components. The tool compiles
+                   them into the final OData query, so no further response is needed.
+            Rules:
+                - Use groupby and aggregate for aggregations/grouping
+                - Use date_period for the time periods above, or period RANGE with start and end dates in YYYYMMDD format
+                - Give values without quotes, the tool quotes them
+                - Only use the fields listed above
+                
+            Examples:
+                User: Show total orders by supplier
+                Thought: Need grouping by supplier with order count
+                Action: nl_to_odata(groupby=[SUPPLIER], aggregate=[method count as Total])
+                Response: $apply=groupby((SUPPLIER),aggregate($count as Total))
+
+                User: Find orders from supplier ABC created in 2023
+                Thought: Need filter for supplier and date range
+                Action: nl_to_odata(filter=[SUPPLIER eq ABC], date_period=YEAR 2023)
+                Response: $filter=SUPPLIER eq 'ABC' and CreateDate ge '20230101' and CreateDate le '20231231'
+
+                User: Show orders from Q1 2023
+                Thought: Need filter for Q1 date range
+                Action: nl_to_odata(date_period=Q1 2023)
+                Response: $filter=CreateDate ge '20230401' and CreateDate le '20230630'
+
+                User: Show orders from H1 2023
+                Thought: Need filter for first half year range
+                Action: nl_to_odata(date_period=H1 2023)
+                Response: $filter=CreateDate ge '20230401' and CreateDate le '20230930'
+                
+                *** ALWAYS ANSWER THROUGH THE nl_to_odata TOOL ****
+
+                    """
+
+EDM_TYPE_NAMES = {
+    "Edm.String": "text", "Edm.Decimal": "number", "Edm.Double": "number", "Edm.Single": "number",
+    "Edm.Int16": "int", "Edm.Int32": "int", "Edm.Int64": "int", "Edm.Byte": "int", "Edm.Boolean": "bool",
+    "Edm.DateTime": "date", "Edm.Date": "date", "Edm.DateTimeOffset": "datetime", "Edm.Time": "time",
+}
+
+def describe_fields(entity: Optional[EntityType] = None) -> str:
+    """
+    One short line per field, from the entity's $metadata if loaded, else BUILTIN_ENTITY.
+    Fields of the built-in entity keep its descriptions, other fields get their $metadata label.
+    """
+    lines = []
+    for name in (entity or BUILTIN_ENTITY).properties:
+        builtin = BUILTIN_ENTITY.properties.get(name)
+        description = builtin.label if builtin is not None else None
+        if entity is not None:
+            prop = entity.properties[name]
+            kind = "date" if name == DATE_FIELD else EDM_TYPE_NAMES.get(prop.type, prop.type.replace("Edm.", "").lower())
+            key = ", key" if name in entity.keys else ""
+            description = description or prop.label or ""
+            line = f"{name} {kind}{key}: {description}" if description else f"{name} {kind}{key}"
+        else:
+            line = f"{name}: {description}"
+        # The prompt is a format template, so braces from labels are escaped
+        lines.append("                " + line.replace("{", "{{").replace("}", "}}"))
+    return "\n".join(lines)
+
+def build_system_prompt(entity: Optional[EntityType] = None) -> str:
+    return TEXT2ODATA_SYSTEM_PROMPT_TEMPLATE.replace("{fields}", describe_fields(entity))
+
+def get_system_prompt() -> str:
+    return build_system_prompt(get_entity_schema())
+
+def get_prompt_version() -> str:
+    """Identifies the current prompt in cache keys, so a prompt or schema change never serves stale translations."""
+    return hashlib.sha256(get_system_prompt().encode()).hexdigest()[:12]
@@ -1,24 +1,46 @@
-import json, datetime, asyncio, time
+import json, datetime, asyncio, time, threading
 from aiohttp import ClientSession, BasicAuth
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.messages import AIMessage
-from typing import List, Tuple, Dict, Optional
+from langchain_core.messages import AIMessage, ToolMessage
+from langgraph.errors import GraphRecursionError
+from typing import List, Tuple, Dict, Optional, Literal
+import orjson
+from contextlib import ExitStack
 from langchain.agents.agent_types import AgentType
 from langchain_experimental.agents.agent_toolkits import create_pandas_dataframe_agent
 
 
 from src.tools.nl_to_odata_tool import nl_to_odata
+from src.tools.fast_path import get_fast_path
 from src.aiagents.nl2odata_agent import create_graph
-from src.llm.llm import get_llm
-from src.utils.call import call_odata
-
-
+from src.aiagents.prompts import get_system_prompt, get_prompt_version
+from src.llm.llm import get_llm, get_embedding
+from src.utils.call import acall_odata, stream_odata
+from src.utils.budget import RequestBudget, BudgetExceeded
+from src.utils.odata_parser import ODataQueryError, canonicalize_odata_query, validate_odata_query
+from src.utils.translation_cache import get_translation_cache, normalize_query_text
+from src.utils.semantic_cache import get_semantic_cache
+from src.utils.result_cache import get_result_cache
+from src.utils.single_flight import get_single_flight
+from src.utils.odata_client import get_odata_client
+from src.utils.rate_limit import gateway_stats
+from src.utils.resilience import resilience_stats
+from src.utils.batch import batch_stats
+from src.utils.schema import get_entity_schema, get_schema_cache
+from src.utils.intents import plan_query
+from src.utils.appconfig import get_config_instance
+
+
+config = get_config_instance()
 router = APIRouter()
 
 class Query(BaseModel):
     text: str 
+    # Columns the caller will use beyond those the question names, e.g. chart axes
+    fields: Optional[List[str]] = None
 
 
 def format_ai_message(message):
@@ -29,107 +51,441 @@ def format_ai_message(message):
         elif message.additional_kwargs.get('tool_calls'):
             tool_call = message.additional_kwargs['tool_calls'][0]
             return f"Used tool: {tool_call['function']['name']}"
+    elif isinstance(message, ToolMessage) and not str(message.content).startswith("Error"):
+        # Output of the query compiler, which is the final answer
+        return message.content
     return None
 
 
-@router.post("/convert")
-def convert_to_odata(query: Query):
-    llm = get_llm()
+def build_text2odata_graph(llm=None):
+    """Builds the NL -> OData prompt, binds the tools and compiles the agent graph."""
+    if llm is None:
+        llm = get_llm()
     
     text2Odata_prompt = ChatPromptTemplate.from_messages([
         (
             "system",
-            """You are an OData query assistant that converts natural language to OData queries with grouping, filtering, 
-            and aggregation capabilities. 
-            The Fields are:
-                1) ORDER_NO - This is the order no or order number which documents the purchase.
-                2) ORDER_NO_ITEM - This is the line item which is part of the order
-                3) TSF_ENTITY_ID - This is a unique id for the purchasing organization
-                4) PURCH_GRP - This is the purchase group or category for the service
-                5) SUPPLIER - This is the supplier for the item
-                6) CreateDate - This is the date of creation of a particular purchase order or order number
-                7) MATERIAL - This is the material used for the Line item
-                8) STORE_NAME - This is the plant where the material is manufactured
-                9) UNIT_COST - This is the amount for the order for a particular line item 
-                10) MATERIAL_DESC - This is the description of the material used
-                11) SUP_NAME - This is the supplier name.
-                
-            Time Period Definitions:
-                - Q1: April 1 to June 30
-                - Q2: July 1 to September 30
-                - Q3: October 1 to December 31
-                - Q4: January 1 to March 31
-
-                - First Half or H1: April 1 to September 30
-                - Second Half or H2: October 1 to March 31
-                - Last Quarter: Previous 3 months from current date
-                - Last Year: Previous year from current date
-                - fiscal year : April 1 to next year's March 31
-                - YTD: January 1 to current date of current year
-            Process:
-                1. Thought: Analyze query requirements (filtering, grouping, aggregation)
-                2. Action: Use nl_to_odata tool 
-                3. Observation: Verify syntax and completeness
-                4. Response: Return OData query.
-            Rules:
-                - Use $apply for aggregations/grouping
-                - Handle date ranges in YYYYMMDD format
-                - Enclose values in single quotes.
-                
-            Examples:
-                User: Show total orders by supplier
-                Thought: Need grouping by supplier with order count
-                Action: nl_to_odata("group by supplier and count orders")
-                Response: $apply=groupby((SUPPLIER, CURRENCY),aggregate(ORDER_NO with count as Total))
-
-                User: Find orders from supplier ABC created in 2023
-                Thought: Need filter for supplier and date range
-                Action: nl_to_odata("filter supplier equals ABC and creation date between 2023")
-                Response: $filter(SUPPLIER eq 'ABC' and CREAT_DATE gt '20230101' and CREAT_DATE lt '20231231')
-
-                User: Show orders from Q1 2023
-                Thought: Need filter for Q1 date range
-                Action: nl_to_odata("filter creation date in Q1 2023")
-                Response: $filter=CreateDate ge '20230401' and CreateDate le '20230630'
-
-                User: Show orders from H1 2023
-                Thought: Need filter for first half year range
-                Action: nl_to_odata("filter creation date in first half 2023")
-                Response: $filter=CreateDate ge '20230401' and CreateDate le '20230930'
-                
-                *** OUTPUT ONLY THE ODATA QUERY ****
-
-                    """,
+            get_system_prompt(),
         ),
         ("placeholder", "{messages}"),
     ])
 
     text2Odata_tool = [nl_to_odata]
-    text2Odata_assistant_runnable = text2Odata_prompt | llm.bind_tools(text2Odata_tool)
-
-    graph = create_graph(text2Odata_assistant_runnable, text2Odata_tool)
-
-    events = graph.stream(
-        {"messages": ("user", query.text)}, stream_mode="values"
-    )
-    result = []
-    
-    # Extract messages from events and format them
-    for event in events:
-        for message in event['messages']:
-            formatted_message = format_ai_message(message)
-            result.append(formatted_message)
-    
-    if not result:
+    # Forcing the compiler tool makes the LLM fill the query components in a single structured call
+    text2Odata_assistant_runnable = text2Odata_prompt | llm.bind_tools(text2Odata_tool, tool_choice="nl_to_odata")
+
+    return create_graph(text2Odata_assistant_runnable, text2Odata_tool, validate=validate_odata_query)
+
+
+text2odata_graph = None
+text2odata_graph_version = None  # prompt version the graph was built with
+text2odata_graph_lock = threading.Lock()
+def get_text2odata_graph():
+    """Returns the compiled agent graph, building it once per process. The graph holds no per-request state."""
+    global text2odata_graph, text2odata_graph_version
+    if text2odata_graph is None:
+        with text2odata_graph_lock:
+            if text2odata_graph is None:
+                text2odata_graph_version = get_prompt_version()
+                text2odata_graph = build_text2odata_graph()
+    return text2odata_graph
+
+def rebuild_text2odata_graph():
+    """Rebuilds the shared graph. Call this when the prompt, the tools or the entity schema change."""
+    global text2odata_graph, text2odata_graph_version
+    version = get_prompt_version()
+    graph = build_text2odata_graph()
+    with text2odata_graph_lock:
+        text2odata_graph, text2odata_graph_version = graph, version
+    # Translations made by the previous graph may no longer be valid
+    get_translation_cache().clear()
+    get_semantic_cache().clear()
+    return graph
+
+
+def on_schema_change(schema):
+    # A new $metadata, or the first one when it was unreachable at startup, changes the prompt
+    # and the valid fields; a graph not built yet picks them up when it is
+    if text2odata_graph is not None and text2odata_graph_version != get_prompt_version():
+        rebuild_text2odata_graph()
+
+get_schema_cache().on_change(on_schema_change)
+
+
+class AgentTrace:
+    """
+    Consumes the graph's "updates" stream: one event per finished node holding only that
+    node's new messages. Only the latest message is formatted and kept, and the time since
+    the previous event is charged to the node as a per-step timing in the budget.
+    """
+    def __init__(self, budget: RequestBudget):
+        self.budget = budget
+        self.final = None
+        self._last_event = time.monotonic()
+
+    def add(self, event: dict):
+        now = time.monotonic()
+        for node, update in event.items():
+            self.budget.timings[f"agent.{node}"] += now - self._last_event
+            messages = (update or {}).get("messages")
+            if isinstance(messages, list):
+                messages = messages[-1] if messages else None
+            if messages is not None:
+                self.final = format_ai_message(messages)
+        self._last_event = now
+
+
+def build_odata_filter(result: list) -> str:
+    if not result or result[-1] is None:
         raise HTTPException(status_code=400, detail="Failed to convert query")
-    
 
-    # Construct the API URL using the last formatted message
-    filter = result[-1] + "&$count=True"
+    # Construct the API URL using the last formatted message, validated and in canonical form
+    # so that a malformed query never reaches the gateway
+    try:
+        filter = canonicalize_odata_query(result[-1] + "&$count=true")
+    except ODataQueryError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid OData query '{result[-1]}': {e}")
     
     print(filter)
 
-    return call_odata(filter)    
+    return filter
+
+
+def lookup_semantic_translation(text: str, embedding) -> Optional[str]:
+    """Returns the translation of a near-identical earlier query, promoting it to the exact-match cache."""
+    if embedding is None:
+        return None
+    cached = get_semantic_cache().get(text, embedding, get_prompt_version())
+    if cached is not None:
+        get_translation_cache().set(text, get_prompt_version(), cached)
+    return cached
+
+
+def remember_translation(text: str, filter: str, embedding=None):
+    get_translation_cache().set(text, get_prompt_version(), filter)
+    if embedding is not None:
+        get_semantic_cache().set(text, embedding, get_prompt_version(), filter)
+
+
+def translation_flight_key(query: Query) -> tuple:
+    return ("translation", normalize_query_text(query.text), get_prompt_version())
+
+
+def generate_odata_query(query: Query, budget: Optional[RequestBudget] = None) -> str:
+    """
+    Runs the NL -> OData agent and returns the query string to append to the endpoint.
+    Synchronous calls cannot be interrupted, so the budget is checked between LLM calls.
+    Concurrent identical questions wait for a single translation.
+    """
+    budget = budget or RequestBudget.from_config()
+    return get_single_flight().call(translation_flight_key(query), lambda: translate_query(query, budget))
+
+
+def translate_query(query: Query, budget: RequestBudget) -> str:
+    # Same lookups as the async path, run on the shared OData client's loop
+    filter, embedding = get_odata_client().run_sync(alookup_translation(query, budget))
+    if filter is not None:
+        return filter
+
+    graph = get_text2odata_graph()
+
+    trace = AgentTrace(budget)
+    with budget.stage("agent"):
+        events = graph.stream(
+            {"messages": ("user", query.text)}, budget.graph_config(), stream_mode="updates"
+        )
+
+        try:
+            for event in events:
+                trace.add(event)
+        except GraphRecursionError:
+            raise BudgetExceeded(f"Agent did not answer within {budget.recursion_limit} steps", budget.report())
+
+    filter = build_odata_filter([trace.final])
+    remember_translation(query.text, filter, embedding)
+    return filter
+
+
+async def alookup_translation(query: Query, budget: RequestBudget) -> Tuple[Optional[str], Optional[list]]:
+    """
+    Tries the fast path, the exact-match cache and the semantic cache, in that order.
+    Returns the OData query (None on a miss) and the query embedding to store the agent's answer with.
+    """
+    if config.FAST_PATH_ENABLED:
+        with budget.stage("fast_path"):
+            fast = get_fast_path().translate(query.text)
+        if fast is not None:
+            return build_odata_filter([fast]), None
+
+    with budget.stage("cache"):
+        cached = get_translation_cache().get(query.text, get_prompt_version())
+    if cached is not None:
+        return cached, None
+
+    embedding = None
+    if config.SEMANTIC_CACHE_ENABLED:
+        try:
+            embedding = await budget.run(get_embedding().aembed_query(query.text), "semantic_cache")
+        except BudgetExceeded:
+            raise
+        except Exception as e:
+            print(f"Embedding failed, skipping the semantic cache: {e}")
+        with budget.stage("semantic_cache"):
+            cached = lookup_semantic_translation(query.text, embedding)
+    return cached, embedding
+
+
+async def agenerate_odata_query(query: Query, budget: Optional[RequestBudget] = None) -> str:
+    """
+    Async variant of generate_odata_query that waits on the LLM without blocking the loop.
+    Every await is bounded by the remaining budget and cancelled when it runs out. Concurrent
+    identical questions share one translation, run under a budget of its own so it does not
+    inherit the deadline of the caller that started it; each caller's budget bounds only its
+    own wait, and gets the translation's stage timings and LLM calls once it is done.
+    """
+    budget = budget or RequestBudget.from_config()
+    flight = get_single_flight().run(translation_flight_key(query), lambda: atranslate_shared(query))
+    filter, flight_budget = await budget.run(flight, "translation")
+    budget.add(flight_budget)
+    return filter
+
+
+async def atranslate_shared(query: Query) -> Tuple[str, RequestBudget]:
+    flight_budget = RequestBudget.from_config()
+    return await atranslate_query(query, flight_budget), flight_budget
+
+
+async def atranslate_query(query: Query, budget: RequestBudget) -> str:
+    filter, embedding = await alookup_translation(query, budget)
+    if filter is not None:
+        return filter
+
+    graph = get_text2odata_graph()
+
+    trace = AgentTrace(budget)
+    async def consume_events():
+        events = graph.astream(
+            {"messages": ("user", query.text)}, budget.graph_config(), stream_mode="updates"
+        )
+        async for event in events:
+            trace.add(event)
+
+    try:
+        await budget.run(consume_events(), "agent")
+    except GraphRecursionError:
+        raise BudgetExceeded(f"Agent did not answer within {budget.recursion_limit} steps", budget.report())
+
+    filter = build_odata_filter([trace.final])
+    remember_translation(query.text, filter, embedding)
+    return filter
+
+
+
+async def abatch_generate_odata_queries(queries: List[Query], budgets: List[RequestBudget]) -> list:
+    """
+    Translates several queries together. Those answered by the fast path or the caches skip
+    the agent, the rest go through a single graph.abatch call running at most
+    BATCH_MAX_CONCURRENCY agents at a time. Returns the OData query, or the exception
+    raised for it, for each query in order.
+    """
+    results = [None] * len(queries)
+    pending = []
+
+    async def lookup(i: int):
+        try:
+            results[i], embedding = await alookup_translation(queries[i], budgets[i])
+            if results[i] is None:
+                pending.append((i, embedding))
+        except Exception as e:
+            results[i] = e
+
+    await asyncio.gather(*(lookup(i) for i in range(len(queries))))
+    if not pending:
+        return results
+
+    graph = get_text2odata_graph()
+    inputs = [{"messages": ("user", queries[i].text)} for i, _ in pending]
+    configs = [{**budgets[i].graph_config(), "max_concurrency": config.BATCH_MAX_CONCURRENCY} for i, _ in pending]
+    # Every pending query waits for the whole batch, so each is charged its wall time
+    with ExitStack() as stages:
+        for i, _ in pending:
+            stages.enter_context(budgets[i].stage("agent"))
+        states = await graph.abatch(inputs, configs, return_exceptions=True)
+
+    for (i, embedding), state in zip(pending, states):
+        try:
+            if isinstance(state, GraphRecursionError):
+                raise BudgetExceeded(f"Agent did not answer within {budgets[i].recursion_limit} steps", budgets[i].report())
+            if isinstance(state, Exception):
+                raise state
+            results[i] = build_odata_filter([format_ai_message(state["messages"][-1])])
+            remember_translation(queries[i].text, results[i], embedding)
+        except Exception as e:
+            results[i] = e
+    return results
+
+
+def describe_error(e: Exception) -> dict:
+    if isinstance(e, HTTPException):
+        return {"error": e.detail, "status_code": e.status_code}
+    if isinstance(e, BudgetExceeded):
+        return {"error": str(e), "status_code": 504, "budget": e.report}
+    return {"error": str(e), "status_code": 500}
+
+
+@router.post("/convert")
+async def convert_to_odata(query: Query, response: Response):
+    budget = RequestBudget.from_config()
+    try:
+        filter = plan_query(await agenerate_odata_query(query, budget), query.text, query.fields).query
+        data = await acall_odata(filter, budget)
+    except BudgetExceeded as e:
+        print(f"Request budget exceeded: {e.report}")
+        raise HTTPException(status_code=504, detail={"error": str(e), "budget": e.report})
+
+    # Which stage used the request's time
+    print(f"Request budget: {budget.report()}")
+    response.headers["Server-Timing"] = budget.server_timing()
+    return data
+
+
+async def stream_odata_events(filter: str, budget: RequestBudget, sse: bool = False):
+    """
+    Yields the stages of a /convert request as they happen: the OData query, @odata.count, one
+    batch of rows per page as it arrives, and a final done (or error) event with the budget
+    report. Each event is serialized on its own, so no full response body is ever built.
+    """
+    def encode(event: str, payload: dict) -> bytes:
+        data = orjson.dumps({"event": event, **payload})
+        return b"event: " + event.encode() + b"\ndata: " + data + b"\n\n" if sse else data + b"\n"
+
+    yield encode("query", {"odata_query": filter})
+
+    metadata = {}
+    pages = stream_odata(filter, metadata=metadata)
+    rows = 0
+    try:
+        while True:
+            try:
+                page = await budget.run(pages.__anext__(), "odata")
+            except StopAsyncIteration:
+                break
+            if rows == 0:
+                yield encode("count", {"count": metadata.get("count")})
+            rows += len(page)
+            yield encode("rows", {"rows": page})
+        if rows == 0:
+            yield encode("count", {"count": metadata.get("count", 0)})
+        yield encode("done", {"rows": rows, "budget": budget.report()})
+    except BudgetExceeded as e:
+        yield encode("error", {"error": str(e), "budget": e.report})
+    except HTTPException as e:
+        yield encode("error", {"error": e.detail, "status_code": e.status_code})
+    finally:
+        await pages.aclose()
+        print(f"Request budget: {budget.report()}")
+
+
+@router.post("/convert/stream")
+async def convert_to_odata_stream(query: Query, format: Literal["ndjson", "sse"] = "ndjson"):
+    """Streaming /convert: NDJSON lines (or server-sent events with format=sse) instead of one JSON body."""
+    budget = RequestBudget.from_config()
+    try:
+        filter = plan_query(await agenerate_odata_query(query, budget), query.text, query.fields).query
+    except BudgetExceeded as e:
+        raise HTTPException(status_code=504, detail={"error": str(e), "budget": e.report})
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(stream_odata_events(filter, budget, sse=format == "sse"), media_type=media_type)
+
+
+
+@router.post("/convert/batch")
+async def convert_to_odata_batch(queries: List[Query]):
+    """
+    Translates and fetches a list of queries concurrently. Identical texts (after normalization)
+    are translated once, and queries that translate to the same OData query are fetched once,
+    over the shared connection pool. Returns one result or error per query, in order.
+    """
+    if len(queries) > config.BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {config.BATCH_MAX_QUERIES} queries per batch")
+
+    unique = {}
+    for query in queries:
+        unique.setdefault(normalize_query_text(query.text), query)
+    texts = list(unique)
+    position = {text: i for i, text in enumerate(texts)}
+    budgets = [
+        RequestBudget(config.BATCH_REQUEST_TIMEOUT, config.AGENT_MAX_LLM_CALLS, config.AGENT_RECURSION_LIMIT)
+        for _ in texts
+    ]
+    translations = await abatch_generate_odata_queries([unique[text] for text in texts], budgets)
+
+    semaphore = asyncio.Semaphore(config.BATCH_MAX_CONCURRENCY)
+    async def fetch(filter: str, budget: RequestBudget):
+        async with semaphore:
+            try:
+                return await acall_odata(filter, budget)
+            except Exception as e:
+                return e
+
+    # Each query gets its own plan and projection, so one translation may be fetched with different columns
+    filters = []
+    fetches = {}
+    for query in queries:
+        i = position[normalize_query_text(query.text)]
+        filter = translations[i]
+        if isinstance(filter, str):
+            filter = plan_query(filter, query.text, query.fields).query
+            if filter not in fetches:
+                fetches[filter] = asyncio.ensure_future(fetch(filter, budgets[i]))
+        filters.append(filter)
+    if fetches:
+        await asyncio.gather(*fetches.values())
+
+    results = []
+    for query, filter in zip(queries, filters):
+        if isinstance(filter, Exception):
+            results.append({"text": query.text, **describe_error(filter)})
+            continue
+        data = fetches[filter].result()
+        if isinstance(data, Exception):
+            results.append({"text": query.text, "odata_query": filter, **describe_error(data)})
+        else:
+            results.append({"text": query.text, "odata_query": filter, "data": data})
+
+    print(f"Batch of {len(queries)} queries: {len(texts)} translated, {len(fetches)} fetched")
+    return results
+
+@router.get("/convert/cache")
+def translation_cache_stats():
+    return {
+        "exact": get_translation_cache().stats(),
+        "semantic": get_semantic_cache().stats(),
+        "results": get_result_cache().stats(),
+        "single_flight": get_single_flight().stats(),
+    }
+
+
+@router.get("/convert/gateway")
+def gateway_limits():
+    """Adaptive concurrency, circuit breaker, page latencies and $batch counts per OData endpoint, and the request rate cap."""
+    return {**gateway_stats(), **resilience_stats(), **batch_stats()}
+
+
+@router.get("/convert/schema")
+def entity_schema():
+    """The entity's fields from the cached $metadata (empty until it is loaded) and the cache's state."""
+    entity = get_entity_schema()
+    properties = [] if entity is None else [
+        {**vars(prop), "key": prop.name in entity.keys} for prop in entity.properties.values()
+    ]
+    return {"cache": get_schema_cache().stats(), "properties": properties}
+
+
+@router.get("/convert/fast-path")
+def fast_path_stats():
+    return get_fast_path().stats()
     
 
 ############################## INSIGHTS_AGENT ##########################################################################
@@ -0,0 +1,155 @@
+import re
+import threading
+from collections import Counter
+from typing import List, Optional, Tuple
+from src.tools.nl_to_odata_tool import ODataComponents, Condition, Aggregation, DatePeriod, compile_odata_query
+from src.utils.appconfig import get_config_instance
+from src.utils.schema import BUILTIN_ENTITY, DATE_FIELD, FIELD_PHRASES
+
+
+config = get_config_instance()
+
+# Natural language names of the coded (text) fields, each for the main field of its phrase
+FIELD_SYNONYMS = {
+    phrase: group[0] for phrase, group in FIELD_PHRASES.items()
+    if BUILTIN_ENTITY.properties[group[0]].type == "Edm.String" and group[0] != DATE_FIELD
+}
+FIELD_PATTERN = "|".join(sorted((re.escape(name) for name in FIELD_SYNONYMS), key=len, reverse=True))
+
+# Words that carry no query semantics of their own
+STOPWORDS = {
+    "show", "list", "get", "give", "fetch", "find", "display", "me", "us", "i", "can", "could", "you",
+    "please", "have", "want", "need", "the", "a", "an", "all", "of", "for", "from", "in", "during", "with",
+    "and", "to", "orders", "order", "purchase", "po", "pos", "data", "details", "records", "rows",
+    "created", "made", "booked", "placed", "raised", "what", "are", "is", "was", "were", "which", "there",
+}
+
+GROUP_RULE = re.compile(rf"\b(?:grouped by|group by|by|per|for each|each)\s+({FIELD_PATTERN})\b|\b({FIELD_PATTERN})[- ]wise\b", re.I)
+FILTER_RULE = re.compile(
+    rf"\b({FIELD_PATTERN})\s+(?:no\.?|number|id|code)?\s*(?:=|is|equals|equal to)?\s*('[^']+'|\"[^\"]+\"|[A-Za-z0-9][\w\-]*)",
+    re.I,
+)
+PERIOD_RULES: List[Tuple[re.Pattern, callable]] = [
+    (re.compile(r"\b(q[1-4])\s*(?:of\s*)?(?:fy\s*)?(\d{4})\b", re.I),
+     lambda m: DatePeriod(period=m.group(1).upper(), year=int(m.group(2)))),
+    (re.compile(r"\b(h[12]|first half|second half)\s*(?:of\s*)?(?:fy\s*)?(\d{4})\b", re.I),
+     lambda m: DatePeriod(period="H1" if m.group(1).lower() in ("h1", "first half") else "H2", year=int(m.group(2)))),
+    (re.compile(r"\b(?:fy|fiscal year)\s*(\d{4})\b", re.I),
+     lambda m: DatePeriod(period="FY", year=int(m.group(1)))),
+    (re.compile(r"\b(?:ytd|year to date)\b", re.I), lambda m: DatePeriod(period="YTD")),
+    (re.compile(r"\blast quarter\b", re.I), lambda m: DatePeriod(period="LAST_QUARTER")),
+    (re.compile(r"\blast year\b", re.I), lambda m: DatePeriod(period="LAST_YEAR")),
+    (re.compile(r"\b((?:19|20)\d{2})\b"), lambda m: DatePeriod(period="YEAR", year=int(m.group(1)))),
+]
+AGGREGATE_RULES: List[Tuple[re.Pattern, Aggregation]] = [
+    (re.compile(r"\b(?:how many|count of|number of|no\. of|total number of)\s+(?:purchase\s+)?(?:orders|line items)\b|\border count\b|\bcount\b|\btotal orders\b", re.I),
+     Aggregation(method="count", alias="Total")),
+    (re.compile(r"\b(?:total|sum of|sum)\s+(?:unit\s+)?(?:cost|amount|spend|value)\b", re.I),
+     Aggregation(field="UNIT_COST", method="sum", alias="TotalCost")),
+    (re.compile(r"\b(?:average|avg|mean)\s+(?:unit\s+)?(?:cost|amount|spend|value)\b", re.I),
+     Aggregation(field="UNIT_COST", method="average", alias="AverageCost")),
+]
+
+
+def content_words(text: str) -> List[str]:
+    return [word for word in re.findall(r"[\w\-']+", text.lower()) if word not in STOPWORDS]
+
+
+def is_identifier(value: str) -> bool:
+    """Filter values must look like codes or be quoted, so ordinary words are never taken as values."""
+    return value[0] in "'\"" or any(char.isdigit() for char in value) or (value.isupper() and len(value) > 1)
+
+
+class FastPath:
+    """
+    Rule-based NL -> OData translation for the common query templates: filters on supplier,
+    plant and other coded fields, the fiscal periods of the prompt, and group by a field with
+    count, sum or average of the unit cost.
+
+    The confidence of a match is the share of content words explained by the rules. Below
+    min_confidence, or when a field is filtered twice (which would need an 'or'), the query
+    is left to the agent. Hit/miss counters and the words that most often defeat the rules
+    are kept so the rule set can be grown over time.
+    """
+    def __init__(self, min_confidence: float):
+        self.min_confidence = min_confidence
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.unmatched_words = Counter()
+
+    def parse(self, text: str) -> Tuple[Optional[ODataComponents], float, List[str]]:
+        consumed = []
+
+        def claim(match) -> bool:
+            start, end = match.span()
+            if any(start < other_end and other_start < end for other_start, other_end in consumed):
+                return False
+            consumed.append((start, end))
+            return True
+
+        components = ODataComponents()
+        # Coded values first, so "purchase org 2000" is not read as the year 2000
+        for match in FILTER_RULE.finditer(text):
+            value = match.group(2)
+            if is_identifier(value) and claim(match):
+                field = FIELD_SYNONYMS[match.group(1).lower()]
+                if any(condition.field == field for condition in components.filter):
+                    return None, 0.0, []
+                components.filter.append(Condition(field=field, value=value.strip("'\"")))
+        for match in GROUP_RULE.finditer(text):
+            if claim(match):
+                components.groupby.append(FIELD_SYNONYMS[(match.group(1) or match.group(2)).lower()])
+        for pattern, aggregation in AGGREGATE_RULES:
+            for match in pattern.finditer(text):
+                if claim(match) and aggregation not in components.aggregate:
+                    components.aggregate.append(aggregation)
+        for pattern, make_period in PERIOD_RULES:
+            for match in pattern.finditer(text):
+                if components.date_period is None and claim(match):
+                    components.date_period = make_period(match)
+
+        leftover = text
+        for start, end in sorted(consumed, reverse=True):
+            leftover = leftover[:start] + " " + leftover[end:]
+        unmatched = content_words(leftover)
+        total = len(content_words(text))
+        if not consumed or not total or (components.groupby and not components.aggregate):
+            return None, 0.0, unmatched
+        return components, 1.0 - len(unmatched) / total, unmatched
+
+    def translate(self, text: str) -> Optional[str]:
+        """Returns the OData query for text, or None when the agent should handle it."""
+        components, confidence, unmatched = self.parse(text)
+        odata_query = None
+        if components is not None and confidence >= self.min_confidence:
+            try:
+                odata_query = compile_odata_query(components)
+            except ValueError as e:
+                print(f"Fast path could not compile '{text}': {e}")
+        with self._lock:
+            if odata_query is None:
+                self.misses += 1
+                self.unmatched_words.update(unmatched)
+            else:
+                self.hits += 1
+        return odata_query
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "min_confidence": self.min_confidence,
+                "top_unmatched_words": self.unmatched_words.most_common(20),
+            }
+
+
+fast_path = None
+def get_fast_path() -> FastPath:
+    global fast_path
+    if fast_path is None:
+        fast_path = FastPath(config.FAST_PATH_MIN_CONFIDENCE)
+    return fast_path
@@ -1,6 +1,12 @@
 # import spacy
+import calendar
+import datetime
+import re
 from langchain.tools import tool
-from typing import Dict, List, Optional
+from pydantic import BaseModel, Field
+from typing import Dict, List, Literal, Optional, Tuple
+from src.utils.odata_parser import canonicalize_odata_query
+from src.utils.schema import DATE_FIELD, INTEGER_TYPES, NUMBER_TYPES, get_entity, get_fields
 
 
 # nlp = spacy.load("en_core_web_sm")
@@ -76,42 +82,171 @@ from typing import Dict, List, Optional
 #    return odata_query
 
 
-def extract_query_components(query: str) -> Dict:
+class Condition(BaseModel):
+    field: str = Field(description="Entity field, e.g. SUPPLIER")
+    operator: Literal["eq", "ne", "gt", "ge", "lt", "le", "contains", "startswith", "endswith"] = "eq"
+    value: str = Field(description="Value to compare with, without quotes. Dates as YYYYMMDD, amounts as plain numbers")
+
+
+class Aggregation(BaseModel):
+    field: Optional[str] = Field(None, description="Field to aggregate. Leave empty to count rows")
+    method: Literal["sum", "min", "max", "average", "countdistinct", "count"]
+    alias: str = Field(description="Name of the aggregated column, e.g. Total")
+
+
+class DatePeriod(BaseModel):
+    period: Literal["Q1", "Q2", "Q3", "Q4", "H1", "H2", "FY", "YEAR", "YTD", "LAST_QUARTER", "LAST_YEAR", "RANGE"]
+    year: Optional[int] = Field(None, description="Fiscal year for Q1-Q4, H1, H2 and FY, calendar year for YEAR")
+    start: Optional[str] = Field(None, description="Start date YYYYMMDD, only for RANGE")
+    end: Optional[str] = Field(None, description="End date YYYYMMDD, only for RANGE")
+
+
+class ODataComponents(BaseModel):
+    select: List[str] = Field(default_factory=list, description="Fields to return for raw row queries")
+    filter: List[Condition] = Field(default_factory=list, description="Conditions, combined with 'and'")
+    groupby: List[str] = Field(default_factory=list, description="Fields to group by")
+    aggregate: List[Aggregation] = Field(default_factory=list, description="Aggregations per group")
+    date_period: Optional[DatePeriod] = Field(None, description="Period on the creation date")
+    orderby: List[str] = Field(default_factory=list, description="Sort keys, e.g. 'UNIT_COST desc'")
+    top: Optional[int] = Field(None, description="Maximum number of rows")
+
+
+def resolve_date_period(period: DatePeriod, today: Optional[datetime.date] = None) -> Tuple[str, str]:
     """
-    GPT-4 will analyze the query to extract:
-    - Fields for selection/grouping
-    - Filter conditions
-    - Aggregation operations
-    - Time periods
-    Returns a dictionary with these components
+    Resolves a period to an inclusive (start, end) YYYYMMDD range. Quarters and halves are
+    fiscal, with the fiscal year starting on April 1: Q4 and H2 of year Y end in March of Y + 1.
     """
-    # GPT-4 will implement this logic
-    return {
-        "select": [],
-        "filter": [],
-        "groupby": [],
-        "aggregate": []
+    today = today or datetime.date.today()
+    year = period.year or today.year
+    D = datetime.date
+    ranges = {
+        "Q1": (D(year, 4, 1), D(year, 6, 30)),
+        "Q2": (D(year, 7, 1), D(year, 9, 30)),
+        "Q3": (D(year, 10, 1), D(year, 12, 31)),
+        "Q4": (D(year + 1, 1, 1), D(year + 1, 3, 31)),
+        "H1": (D(year, 4, 1), D(year, 9, 30)),
+        "H2": (D(year, 10, 1), D(year + 1, 3, 31)),
+        "FY": (D(year, 4, 1), D(year + 1, 3, 31)),
+        "YEAR": (D(year, 1, 1), D(year, 12, 31)),
+        "YTD": (D(today.year, 1, 1), today),
+        "LAST_QUARTER": (shift_months(today, -3), today),
+        "LAST_YEAR": (shift_months(today, -12), today),
     }
+    if period.period == "RANGE":
+        if not period.start or not period.end:
+            raise ValueError("RANGE periods need both start and end dates in YYYYMMDD format")
+        return check_date(period.start), check_date(period.end)
+    start, end = ranges[period.period]
+    return start.strftime("%Y%m%d"), end.strftime("%Y%m%d")
 
-def construct_odata_query_2(components: Dict) -> str:
-    """Constructs OData query from components"""
-    query_parts = []
-    
-    if components.get("filter") and components.get("groupby"):
-        filters = " and ".join(components["filter"])
-        groups = ",".join(components["groupby"])
-        aggregates = ",".join(components["aggregate"])
-        
-        query_parts.append(f"$filter={filters}")
-        query_parts.append(f"groupby(({groups}),aggregate({aggregates}))")
-    
-    return "/".join(query_parts)
+
+def shift_months(day: datetime.date, months: int) -> datetime.date:
+    month_index = day.year * 12 + day.month - 1 + months
+    year, month = divmod(month_index, 12)
+    return datetime.date(year, month + 1, min(day.day, calendar.monthrange(year, month + 1)[1]))
+
+
+def check_date(value: str) -> str:
+    try:
+        datetime.datetime.strptime(value, "%Y%m%d")
+    except ValueError:
+        raise ValueError(f"Invalid date '{value}', expected YYYYMMDD")
+    return value
 
 
+def check_field(field: str, allowed: List[str]) -> str:
+    if field not in allowed:
+        raise ValueError(f"Unknown field '{field}'. Valid fields are: {', '.join(allowed)}")
+    return field
 
 
-@tool
-def nl_to_odata(query: str) -> str:
-    """Convert natural language to OData query using GPT-4's understanding"""
-    components = extract_query_components(query)
-    return construct_odata_query_2(components)
\ No newline at end of file
+def quote(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def field_type(field: str) -> str:
+    prop = get_entity().properties.get(field)
+    return prop.type if prop is not None else "Edm.String"
+
+
+def literal(field: str, value: str) -> str:
+    """value as an OData literal of the field's EDM type: numbers and booleans bare, text and dates quoted."""
+    edm_type = field_type(field)
+    if field == DATE_FIELD:
+        return quote(check_date(value))
+    if edm_type in NUMBER_TYPES:
+        number = value.strip()
+        if not re.fullmatch(r"-?\d+" if edm_type in INTEGER_TYPES else r"-?\d+(?:\.\d+)?", number):
+            raise ValueError(f"Invalid number '{value}' for {field}, which is {edm_type}")
+        return number
+    if edm_type == "Edm.Boolean":
+        if value.strip().lower() not in ("true", "false"):
+            raise ValueError(f"Invalid value '{value}' for {field}, expected true or false")
+        return value.strip().lower()
+    return quote(value)
+
+
+def compile_condition(condition: Condition) -> str:
+    field = check_field(condition.field, get_fields())
+    if condition.operator in ("contains", "startswith", "endswith"):
+        if field_type(field) != "Edm.String":
+            raise ValueError(f"{condition.operator} needs a text field, but {field} is {field_type(field)}")
+        return f"{condition.operator}({field},{quote(condition.value)})"
+    return f"{field} {condition.operator} {literal(field, condition.value)}"
+
+
+def compile_aggregation(aggregation: Aggregation) -> str:
+    if aggregation.method == "count" or aggregation.field is None:
+        return f"$count as {aggregation.alias}"
+    return f"{check_field(aggregation.field, get_fields())} with {aggregation.method} as {aggregation.alias}"
+
+
+def compile_odata_query(components: ODataComponents, today: Optional[datetime.date] = None) -> str:
+    """
+    Compiles query components into an OData v4 query string.
+
+    Grouped or aggregated queries become a single $apply with the conditions as a leading
+    filter() transformation, so they apply to the rows before grouping. Other queries use
+    $filter and $select. $orderby and $top may refer to fields or aggregate aliases.
+    """
+    fields = get_fields()
+    conditions = [compile_condition(condition) for condition in components.filter]
+    if components.date_period:
+        start, end = resolve_date_period(components.date_period, today)
+        conditions.append(f"{DATE_FIELD} ge {quote(start)} and {DATE_FIELD} le {quote(end)}")
+    filter_expression = " and ".join(conditions)
+
+    params = []
+    if components.groupby or components.aggregate:
+        transformations = []
+        if filter_expression:
+            transformations.append(f"filter({filter_expression})")
+        aggregates = ",".join(compile_aggregation(aggregation) for aggregation in components.aggregate)
+        if components.groupby:
+            groups = ",".join(check_field(field, fields) for field in components.groupby)
+            aggregate_step = f",aggregate({aggregates})" if aggregates else ""
+            transformations.append(f"groupby(({groups}){aggregate_step})")
+        else:
+            transformations.append(f"aggregate({aggregates})")
+        params.append("$apply=" + "/".join(transformations))
+    else:
+        if filter_expression:
+            params.append(f"$filter={filter_expression}")
+        if components.select:
+            params.append("$select=" + ",".join(check_field(field, fields) for field in components.select))
+
+    if components.orderby:
+        sortable = fields + [aggregation.alias for aggregation in components.aggregate]
+        for key in components.orderby:
+            check_field(key.split()[0], sortable)
+        params.append("$orderby=" + ",".join(components.orderby))
+    if components.top is not None:
+        params.append(f"$top={components.top}")
+
+    return "&".join(params)
+
+
+@tool(args_schema=ODataComponents, return_direct=True)
+def nl_to_odata(**components) -> str:
+    """Compile the components extracted from the user's question into the final OData v4 query."""
+    return canonicalize_odata_query(compile_odata_query(ODataComponents(**components)))
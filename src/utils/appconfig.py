@@ -79,6 +79,89 @@ class AppConfig:
         self.SAP_API_VERSION = self.get_env_var("API_VERSION", "2023-05-15")
         self.LEEWAY = self.get_env_var("LEEWAY")
 
+        # OData paging: concurrent page requests, optionally overridden per endpoint prefix
+        # e.g. ODATA_ENDPOINT_CONCURRENCY='{"https://gw.example.com/sap/opu/odata4/": 8}'
+        self.ODATA_MAX_CONCURRENCY = int(self.get_env_var("ODATA_MAX_CONCURRENCY", "5"))
+        self.ODATA_ENDPOINT_CONCURRENCY = json.loads(self.get_env_var("ODATA_ENDPOINT_CONCURRENCY", "{}"))
+        # Adaptive (AIMD) concurrency per endpoint, starting from the values above: bounds, latency
+        # spike threshold as a multiple of the baseline latency, and the factor applied on backoff
+        self.ODATA_ADAPTIVE_CONCURRENCY = self.get_env_var("ODATA_ADAPTIVE_CONCURRENCY", "true").lower() == "true"
+        self.ODATA_MIN_CONCURRENCY = int(self.get_env_var("ODATA_MIN_CONCURRENCY", "1"))
+        self.ODATA_ADAPTIVE_MAX_CONCURRENCY = int(self.get_env_var("ODATA_ADAPTIVE_MAX_CONCURRENCY", "20"))
+        self.ODATA_LATENCY_TOLERANCE = float(self.get_env_var("ODATA_LATENCY_TOLERANCE", "1.5"))
+        self.ODATA_BACKOFF_FACTOR = float(self.get_env_var("ODATA_BACKOFF_FACTOR", "0.5"))
+        # Requests per second to the gateway across all queries of the process (0 = no cap), and burst size
+        self.ODATA_MAX_REQUESTS_PER_SECOND = float(self.get_env_var("ODATA_MAX_REQUESTS_PER_SECOND", "0"))
+        self.ODATA_REQUEST_BURST = int(self.get_env_var("ODATA_REQUEST_BURST", "10"))
+        # Page retries with jittered exponential backoff (seconds), and the circuit breaker per endpoint:
+        # consecutive failures that open it and seconds before a trial request
+        self.ODATA_RETRY_ATTEMPTS = int(self.get_env_var("ODATA_RETRY_ATTEMPTS", "3"))
+        self.ODATA_RETRY_BASE_DELAY = float(self.get_env_var("ODATA_RETRY_BASE_DELAY", "0.5"))
+        self.ODATA_RETRY_MAX_DELAY = float(self.get_env_var("ODATA_RETRY_MAX_DELAY", "10"))
+        self.ODATA_CIRCUIT_FAILURES = int(self.get_env_var("ODATA_CIRCUIT_FAILURES", "5"))
+        self.ODATA_CIRCUIT_RESET_TIMEOUT = float(self.get_env_var("ODATA_CIRCUIT_RESET_TIMEOUT", "30"))
+        # Hedged page requests: a duplicate is sent once a page is slower than this latency quantile
+        self.ODATA_HEDGING = self.get_env_var("ODATA_HEDGING", "false").lower() == "true"
+        self.ODATA_HEDGE_QUANTILE = float(self.get_env_var("ODATA_HEDGE_QUANTILE", "0.95"))
+        self.ODATA_HEDGE_MIN_SAMPLES = int(self.get_env_var("ODATA_HEDGE_MIN_SAMPLES", "20"))
+        # Entity schema from the service's $metadata: revalidated after TTL seconds, fetch timeout in seconds
+        self.ODATA_METADATA_ENABLED = self.get_env_var("ODATA_METADATA_ENABLED", "true").lower() == "true"
+        self.ODATA_METADATA_TTL = float(self.get_env_var("ODATA_METADATA_TTL", "3600"))
+        self.ODATA_METADATA_TIMEOUT = float(self.get_env_var("ODATA_METADATA_TIMEOUT", "10"))
+        # "auto" adds a $select to raw-row queries whose question names the columns it needs, "off" fetches all
+        self.ODATA_PROJECTION = self.get_env_var("ODATA_PROJECTION", "auto")
+        # "auto" answers count, exists and top-N questions with a single request, "off" fetches all rows;
+        # counts use $top=0&$count=true ("inline") or the /$count path ("path")
+        self.ODATA_INTENT_FAST_PATHS = self.get_env_var("ODATA_INTENT_FAST_PATHS", "auto")
+        self.ODATA_COUNT_MODE = self.get_env_var("ODATA_COUNT_MODE", "inline").lower()
+        # Page size requested through Prefer: odata.maxpagesize, and paging mode (auto, server or skip)
+        self.ODATA_MAX_PAGE_SIZE = int(self.get_env_var("ODATA_MAX_PAGE_SIZE", "1000"))
+        self.ODATA_PAGING_MODE = self.get_env_var("ODATA_PAGING_MODE", "auto").lower()
+        # $batch transport: page requests waiting together (up to BATCH_SIZE, collected for at most
+        # BATCH_WINDOW seconds) go in one POST, as "multipart" (OData v2) or "json" (OData v4)
+        self.ODATA_BATCH = self.get_env_var("ODATA_BATCH", "false").lower() == "true"
+        self.ODATA_BATCH_SIZE = int(self.get_env_var("ODATA_BATCH_SIZE", "10"))
+        self.ODATA_BATCH_WINDOW = float(self.get_env_var("ODATA_BATCH_WINDOW", "0.005"))
+        self.ODATA_BATCH_FORMAT = self.get_env_var("ODATA_BATCH_FORMAT", "multipart").lower()
+        # Date-partitioned fetch of large date-ranged queries, for gateways where deep $skip offsets
+        # are slow ("auto" to enable, default "off"): field and max rows per partition
+        self.ODATA_PARTITIONING = self.get_env_var("ODATA_PARTITIONING", "off").lower()
+        self.ODATA_PARTITION_FIELD = self.get_env_var("ODATA_PARTITION_FIELD", "CreateDate")
+        self.ODATA_PARTITION_MAX_ROWS = int(self.get_env_var("ODATA_PARTITION_MAX_ROWS", "5000"))
+        # Pages a shared (coalesced) OData stream holds for its slowest reader before pausing the fetch
+        self.SINGLE_FLIGHT_BUFFER_PAGES = int(self.get_env_var("SINGLE_FLIGHT_BUFFER_PAGES", "8"))
+        # Shared OData connection pool
+        self.ODATA_POOL_LIMIT = int(self.get_env_var("ODATA_POOL_LIMIT", "100"))
+        self.ODATA_POOL_LIMIT_PER_HOST = int(self.get_env_var("ODATA_POOL_LIMIT_PER_HOST", "20"))
+        self.ODATA_DNS_CACHE_TTL = int(self.get_env_var("ODATA_DNS_CACHE_TTL", "300"))
+        self.ODATA_KEEPALIVE_TIMEOUT = float(self.get_env_var("ODATA_KEEPALIVE_TIMEOUT", "60"))
+
+        # NL -> OData translation cache: max entries and time to live in seconds
+        self.TRANSLATION_CACHE_SIZE = int(self.get_env_var("TRANSLATION_CACHE_SIZE", "1024"))
+        self.TRANSLATION_CACHE_TTL = float(self.get_env_var("TRANSLATION_CACHE_TTL", "3600"))
+        # Semantic (embedding) translation cache: reuse threshold on cosine similarity, capacity and file
+        self.SEMANTIC_CACHE_ENABLED = self.get_env_var("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+        self.SEMANTIC_CACHE_THRESHOLD = float(self.get_env_var("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+        self.SEMANTIC_CACHE_CAPACITY = int(self.get_env_var("SEMANTIC_CACHE_CAPACITY", "2048"))
+        # Per-request budget: deadline in seconds, LLM calls and LangGraph steps for the agent
+        self.REQUEST_TIMEOUT = float(self.get_env_var("REQUEST_TIMEOUT", "60"))
+        self.AGENT_MAX_LLM_CALLS = int(self.get_env_var("AGENT_MAX_LLM_CALLS", "6"))
+        self.AGENT_RECURSION_LIMIT = int(self.get_env_var("AGENT_RECURSION_LIMIT", "10"))
+        # Rule-based fast path: share of content words the rules must explain to skip the agent
+        self.FAST_PATH_ENABLED = self.get_env_var("FAST_PATH_ENABLED", "true").lower() == "true"
+        self.FAST_PATH_MIN_CONFIDENCE = float(self.get_env_var("FAST_PATH_MIN_CONFIDENCE", "1.0"))
+        # /convert/batch: max queries per call, agents and fetches in flight, and the deadline of each query
+        self.BATCH_MAX_QUERIES = int(self.get_env_var("BATCH_MAX_QUERIES", "100"))
+        self.BATCH_MAX_CONCURRENCY = int(self.get_env_var("BATCH_MAX_CONCURRENCY", "8"))
+        self.BATCH_REQUEST_TIMEOUT = float(self.get_env_var("BATCH_REQUEST_TIMEOUT", "300"))
+        self.SEMANTIC_CACHE_PATH = self.get_env_var("SEMANTIC_CACHE_PATH", join(dirname(__file__), '../..', '.cache', 'semantic_cache.npz'))
+        # OData result cache: time to live in seconds, memory bound and on-disk spill directory and bound, in bytes
+        self.RESULT_CACHE_ENABLED = self.get_env_var("RESULT_CACHE_ENABLED", "true").lower() == "true"
+        self.RESULT_CACHE_TTL = float(self.get_env_var("RESULT_CACHE_TTL", "300"))
+        self.RESULT_CACHE_MAX_BYTES = int(self.get_env_var("RESULT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+        self.RESULT_CACHE_DIR = self.get_env_var("RESULT_CACHE_DIR", join(dirname(__file__), '../..', '.cache', 'results'))
+        self.RESULT_CACHE_DISK_MAX_BYTES = int(self.get_env_var("RESULT_CACHE_DISK_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+
     def get_env_var(self, key, default=None):
         value = os.getenv(key, default)
         if value is None:
@@ -0,0 +1,219 @@
+import asyncio
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+import orjson
+from fastapi import HTTPException
+from yarl import URL
+from src.utils.appconfig import get_config_instance
+from src.utils.odata_client import get_odata_client
+from src.utils.rate_limit import get_limiter, get_token_bucket, is_page_request
+from src.utils.resilience import RETRY_STATUSES, TransientODataError, parse_retry_after
+
+
+config = get_config_instance()
+
+@dataclass
+class BatchResponse:
+    """One operation's response out of a $batch, shaped like what a GET would have returned."""
+    status: int
+    headers: Dict[str, str] = field(default_factory=dict)
+    body: bytes = b""
+    data: object = None  # already decoded body of a JSON batch response
+
+    def json(self):
+        return self.data if self.data is not None else orjson.loads(self.body)
+
+
+def service_root(url: str) -> str:
+    """The service root of an entity set URL such as .../SERVICE_SRV/EntitySet?$filter=..."""
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path.rstrip("/").rsplit("/", 1)[0] + "/", "", ""))
+
+def relative_url(url: str, root: str) -> str:
+    # Operations in a batch are addressed relative to the service root, percent-encoded
+    encoded = URL(url, encoded=False)
+    return encoded.raw_path_qs[len(URL(root).raw_path):]
+
+def header_param(value: str, name: str) -> Optional[str]:
+    for param in value.split(";")[1:]:
+        key, _, param_value = param.strip().partition("=")
+        if key.lower() == name:
+            return param_value.strip('"')
+    return None
+
+def parse_http_message(message: bytes) -> BatchResponse:
+    head, _, body = message.replace(b"\r\n", b"\n").partition(b"\n\n")
+    status_line, *lines = head.decode("latin-1").split("\n")
+    headers = {}
+    for line in lines:
+        name, _, value = line.partition(":")
+        headers[name.strip()] = value.strip()
+    return BatchResponse(int(status_line.split()[1]), headers, body.rstrip(b"\n"))
+
+def encode_multipart(requests: List[Tuple[str, Optional[dict]]], boundary: str) -> bytes:
+    """An OData v2 multipart/mixed batch of GET operations, one application/http part each."""
+    parts = []
+    for url, headers in requests:
+        lines = [f"GET {url} HTTP/1.1", "Accept: application/json"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        parts.append(
+            f"--{boundary}\r\nContent-Type: application/http\r\nContent-Transfer-Encoding: binary\r\n\r\n"
+            + "\r\n".join(lines) + "\r\n\r\n\r\n"
+        )
+    return ("".join(parts) + f"--{boundary}--\r\n").encode()
+
+def decode_multipart(body: bytes, boundary: str) -> List[BatchResponse]:
+    """The operation responses of a multipart/mixed batch response, in request order."""
+    responses = []
+    for part in body.split(b"--" + boundary.encode())[1:]:
+        if part.startswith(b"--"):
+            break
+        # Part headers (Content-Type: application/http), then the embedded HTTP response
+        _, _, message = part.replace(b"\r\n", b"\n").lstrip(b"\n").partition(b"\n\n")
+        responses.append(parse_http_message(message))
+    return responses
+
+def encode_json(requests: List[Tuple[str, Optional[dict]]]) -> bytes:
+    """An OData v4 JSON batch of GET operations, with their positions as ids."""
+    return orjson.dumps({"requests": [
+        {"id": str(i), "method": "GET", "url": url, "headers": {"Accept": "application/json", **(headers or {})}}
+        for i, (url, headers) in enumerate(requests)
+    ]})
+
+def decode_json(body: bytes) -> List[BatchResponse]:
+    responses = sorted(orjson.loads(body)["responses"], key=lambda response: int(response["id"]))
+    return [
+        BatchResponse(response["status"], response.get("headers", {}), data=response.get("body"))
+        for response in responses
+    ]
+
+
+class BatchTransport:
+    """
+    Sends the GET requests to one OData service as $batch POSTs, so K page requests (of one
+    query or of several concurrent ones) cost one round trip to the gateway instead of K.
+
+    Requests are collected until max_size are waiting or window seconds have passed since the
+    first, then sent together; a lone request is sent as a plain GET. Each caller gets its own
+    operation's response, so status handling and retries stay per page. The batch format is
+    multipart/mixed (OData v2) or JSON (OData v4). A CSRF token is fetched only if the
+    service asks for one, as SAP Gateway does for POST.
+    """
+    def __init__(self, root: str, max_size: int, window: float, format: str = "multipart"):
+        self.root = root
+        self.max_size = max_size
+        self.window = window
+        self.format = format
+        self.csrf_token: Optional[str] = None
+        self._pending: List[Tuple[str, Optional[dict], asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.metrics = dict.fromkeys(["batches", "batched_requests", "single_requests", "errors"], 0)
+
+    async def get(self, url: str, headers: Optional[dict] = None) -> BatchResponse:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((url, headers, future))
+        if len(self._pending) >= self.max_size:
+            self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self.flush)
+        return await future
+
+    def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        # Callers that gave up (hedged or over budget) are dropped from the batch
+        pending = [request for request in self._pending if not request[2].done()]
+        self._pending = []
+        if pending:
+            asyncio.ensure_future(self.send(pending))
+
+    async def send(self, pending: List[Tuple[str, Optional[dict], asyncio.Future]]):
+        try:
+            if config.ODATA_ADAPTIVE_CONCURRENCY:
+                # One rate token and one slot of the endpoint's limiter per HTTP request, not per page
+                await get_token_bucket().acquire()
+                sample = all(is_page_request(url) for url, _, _ in pending)
+                async with get_limiter(pending[0][0]).slot(len(pending), sample) as outcome:
+                    responses = await self.exchange(pending, outcome)
+            else:
+                responses = await self.exchange(pending)
+        except Exception as e:
+            self.metrics["errors"] += 1
+            for _, _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for i, (_, _, future) in enumerate(pending):
+            if future.done():
+                continue
+            if i < len(responses):
+                future.set_result(responses[i])
+            else:
+                future.set_exception(TransientODataError("operation missing from the $batch response"))
+
+    async def exchange(self, pending: List[Tuple[str, Optional[dict], asyncio.Future]], outcome: Optional[dict] = None) -> List[BatchResponse]:
+        session = await get_odata_client().get_session()
+        if len(pending) == 1:
+            url, headers, _ = pending[0]
+            self.metrics["single_requests"] += 1
+            async with session.get(url, headers=headers) as response:
+                if outcome is not None:
+                    outcome["status"] = response.status
+                return [BatchResponse(response.status, dict(response.headers), await response.read())]
+
+        requests = [(relative_url(url, self.root), headers) for url, headers, _ in pending]
+        self.metrics["batches"] += 1
+        self.metrics["batched_requests"] += len(requests)
+        if self.format == "json":
+            body, content_type = encode_json(requests), "application/json"
+        else:
+            boundary = f"batch_{uuid.uuid4().hex}"
+            body, content_type = encode_multipart(requests, boundary), f"multipart/mixed; boundary={boundary}"
+
+        for attempt in range(2):
+            headers = {"Content-Type": content_type, "Accept": "multipart/mixed, application/json"}
+            if self.csrf_token:
+                headers["X-CSRF-Token"] = self.csrf_token
+            async with session.post(self.root + "$batch", data=body, headers=headers) as response:
+                if outcome is not None:
+                    outcome["status"] = response.status
+                if response.status == 403 and response.headers.get("X-CSRF-Token", "").lower() == "required" and attempt == 0:
+                    await self.fetch_csrf_token()
+                    continue
+                if response.status in RETRY_STATUSES:
+                    raise TransientODataError(
+                        f"$batch status code {response.status}", response.status, parse_retry_after(response.headers.get("Retry-After"))
+                    )
+                if response.status not in (200, 202):
+                    print(f"Error: $batch request received status code {response.status}")
+                    raise HTTPException(status_code=response.status, detail="Error sending OData $batch")
+                payload = await response.read()
+                if response.content_type == "application/json":
+                    return decode_json(payload)
+                boundary = header_param(response.headers.get("Content-Type", ""), "boundary")
+                if boundary is None:
+                    raise TransientODataError("$batch response without a multipart boundary")
+                return decode_multipart(payload, boundary)
+
+    async def fetch_csrf_token(self):
+        session = await get_odata_client().get_session()
+        async with session.get(self.root, headers={"X-CSRF-Token": "Fetch"}) as response:
+            self.csrf_token = response.headers.get("X-CSRF-Token")
+
+    def stats(self) -> dict:
+        return dict(self.metrics)
+
+
+batch_transports: Dict[str, BatchTransport] = {}
+def get_batch_transport(url: str) -> BatchTransport:
+    """The batch transport of the service url belongs to, shared by all queries against it."""
+    root = service_root(url)
+    if root not in batch_transports:
+        batch_transports[root] = BatchTransport(root, config.ODATA_BATCH_SIZE, config.ODATA_BATCH_WINDOW, config.ODATA_BATCH_FORMAT)
+    return batch_transports[root]
+
+def batch_stats() -> dict:
+    return {"batches": {root: transport.stats() for root, transport in batch_transports.items()}}
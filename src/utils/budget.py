@@ -0,0 +1,100 @@
+import asyncio
+import inspect
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Optional
+from src.utils.appconfig import get_config_instance
+
+
+config = get_config_instance()
+
+class BudgetExceeded(Exception):
+    """Raised when a request runs out of time or LLM calls. Carries the per-stage report."""
+    def __init__(self, message: str, report: dict):
+        super().__init__(message)
+        self.report = report
+
+class RequestBudget:
+    """
+    Deadline and LLM call allowance of one request.
+
+    It is created when the request starts and handed to every stage: the agent graph gets
+    it through its config (with a recursion limit), each LLM call and the OData pull are
+    awaited with the remaining time as timeout, so work is cancelled once the deadline
+    passes. Time spent is recorded per stage for the report.
+    """
+    def __init__(self, timeout: float, max_llm_calls: int, recursion_limit: int):
+        self.timeout = timeout
+        self.max_llm_calls = max_llm_calls
+        self.recursion_limit = recursion_limit
+        self.started = time.monotonic()
+        self.deadline = self.started + timeout
+        self.llm_calls = 0
+        self.timings = defaultdict(float)
+
+    @classmethod
+    def from_config(cls) -> "RequestBudget":
+        return cls(config.REQUEST_TIMEOUT, config.AGENT_MAX_LLM_CALLS, config.AGENT_RECURSION_LIMIT)
+
+    def remaining(self) -> float:
+        return self.deadline - time.monotonic()
+
+    def check(self, stage: str):
+        if self.remaining() <= 0:
+            raise BudgetExceeded(f"Request deadline of {self.timeout:g}s exceeded during {stage}", self.report())
+
+    def charge_llm_call(self):
+        """Counts an LLM call, refusing it once the allowance or the deadline is used up."""
+        self.check("agent")
+        if self.llm_calls >= self.max_llm_calls:
+            raise BudgetExceeded(f"Agent used its {self.max_llm_calls} LLM calls without an answer", self.report())
+        self.llm_calls += 1
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.monotonic()
+        try:
+            yield self
+        finally:
+            self.timings[name] += time.monotonic() - start
+
+    async def run(self, coro, stage: str):
+        """Awaits coro within the remaining time, cancelling it when the deadline passes."""
+        try:
+            with self.stage(stage):
+                self.check(stage)
+                return await asyncio.wait_for(coro, self.remaining())
+        except asyncio.TimeoutError:
+            raise BudgetExceeded(f"Request deadline of {self.timeout:g}s exceeded during {stage}", self.report())
+        finally:
+            # Closes coro if it never started because the deadline had already passed. A started
+            # one belongs to the task wait_for wrapped it in, which may still be unwinding
+            if not inspect.iscoroutine(coro) or inspect.getcoroutinestate(coro) == inspect.CORO_CREATED:
+                coro.close()
+
+    def add(self, other: "RequestBudget"):
+        """Counts the stage timings and LLM calls of work done for this request under other."""
+        for name, seconds in other.timings.items():
+            self.timings[name] += seconds
+        self.llm_calls += other.llm_calls
+
+    def graph_config(self) -> dict:
+        return {"recursion_limit": self.recursion_limit, "configurable": {"budget": self}}
+
+    def report(self) -> dict:
+        return {
+            "elapsed": round(time.monotonic() - self.started, 3),
+            "timeout": self.timeout,
+            "llm_calls": self.llm_calls,
+            "stages": {name: round(seconds, 3) for name, seconds in self.timings.items()},
+        }
+
+    def server_timing(self) -> str:
+        """Formats the stage timings as a Server-Timing header value (milliseconds)."""
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.timings.items())
+
+
+def get_budget(runnable_config: Optional[dict]) -> Optional[RequestBudget]:
+    """Returns the budget passed to a graph run through its config, if any."""
+    return ((runnable_config or {}).get("configurable") or {}).get("budget")
@@ -1,72 +1,524 @@
 import time
 from fastapi import HTTPException
 import asyncio
-from aiohttp import ClientSession, BasicAuth
-from concurrent.futures import ThreadPoolExecutor
+import aiohttp
+import orjson
+import pyarrow as pa
+import queue
+import threading
+from collections import deque
+from dataclasses import replace
+from typing import Awaitable, Iterator, List, Optional, Tuple
+from urllib.parse import urljoin
 from src.utils.appconfig import get_config_instance
+from src.utils.odata_client import get_odata_client
+from src.utils.budget import RequestBudget
+from src.utils.result_cache import ResultBuilder, ResultCache, get_result_cache
+from src.utils.odata_parser import ODataQuery, ODataQueryError, format_odata_query, parse_odata_query
+from src.utils.intents import count_query, is_count_query
+from src.utils.single_flight import get_single_flight
+from src.utils.rate_limit import get_limiter, get_token_bucket, is_page_request
+from src.utils.resilience import (
+    RETRY_STATUSES, LatencyTracker, TransientODataError, backoff_delay, get_circuit_breaker,
+    get_latency_tracker, hedge, parse_retry_after,
+)
+from src.utils.schema import get_schema_cache
+from src.utils.batch import BatchResponse, get_batch_transport
+from src.utils.partitioning import partition_query, plan_partitioning, split_range
 
 
 config = get_config_instance()
 
-async def fetch_data(session, url):
-    async with session.get(url) as response:
-        if response.status == 200:
-            try:
-                return await response.json()
-            except Exception:
-                print("Error: Response is not in JSON format.")
-                raise HTTPException(status_code=500, detail="Response is not in JSON format")
+PAGE_SIZE = 100  # Default page size of the gateway when no odata.maxpagesize is honored
+
+async def fetch_data(session, url, headers=None):
+    """
+    Fetches one page. Transient failures (429, 5xx, connection errors) are retried up to
+    ODATA_RETRY_ATTEMPTS times with jittered exponential backoff, so a long pull keeps the
+    pages it already has. A page slower than the endpoint's recent ODATA_HEDGE_QUANTILE latency
+    gets a duplicate request when hedging is on, and the endpoint's circuit breaker refuses
+    requests while the gateway is down.
+    """
+    breaker = get_circuit_breaker(url)
+    tracker = get_latency_tracker(url)
+    hedge_delay = tracker.quantile(config.ODATA_HEDGE_QUANTILE, config.ODATA_HEDGE_MIN_SAMPLES) if config.ODATA_HEDGING else None
+    attempt = 0
+    while True:
+        breaker.check()
+        try:
+            response_data = await hedge(lambda: fetch_page_once(session, url, headers, tracker), hedge_delay, tracker)
+        except HTTPException:
+            # The gateway answered (e.g. 400 for a bad query), so it is up
+            breaker.record_success()
+            raise
+        except TransientODataError as e:
+            # Throttling means the gateway is up but busy; the limiter and backoff handle it
+            if e.status != 429:
+                breaker.record_failure()
+            if attempt >= config.ODATA_RETRY_ATTEMPTS:
+                print(f"Error: giving up on {url} after {attempt + 1} attempts: {e}")
+                raise HTTPException(status_code=e.status or 503, detail=f"Error fetching OData: {e}")
+            delay = backoff_delay(attempt, e.retry_after)
+            print(f"Retrying page in {delay:.2f}s after: {e}")
+            await asyncio.sleep(delay)
+            attempt += 1
+            continue
+        breaker.record_success()
+        return response_data
+
+async def fetch_page_once(session, url, headers, tracker: LatencyTracker):
+    start = time.monotonic()
+    try:
+        if not config.ODATA_ADAPTIVE_CONCURRENCY or config.ODATA_BATCH:
+            # The batch transport takes the rate token and limiter slot per HTTP request itself
+            response_data = await get_response_data(session, url, headers)
         else:
-            print(f"Error: Received response with status code {response.status}")
-            raise HTTPException(status_code=response.status, detail="Error fetching OData")
+            # Process-wide request rate cap, then a slot of the endpoint's adaptive concurrency limit
+            await get_token_bucket().acquire()
+            async with get_limiter(url).slot(sample=is_page_request(url)) as outcome:
+                response_data = await get_response_data(session, url, headers, outcome)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        raise TransientODataError(f"{type(e).__name__}: {e}")
+    tracker.record(time.monotonic() - start)
+    return response_data
+
+async def get_response_data(session, url, headers=None, outcome: Optional[dict] = None):
+    if config.ODATA_BATCH:
+        # Sent together with other pending page requests to the same service in one $batch POST
+        response = await get_batch_transport(url).get(url, headers)
+    else:
+        async with session.get(url, headers=headers) as raw:
+            response = BatchResponse(raw.status, raw.headers, await raw.read() if raw.status == 200 else b"")
+    status = response.status
+    if outcome is not None:
+        outcome["status"] = status
+    if status in RETRY_STATUSES:
+        raise TransientODataError(
+            f"status code {status}", status, parse_retry_after(response.headers.get("Retry-After"))
+        )
+    if status == 200:
+        try:
+            # orjson decodes the page bytes several times faster than the json module
+            return response.json()
+        except orjson.JSONDecodeError:
+            print("Error: Response is not in JSON format.")
+            raise HTTPException(status_code=500, detail="Response is not in JSON format")
+    else:
+        print(f"Error: Received response with status code {status}")
+        raise HTTPException(status_code=status, detail="Error fetching OData")
+
+def get_max_concurrency(endpoint: str) -> int:
+    """
+    Returns the number of in-flight page requests allowed for one query against an endpoint.
+    With adaptive concurrency the endpoint's shared limiter sets the actual limit, so a query
+    may use up to its maximum.
+    """
+    if config.ODATA_ADAPTIVE_CONCURRENCY:
+        return get_limiter(endpoint).max_limit
+    for prefix, limit in config.ODATA_ENDPOINT_CONCURRENCY.items():
+        if endpoint.startswith(prefix):
+            return int(limit)
+    return config.ODATA_MAX_CONCURRENCY
+
+async def fetch_page(session, url, semaphore, headers=None):
+    async with semaphore:
+        return await fetch_data(session, url, headers)
+
+async def iter_in_order(coroutines: Iterator[Awaitable], window: int):
+    """
+    Async generator over the results of coroutines, in order. At most window of them run
+    ahead of the consumer, and the next one starts as soon as the oldest is consumed.
+    """
+    pending = deque()
+
+    def schedule():
+        while len(pending) < window:
+            coroutine = next(coroutines, None)
+            if coroutine is None:
+                break
+            pending.append(asyncio.ensure_future(coroutine))
+
+    schedule()
+    try:
+        while pending:
+            result = await pending.popleft()
+            schedule()
+            yield result
+    finally:
+        for task in pending:
+            task.cancel()
+
+def get_next_link(response_data: dict, endpoint: str) -> Optional[str]:
+    """Returns the absolute server-driven paging link of a page, if the service sent one."""
+    next_link = response_data.get("@odata.nextLink") or response_data.get("odata.nextLink")
+    if next_link:
+        return urljoin(endpoint, next_link)
+    return None
+
+async def iter_odata_pages(endpoint: str, max_concurrency: Optional[int] = None,
+                           paging: Optional[str] = None, max_page_size: Optional[int] = None,
+                           metadata: Optional[dict] = None, semaphore: Optional[asyncio.Semaphore] = None):
+    """
+    Async generator over the pages of an OData query.
+
+    Every request asks for odata.maxpagesize=max_page_size via the Prefer header. The
+    first page is fetched on its own to learn @odata.count and the page size the
+    service actually applied. Then, depending on paging:
+      - "server": follow @odata.nextLink ($skiptoken) links until the service stops sending them.
+      - "skip": fetch the remaining $skip offsets through a sliding window: up to
+        max_concurrency requests are in flight and a new one starts as soon as any finishes.
+      - "auto": "server" if the first page carries a next link, otherwise "skip".
+    Pages are yielded in order as soon as they are available, and at most
+    2 * max_concurrency pages are held in memory at any time. If a metadata dict is given,
+    its "count" is set from @odata.count before the first page is yielded. A semaphore shared
+    with other queries caps their requests in flight together.
+    """
+    if max_concurrency is None:
+        max_concurrency = get_max_concurrency(endpoint)
+    if paging is None:
+        paging = config.ODATA_PAGING_MODE
+    if max_page_size is None:
+        max_page_size = config.ODATA_MAX_PAGE_SIZE
 
-async def call_odata_query(endpoint: str):
+    page_headers = {"Prefer": f"odata.maxpagesize={max_page_size}"}
+
+    # Tasks beyond max_concurrency wait on the semaphore, so the next page starts
+    # the moment any in-flight page completes
+    semaphore = semaphore or asyncio.Semaphore(max_concurrency)
+
+    # Pooled, keep-alive session shared by all queries in the process
+    session = await get_odata_client().get_session()
+    first_page = await fetch_page(session, f"{endpoint}&$skip=0", semaphore, page_headers)
+    if metadata is not None:
+        metadata["count"] = first_page.get("@odata.count")
+    if first_page.get("value"):
+        yield first_page["value"]
+
+    next_link = get_next_link(first_page, endpoint)
+    if paging == "server" or (paging == "auto" and next_link):
+        while next_link:
+            page = await fetch_page(session, next_link, semaphore, page_headers)
+            if page.get("value"):
+                yield page["value"]
+            next_link = get_next_link(page, endpoint)
+        return
+
+    # Step $skip by the page size the service actually returned
+    page_size = len(first_page.get("value", [])) or PAGE_SIZE
+    total_count = first_page.get("@odata.count")
+    if total_count is None:
+        # Without a count the page set is unknown, so walk pages until a short one
+        skiptoken = page_size
+        page = first_page
+        while len(page.get("value", [])) >= page_size:
+            page = await fetch_page(session, f"{endpoint}&$skip={skiptoken}", semaphore, page_headers)
+            if page.get("value"):
+                yield page["value"]
+            skiptoken += page_size
+        return
+
+    urls = (f"{endpoint}&$skip={offset}" for offset in range(page_size, total_count, page_size))
+    pages = (fetch_page(session, url, semaphore, page_headers) for url in urls)
+    async for response_data in iter_in_order(pages, 2 * max_concurrency):
+        if response_data.get("value"):
+            yield response_data["value"]
+
+async def probe_partition(session, parsed, field, start, end, semaphore) -> Tuple[str, Optional[int]]:
+    """Returns the partition's query and its @odata.count, fetched without rows."""
+    query = partition_query(parsed, field, start, end)
+    async with semaphore:
+        page = await fetch_data(session, f"{config.ODATA_ENDPOINT}{query}&$top=0")
+    return query, page.get("@odata.count")
+
+async def plan_partitions(session, parsed, field, start, end, count, max_rows, semaphore) -> List[Tuple[str, int]]:
+    """
+    Splits [start, end] into partitions of at most max_rows rows. The range is first cut into
+    as many equal date ranges as the count calls for, then any partition that turns out larger
+    (skewed dates) is bisected again. Empty partitions are dropped, single days are not split.
+    """
+    if count <= max_rows or start == end:
+        return [(partition_query(parsed, field, start, end), count)] if count else []
+    ranges = split_range(start, end, -(-count // max_rows))
+    probes = await asyncio.gather(*(probe_partition(session, parsed, field, a, b, semaphore) for a, b in ranges))
+    if any(part_count is None for _, part_count in probes):
+        return [(partition_query(parsed, field, start, end), count)]
+    plans = await asyncio.gather(*(
+        plan_partitions(session, parsed, field, a, b, part_count, max_rows, semaphore)
+        for (a, b), (_, part_count) in zip(ranges, probes)
+    ))
+    return [partition for plan in plans for partition in plan]
+
+async def iter_partitioned_pages(parsed, start, end, field: Optional[str] = None,
+                                 max_rows: Optional[int] = None, max_concurrency: Optional[int] = None,
+                                 metadata: Optional[dict] = None):
+    """
+    Async generator over the pages of a date-ranged query, fetched in date partitions.
+
+    Deep $skip offsets get slower on the gateway, so the range is split into partitions of at
+    most max_rows rows (sized from each partition's @odata.count) that are paged separately
+    with shallow offsets. Partitions are paged concurrently, with at most max_concurrency
+    requests in flight across them, and pages are yielded in partition order, which is date
+    order (reversed for '$orderby=<field> desc').
+    """
+    field = field or config.ODATA_PARTITION_FIELD
+    max_rows = max_rows or config.ODATA_PARTITION_MAX_ROWS
+    max_concurrency = max_concurrency or get_max_concurrency(config.ODATA_ENDPOINT)
+
+    session = await get_odata_client().get_session()
+    semaphore = asyncio.Semaphore(max_concurrency)
+    query, count = await probe_partition(session, parsed, field, start, end, semaphore)
+    if count is None or count <= max_rows:
+        # Small (or uncountable) results are paged as one query
+        async for page in iter_odata_pages(config.ODATA_ENDPOINT + format_odata_query(parsed), metadata=metadata):
+            yield page
+        return
+
+    partitions = await plan_partitions(session, parsed, field, start, end, count, max_rows, semaphore)
+    if parsed.orderby and parsed.orderby[0][1] == "desc":
+        partitions.reverse()
+    if metadata is not None:
+        metadata["count"] = sum(part_count for _, part_count in partitions)
+    print(f"Fetching {count} rows in {len(partitions)} partitions")
+
+    async def collect(query: str) -> list:
+        url = config.ODATA_ENDPOINT + query
+        return [page async for page in iter_odata_pages(url, max_concurrency, semaphore=semaphore)]
+
+    # Partitions are paged concurrently within the semaphore's max_concurrency requests, and
+    # the next partition is fetched while the current one is consumed
+    collected = (collect(query) for query, _ in partitions)
+    async for pages in iter_in_order(collected, 2):
+        for page in pages:
+            yield page
+
+async def fetch_count(parsed: ODataQuery) -> Optional[int]:
+    """
+    The number of rows matching parsed's filter, in one request: $top=0&$count=true, or the
+    /$count path (a bare number) with ODATA_COUNT_MODE=path or when no @odata.count came back.
+    """
+    session = await get_odata_client().get_session()
+    if config.ODATA_COUNT_MODE != "path":
+        page = await fetch_data(session, config.ODATA_ENDPOINT + count_query(parsed))
+        if page.get("@odata.count") is not None:
+            return page["@odata.count"]
+    entity_set = config.ODATA_ENDPOINT.partition("?")[0].rstrip("/")
+    count = await fetch_data(session, f"{entity_set}/$count?{format_odata_query(ODataQuery(filter=parsed.filter))}")
+    return int(count)
+
+async def iter_top_pages(parsed: ODataQuery, metadata: Optional[dict] = None, max_page_size: Optional[int] = None):
+    """
+    Async generator over the pages of a $top query. Only the top rows are requested, in
+    $skip/$top windows of at most max_page_size rows, so a top-N that fits in one page is a
+    single request instead of a walk over every page of the unlimited result.
+    """
+    max_page_size = max_page_size or config.ODATA_MAX_PAGE_SIZE
+    page_headers = {"Prefer": f"odata.maxpagesize={max_page_size}"}
+    session = await get_odata_client().get_session()
+    start = parsed.skip or 0
+    fetched = 0
+    while fetched < parsed.top:
+        window = replace(parsed, top=min(max_page_size, parsed.top - fetched), skip=start + fetched or None)
+        page = await fetch_data(session, config.ODATA_ENDPOINT + format_odata_query(window), page_headers)
+        rows = page.get("value") or []
+        if fetched == 0 and metadata is not None:
+            total = page.get("@odata.count")
+            metadata["count"] = None if total is None else min(max(total - start, 0), parsed.top)
+        if rows:
+            yield rows
+        fetched += len(rows)
+        # A short page without a next link is the end of the result, not the service's page size
+        if not rows or (len(rows) < window.top and not get_next_link(page, config.ODATA_ENDPOINT)):
+            return
+
+async def iter_query_pages(filter: str, metadata: Optional[dict] = None):
+    """
+    Pages of filter against the configured endpoint. A count query ($top=0&$count=true) yields
+    one {"Count": n} row, a $top query only its top rows, and other queries are fetched in date
+    partitions when they allow it.
+    """
+    get_schema_cache().refresh_in_background()
+    try:
+        parsed = parse_odata_query(filter)
+    except ODataQueryError:
+        parsed = None
+    if parsed is not None and is_count_query(parsed):
+        count = await fetch_count(parsed)
+        if metadata is not None:
+            metadata["count"] = 1
+        yield [{"Count": count}]
+        return
+    if parsed is not None and parsed.top:
+        async for page in iter_top_pages(parsed, metadata):
+            yield page
+        return
+    if config.ODATA_PARTITIONING == "auto":
+        plan = plan_partitioning(filter, config.ODATA_PARTITION_FIELD)
+        if plan is not None:
+            async for page in iter_partitioned_pages(*plan, metadata=metadata):
+                yield page
+            return
+    async for page in iter_odata_pages(config.ODATA_ENDPOINT + filter, metadata=metadata):
+        yield page
+
+async def call_odata_query(endpoint: str, budget: Optional[RequestBudget] = None):
     aggregated_data = []
-    skiptoken = 0
-    total_count = None  # Will be set to @odata.count from the first response
-    batch_size = 5  # Number of requests to send concurrently
 
-    if config.LOCAL_ENV:
-        auth = BasicAuth(config.ODATA_USERNAME, config.ODATA_PASSWORD)
-        headers = None
+    async def collect():
+        async for page in iter_odata_pages(endpoint):
+            aggregated_data.extend(page)
+
+    if budget is None:
+        await collect()
     else:
-        headers = config.ODATA_HEADERS
-        auth = None
+        # Cancelling collect() closes the page generator, which cancels its in-flight requests
+        await budget.run(collect(), "odata")
+
+    return aggregated_data
+
+async def get_cached_result(filter: str) -> Optional[pa.Table]:
+    if not config.RESULT_CACHE_ENABLED:
+        return None
+    # A disk hit reads the file's footer and maps it, so the lookup runs off the event loop
+    return await asyncio.get_running_loop().run_in_executor(None, get_result_cache().get, config.ODATA_ENDPOINT, filter)
+
+def new_result_builder() -> Optional[ResultBuilder]:
+    return ResultBuilder(config.RESULT_CACHE_MAX_BYTES) if config.RESULT_CACHE_ENABLED else None
+
+async def cache_result(filter: str, builder: Optional[ResultBuilder]):
+    if builder is None:
+        return
+    table = await asyncio.get_running_loop().run_in_executor(None, builder.table)
+    get_result_cache().set(config.ODATA_ENDPOINT, filter, table)
+
+async def iter_cached_pages(table: pa.Table, arrow: bool = False):
+    """
+    Pages of a cached table, as record batches if arrow is set, else converted to rows one
+    batch at a time off the event loop.
+    """
+    for batch in table.to_batches(max_chunksize=config.ODATA_MAX_PAGE_SIZE):
+        if arrow:
+            yield batch
+        else:
+            yield await asyncio.get_running_loop().run_in_executor(None, batch.to_pylist)
 
-    async with ClientSession(auth = auth, headers=headers) as session:
+def odata_flight_key(kind: str, filter: str) -> tuple:
+    return (kind, ResultCache.make_key(config.ODATA_ENDPOINT, filter))
+
+async def fetch_odata(filter: str) -> list:
+    """Full result of filter, from the cache or from one fetch shared by all concurrent callers."""
+    cached = await get_cached_result(filter)
+    if cached is not None:
+        return await asyncio.get_running_loop().run_in_executor(None, cached.to_pylist)
+
+    async def fetch():
+        rows = []
+        builder = new_result_builder()
+        async for page in iter_query_pages(filter):
+            rows.extend(page)
+            if builder is not None:
+                await builder.add(page)
+        await cache_result(filter, builder)
+        return rows
+
+    return await get_single_flight().run(odata_flight_key("odata", filter), fetch)
+
+async def stream_odata(filter: str, metadata: Optional[dict] = None, arrow: bool = False):
+    """
+    Pages of filter, from the cache in batches of ODATA_MAX_PAGE_SIZE rows or from one paged
+    fetch whose pages are shared by all concurrent callers. A fully fetched result is cached
+    if it fits in the cache; only then are its pages kept, as Arrow tables. With arrow set,
+    cached batches are yielded as they are, for callers that build Arrow columns anyway
+    (see ColumnarBuilder); fetched pages are always lists of rows.
+    """
+    cached = await get_cached_result(filter)
+    if cached is not None:
+        if metadata is not None:
+            # The cache holds rows only, so the count is the number of cached rows
+            metadata["count"] = cached.num_rows
+        async for page in iter_cached_pages(cached, arrow):
+            yield page
+        return
+
+    async def fetch(flight_metadata: dict):
+        builder = new_result_builder()
+        async for page in iter_query_pages(filter, flight_metadata):
+            yield page
+            if builder is not None:
+                await builder.add(page)
+        await cache_result(filter, builder)
+
+    async for page in get_single_flight().stream(odata_flight_key("odata-pages", filter), fetch, metadata):
+        yield page
+
+def run_fetch_data(api_url):
+    return get_odata_client().run_sync(call_odata_query(api_url))
+
+
+def iter_odata(filter: str, max_pending: int = 5, arrow: bool = False):
+    """
+    Synchronous generator over the pages of an OData query, for callers such as the
+    Streamlit app that are not running an event loop.
+
+    The async page generator runs on the shared OData client's loop and hands pages over
+    through a bounded queue, so at most max_pending pages are buffered ahead of the consumer.
+    Pages come from stream_odata, so cached and concurrent identical pulls are not refetched;
+    arrow is passed on to it.
+    """
+    if config.ODATA_ENDPOINT is None:
+        raise HTTPException(status_code=500, detail="ENDPOINT IS NULL. PLEASE CHECK ENV VARS")
+
+    pages = queue.Queue(maxsize=max_pending)
+    stopped = threading.Event()
+    done = object()
+
+    async def put(item):
+        # Blocking puts run in the default executor, so a full queue never stalls the shared loop
+        await asyncio.get_running_loop().run_in_executor(None, pages.put, item)
+
+    async def produce():
+        try:
+            async for page in stream_odata(filter, arrow=arrow):
+                await put(page)
+                if stopped.is_set():
+                    break
+        except Exception as e:
+            await put(e)
+        finally:
+            await put(done)
+
+    producer = asyncio.run_coroutine_threadsafe(produce(), get_odata_client().get_loop())
+
+    try:
         while True:
-            # Create batch of requests
-            tasks = [
-                fetch_data(session, f"{endpoint}&$skip={skiptoken + i * 100}")
-                for i in range(batch_size)
-            ]
-            responses = await asyncio.gather(*tasks)
-
-            for response_data in responses:
-                if response_data:
-                    # Initialize total_count from the first response
-                    if total_count is None and "@odata.count" in response_data:
-                        total_count = response_data["@odata.count"]
-
-                    # Append values if they exist in the response
-                    if "value" in response_data:
-                        aggregated_data.extend(response_data["value"])
-
-                    # Stop fetching if skiptoken exceeds total_count
-                    if total_count is not None and skiptoken >= total_count:
-                        break
-
-            # Move to the next set of data by increasing skiptoken by batch_size * 100
-            skiptoken += batch_size * 100
-
-            # Stop if all data has been fetched
-            if total_count is not None and skiptoken >= total_count:
+            item = pages.get()
+            if item is done:
                 break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # Unblock the producer if the consumer stopped early
+        stopped.set()
+        while not producer.done():
+            try:
+                pages.get(timeout=0.1)
+            except queue.Empty:
+                pass
 
-    return aggregated_data
 
-def run_fetch_data(api_url):
-    return asyncio.run(call_odata_query(api_url))
+async def acall_odata(filter: str, budget: Optional[RequestBudget] = None):
+    """Awaitable variant of call_odata for code already running on the server's event loop."""
+    if config.ODATA_ENDPOINT is None:
+        raise HTTPException(status_code=500, detail="ENDPOINT IS NULL. PLEASE CHECK ENV VARS")
+
+    start_time = time.time()
+    if budget is None:
+        response_content = await fetch_odata(filter)
+    else:
+        response_content = await budget.run(fetch_odata(filter), "odata")
+    print(f"Total execution time: {time.time() - start_time:.2f} seconds")
+
+    return response_content
 
 
 def call_odata(filter: str):
@@ -75,20 +527,16 @@ def call_odata(filter: str):
         if config.ODATA_ENDPOINT is None:
             raise HTTPException("ENDPOINT IS NULL. PLEASE CHECK ENV VARS")
 
-        api_url = config.ODATA_ENDPOINT + filter
-        # Using ThreadPolExecutor for running async function in a synchronous context
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            # Track start time
-            start_time = time.time()
+        # Track start time
+        start_time = time.time()
+
+        # Run the async fetch on the shared client's loop
+        response_content = get_odata_client().run_sync(fetch_odata(filter))
 
-            # Call the async function
-            future = executor.submit(run_fetch_data, api_url)
-            response_content = future.result()  # Get the result of the future
+        # Print wall time
+        wall_time = time.time() - start_time
+        print(f"Total execution time: {wall_time:.2f} seconds")
 
-            # Print wall time
-            wall_time = time.time() - start_time
-            print(f"Total execution time: {wall_time:.2f} seconds")
-            
         return response_content
     except Exception as e:
         raise HTTPException(f"An error has occured. Please check through your implementations {e}")
\ No newline at end of file
@@ -0,0 +1,177 @@
+from typing import Dict, Iterable, List, Optional, Union
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from src.utils.schema import BUILTIN_ENTITY, DATE_FIELD, EntityType
+
+
+def parse_dates(values: pa.Array) -> pa.Array:
+    """
+    Parses a string column of the gateway's date formats into date32: '20230101' (the
+    Edm.String dates of ZC_GRN_PO_DET), ISO dates or datetimes, and OData v2 '/Date(ms)/'.
+    The format is taken from the first non-null value.
+    """
+    if not pa.types.is_string(values.type):
+        return values.cast(pa.date32())
+    present = values.drop_null()
+    if not len(present):
+        return values.cast(pa.date32())
+    sample = present[0].as_py()
+    if sample.startswith("/Date("):
+        millis = pc.extract_regex(values, r"/Date\((?P<ms>-?\d+)").field("ms")
+        return millis.cast(pa.int64()).cast(pa.timestamp("ms")).cast(pa.date32())
+    if len(sample) == 8 and sample.isdigit():
+        return pc.strptime(values, format="%Y%m%d", unit="s").cast(pa.date32())
+    return pc.utf8_slice_codeunits(values, 0, 10).cast(pa.date32())
+
+def column_array(rows: List[dict], column: str) -> pa.Array:
+    values = [row.get(column) for row in rows]
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Mixed value types, e.g. numbers and strings
+        return pa.array([None if value is None else str(value) for value in values], pa.string())
+
+def convert_column(values: pa.Array, target: Optional[pa.DataType]) -> pa.Array:
+    if target is None:
+        return values
+    if pa.types.is_dictionary(target):
+        return values.cast(pa.string()).dictionary_encode()
+    if pa.types.is_date(target):
+        return parse_dates(values)
+    if pa.types.is_decimal(target) and pa.types.is_floating(values.type):
+        # A float-to-decimal cast rounds to the scale (1.239 -> 1.24), while parsing the
+        # shortest text of each float raises on digits the scale cannot hold
+        return values.cast(pa.string()).cast(target)
+    return values.cast(target)
+
+def common_type(types: set) -> pa.DataType:
+    # Pages of an untyped column can infer different types: integers and floats widen to
+    # int64 or float64, anything else is kept as text
+    if not types:
+        return pa.null()
+    if len(types) == 1:
+        return next(iter(types))
+    if all(pa.types.is_integer(t) for t in types):
+        return pa.int64()
+    if all(pa.types.is_integer(t) or pa.types.is_floating(t) or pa.types.is_decimal(t) for t in types):
+        return pa.float64()
+    return pa.string()
+
+EDM_TYPES = {
+    "Edm.Boolean": pa.bool_(), "Edm.Byte": pa.uint8(), "Edm.SByte": pa.int8(), "Edm.Int16": pa.int16(),
+    "Edm.Int32": pa.int32(), "Edm.Int64": pa.int64(), "Edm.Single": pa.float32(), "Edm.Double": pa.float64(),
+    "Edm.String": pa.string(), "Edm.Guid": pa.string(), "Edm.DateTime": pa.date32(), "Edm.Date": pa.date32(),
+}
+
+def schema_types(entity: Optional[EntityType]) -> Dict[str, pa.DataType]:
+    """
+    Column types from the entity's $metadata, else from BUILTIN_ENTITY. Text columns other
+    than the keys are dictionary-encoded, as they repeat (suppliers, plants, materials), and
+    DATE_FIELD, which the service declares as text, is parsed as dates. Types without a
+    mapping (e.g. Edm.DateTimeOffset) are left to inference.
+    """
+    entity = entity or BUILTIN_ENTITY
+    types = {}
+    for name, prop in entity.properties.items():
+        if prop.type == "Edm.Decimal":
+            target = pa.decimal128(prop.precision, prop.scale or 0) if prop.precision else pa.float64()
+        else:
+            target = EDM_TYPES.get(prop.type)
+        if target == pa.string() and name not in entity.keys:
+            target = pa.dictionary(pa.int32(), pa.string())
+        if name == DATE_FIELD:
+            target = pa.date32()
+        if target is not None:
+            types[name] = target
+    return types
+
+class ColumnarBuilder:
+    """
+    Collects OData pages into an Arrow table, one typed column chunk per page, so the decoded
+    rows of only one page are alive at a time and the result never exists as a list of dicts.
+
+    Column types come from types, by default those of the built-in entity (see schema_types);
+    other columns keep the type Arrow infers, widened across pages (see common_type). If a
+    page has a value a typed column cannot hold (e.g. a cost with more decimals than the
+    scale), the column falls back to float64 (decimals) or string for the whole table rather
+    than failing the pull.
+    """
+    def __init__(self, types: Optional[Dict[str, pa.DataType]] = None):
+        self.types = dict(schema_types(None) if types is None else types)
+        self.chunks: Dict[str, List[pa.Array]] = {}
+        self.num_rows = 0
+
+    def append(self, page: Union[List[dict], pa.RecordBatch]):
+        """Adds a page of rows, or a record batch such as a page of a cached result."""
+        if not len(page):
+            return
+        rows = None
+        if isinstance(page, pa.RecordBatch):
+            struct = page.to_struct_array()
+            names = page.schema.names
+        else:
+            rows = page
+            try:
+                # Decodes the page in C++ into a struct array with a field per key seen in any row
+                struct = pa.array(rows)
+                names = list(rows[0]) + [field.name for field in struct.type]
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                struct = None
+                names = [key for row in rows for key in row]
+        # Columns first seen in this page are backfilled with nulls for the earlier rows
+        for column in dict.fromkeys(names):
+            if column not in self.chunks:
+                self.types.setdefault(column, None)
+                self.chunks[column] = [pa.nulls(self.num_rows)] if self.num_rows else []
+        for column, chunks in self.chunks.items():
+            if struct is None:
+                values = column_array(rows, column)
+            elif column in names:
+                values = struct.field(column)
+            else:
+                values = pa.nulls(len(page))
+            chunks.append(self._convert(column, values))
+        self.num_rows += len(page)
+
+    def _convert(self, column: str, values: pa.Array) -> pa.Array:
+        target = self.types[column]
+        try:
+            return convert_column(values, target)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError) as e:
+            if target is None:
+                raise
+            fallback = pa.float64() if pa.types.is_decimal(target) else pa.string()
+            print(f"Column {column} does not fit {target} ({e}), keeping it as {fallback}")
+            self.types[column] = fallback
+            self.chunks[column][:] = [chunk.cast(fallback) for chunk in self.chunks[column]]
+            return values.cast(fallback)
+
+    def table(self) -> pa.Table:
+        columns = {}
+        for column, chunks in self.chunks.items():
+            chunks = [chunk for chunk in chunks if len(chunk)]
+            target = common_type({chunk.type for chunk in chunks if not pa.types.is_null(chunk.type)})
+            columns[column] = pa.chunked_array([chunk.cast(target) for chunk in chunks], type=target)
+        # Each page encoded its own dictionary; one shared dictionary per column for pandas
+        return pa.table(columns).unify_dictionaries() if columns else pa.table({})
+
+def pages_to_table(pages: Iterable[Union[List[dict], pa.RecordBatch]], types: Optional[Dict[str, pa.DataType]] = None) -> pa.Table:
+    builder = ColumnarBuilder(types)
+    for page in pages:
+        builder.append(page)
+    return builder.table()
+
+def pandas_type(arrow_type: pa.DataType):
+    # Dictionary columns become Categoricals and dates datetime64, which charts and the
+    # insights agent's generated code handle natively; everything else stays Arrow-backed
+    if pa.types.is_dictionary(arrow_type) or pa.types.is_date(arrow_type):
+        return None
+    return pd.ArrowDtype(arrow_type)
+
+def to_pandas(table: pa.Table) -> pd.DataFrame:
+    """
+    DataFrame over the table. String and decimal columns are pd.ArrowDtype views of the
+    Arrow buffers rather than copies into Python objects.
+    """
+    return table.to_pandas(types_mapper=pandas_type, date_as_object=False)
@@ -0,0 +1,93 @@
+import re
+from dataclasses import dataclass
+from typing import Iterable, Optional, Tuple
+from src.utils.schema import DATE_FIELD, get_entity
+from src.utils.appconfig import get_config_instance
+from src.utils.odata_parser import ODataQuery, ODataQueryError, format_odata_query, parse_odata_query
+from src.utils.projection import key_fields, mentioned_field_groups, plan_projection
+
+
+config = get_config_instance()
+
+# Only questions that open by asking for a count: "list orders with the number of items" wants rows
+COUNT_PATTERN = re.compile(
+    r"^(?:(?:what is|what's|show me|give me|tell me)\s+)?(?:the\s+)?(?:total\s+)?(?:how many|number of|count)\b"
+)
+EXISTS_PATTERN = re.compile(r"^(is there|are there|was there|were there|do we have|does|did|has|have)\b.*\bany\b|\bexists?\b")
+# "<superlative> N <rows>", with up to two words before the row noun ("top 5 open purchase orders"),
+# so "last 3 months" or "top 5 suppliers by number of orders" are not read as a row limit
+TOP_PATTERN = re.compile(
+    r"\b(top|first|largest|biggest|highest|most expensive|lowest|smallest|cheapest|"
+    r"latest|newest|most recent|last|oldest|earliest)\s+(\d+)\s+"
+    r"(?!(?:days?|weeks?|months?|quarters?|years?)\b)"
+    r"(?:(?!(?:with|of|by|for|from|in|per|and)\b)[a-z-]+\s+){0,2}?"
+    r"(?:orders?|pos?|items?|lines?|rows?|records?|entry|entries|receipts?|grns?)\b"
+)
+ASCENDING_WORDS = {"lowest", "smallest", "cheapest", "oldest", "earliest"}
+# Superlatives that imply a sort when the question does not say what to sort by
+AMOUNT_WORDS = {"largest", "biggest", "highest", "most expensive", "lowest", "smallest", "cheapest"}
+DATE_WORDS = {"latest", "newest", "most recent", "last", "oldest", "earliest"}
+AMOUNT_TYPES = ("Edm.Decimal", "Edm.Double")
+DATE_TYPES = ("Edm.DateTime", "Edm.Date", "Edm.DateTimeOffset")
+
+@dataclass
+class QueryPlan:
+    intent: str  # rows, top, count or exists
+    query: str
+
+
+def top_field(word: str) -> Optional[str]:
+    """The field a superlative sorts by: the entity's first decimal field, or its date field."""
+    properties = get_entity().properties
+    if word in AMOUNT_WORDS:
+        return next((name for name, prop in properties.items() if prop.type in AMOUNT_TYPES), None)
+    if word in DATE_WORDS:
+        if DATE_FIELD in properties:
+            return DATE_FIELD
+        return next((name for name, prop in properties.items() if prop.type in DATE_TYPES), None)
+    return None
+
+def top_order(text: str, word: str) -> Optional[Tuple[str, str]]:
+    """The ($orderby field, direction) of "top 5 ... by cost" or "latest 10 ...", if the question implies one."""
+    direction = "asc" if word in ASCENDING_WORDS else "desc"
+    by = re.search(r"\bby\s+(.+)$", text)
+    groups = mentioned_field_groups(by.group(1)) if by else []
+    if groups:
+        return groups[0][0], direction
+    field = top_field(word)
+    return (field, direction) if field else None
+
+def count_query(parsed: ODataQuery) -> str:
+    """The query that returns only @odata.count of parsed's rows."""
+    return format_odata_query(ODataQuery(filter=parsed.filter, top=0, count=True))
+
+def is_count_query(parsed: ODataQuery) -> bool:
+    return parsed.top == 0 and bool(parsed.count) and not parsed.apply
+
+def plan_query(query: str, text: str, requested: Optional[Iterable[str]] = None) -> QueryPlan:
+    """
+    Picks the cheapest request that answers the question. A raw-row query for "how many ..."
+    becomes a count ($top=0&$count=true), "are there any ..." fetches one matching row, and
+    "top/latest N ..." gets the $orderby and $top the translation may have left out, so each is
+    answered by a single request instead of a full pull. Row queries get plan_projection.
+    """
+    try:
+        parsed = parse_odata_query(query)
+    except ODataQueryError:
+        return QueryPlan("rows", query)
+    if config.ODATA_INTENT_FAST_PATHS == "auto" and not parsed.apply and parsed.top is None and parsed.skip is None:
+        text = text.lower().strip()
+        if COUNT_PATTERN.search(text):
+            return QueryPlan("count", count_query(parsed))
+        if EXISTS_PATTERN.search(text):
+            # One row settles it; a count would make the gateway count every match
+            return QueryPlan("exists", format_odata_query(ODataQuery(filter=parsed.filter, select=key_fields(), top=1)))
+        match = TOP_PATTERN.search(text)
+        if match:
+            # Without an implied order, "first N" are the first N in the service's (key) order
+            order = top_order(text, match.group(1))
+            parsed.orderby = parsed.orderby or ([order] if order else [])
+            parsed.top = int(match.group(2))
+            query = format_odata_query(parsed)
+    intent = "top" if parsed.top is not None and not parsed.apply else "rows"
+    return QueryPlan(intent, plan_projection(query, text, requested))
@@ -0,0 +1,80 @@
+import asyncio
+import atexit
+import threading
+from typing import Optional
+from aiohttp import ClientSession, BasicAuth, TCPConnector
+from src.utils.appconfig import get_config_instance
+
+
+config = get_config_instance()
+
+class ODataClient:
+    """
+    Process-wide owner of the aiohttp session used for OData calls.
+
+    The session keeps connections alive between queries, so short queries skip the
+    TCP/TLS and auth handshakes. It is bound to the event loop it was started on: the
+    FastAPI lifespan starts it on the server loop, while synchronous callers (the
+    Streamlit app) get a background loop thread through run_sync.
+    """
+    def __init__(self):
+        self._session: Optional[ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    async def start(self):
+        if self._session is not None:
+            return
+
+        if config.LOCAL_ENV:
+            auth = BasicAuth(config.ODATA_USERNAME, config.ODATA_PASSWORD)
+            headers = None
+        else:
+            headers = config.ODATA_HEADERS
+            auth = None
+
+        connector = TCPConnector(
+            limit=config.ODATA_POOL_LIMIT,
+            limit_per_host=config.ODATA_POOL_LIMIT_PER_HOST,
+            ttl_dns_cache=config.ODATA_DNS_CACHE_TTL,
+            keepalive_timeout=config.ODATA_KEEPALIVE_TIMEOUT,
+        )
+        self._loop = asyncio.get_running_loop()
+        self._session = ClientSession(auth=auth, headers=headers, connector=connector)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+        self._session = None
+        self._loop = None
+
+    async def get_session(self) -> ClientSession:
+        if self._session is None:
+            await self.start()
+        elif self._loop is not asyncio.get_running_loop():
+            raise RuntimeError("ODataClient is bound to another event loop. Use run_sync from synchronous code.")
+        return self._session
+
+    def get_loop(self) -> asyncio.AbstractEventLoop:
+        """Returns the loop owning the session, starting a background loop thread if there is none."""
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=loop.run_forever, name="odata-client", daemon=True)
+                self._thread.start()
+                asyncio.run_coroutine_threadsafe(self.start(), loop).result()
+                atexit.register(lambda: asyncio.run_coroutine_threadsafe(self.close(), loop).result())
+            return self._loop
+
+    def run_sync(self, coro):
+        """Runs a coroutine on the session's loop and blocks until it completes. Not for use on that loop."""
+        return asyncio.run_coroutine_threadsafe(coro, self.get_loop()).result()
+
+
+odata_client = None
+def get_odata_client() -> ODataClient:
+    global odata_client
+    if odata_client is None:
+        odata_client = ODataClient()
+    return odata_client
@@ -0,0 +1,451 @@
+import datetime
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple, Union
+from src.utils.schema import DATE_FIELD, INTEGER_TYPES, NUMBER_TYPES, get_entity, get_fields
+
+
+class ODataQueryError(ValueError):
+    """Raised for a query that would be rejected by the gateway. The message says what to fix."""
+
+
+COMPARISON_OPERATORS = {"eq", "ne", "gt", "ge", "lt", "le"}
+FUNCTIONS = {
+    "contains": 2, "startswith": 2, "endswith": 2, "substringof": 2, "indexof": 2,
+    "tolower": 1, "toupper": 1, "trim": 1, "length": 1, "year": 1, "month": 1, "day": 1,
+}
+TEXT_FUNCTIONS = {"contains", "startswith", "endswith", "substringof"}
+AGGREGATE_METHODS = {"sum", "min", "max", "average", "countdistinct"}
+QUERY_OPTIONS = ["$apply", "$filter", "$select", "$orderby", "$top", "$skip", "$count"]
+
+TOKEN_PATTERN = re.compile(r"\s*(?:(?P<string>'(?:[^']|'')*')|(?P<number>-?\d+(?:\.\d+)?)(?![\w])|(?P<name>\$?[A-Za-z_][\w.]*)|(?P<punct>[(),/]))")
+
+
+@dataclass
+class Field:
+    name: str
+
+@dataclass
+class Literal:
+    value: Union[str, int, float, bool, None]
+
+@dataclass
+class Call:
+    name: str
+    args: list
+
+@dataclass
+class Compare:
+    op: str
+    left: object
+    right: object
+
+@dataclass
+class BoolOp:
+    op: str
+    operands: list
+
+@dataclass
+class Not:
+    operand: object
+
+@dataclass
+class AggregateExpression:
+    field: Optional[str]
+    method: str
+    alias: str
+
+@dataclass
+class FilterStep:
+    expression: object
+
+@dataclass
+class GroupByStep:
+    fields: List[str]
+    aggregates: List[AggregateExpression] = field(default_factory=list)
+
+@dataclass
+class AggregateStep:
+    aggregates: List[AggregateExpression]
+
+@dataclass
+class ODataQuery:
+    apply: list = field(default_factory=list)
+    filter: object = None
+    select: List[str] = field(default_factory=list)
+    orderby: List[Tuple[str, str]] = field(default_factory=list)
+    top: Optional[int] = None
+    skip: Optional[int] = None
+    count: Optional[bool] = None
+
+
+class Tokens:
+    def __init__(self, text: str, option: str):
+        self.option = option
+        self.items = []
+        position = 0
+        text = text.rstrip()
+        while position < len(text):
+            match = TOKEN_PATTERN.match(text, position)
+            if not match or match.end() == position:
+                raise ODataQueryError(f"{option}: unexpected character '{text[position:].strip()[:1]}' at position {position}")
+            kind = match.lastgroup
+            self.items.append((kind, match.group(kind)))
+            position = match.end()
+        self.index = 0
+
+    def peek(self, offset: int = 0):
+        index = self.index + offset
+        return self.items[index] if index < len(self.items) else (None, None)
+
+    def next(self):
+        token = self.peek()
+        if token[0] is None:
+            raise ODataQueryError(f"{self.option}: unexpected end of expression")
+        self.index += 1
+        return token
+
+    def expect(self, value: str):
+        kind, text = self.next()
+        if text != value:
+            raise ODataQueryError(f"{self.option}: expected '{value}' but found '{text}'")
+
+    def accept(self, value: str) -> bool:
+        if self.peek()[1] == value:
+            self.index += 1
+            return True
+        return False
+
+    def name(self) -> str:
+        kind, text = self.next()
+        if kind != "name":
+            raise ODataQueryError(f"{self.option}: expected a field name but found '{text}'")
+        return text
+
+    def done(self):
+        if self.peek()[0] is not None:
+            raise ODataQueryError(f"{self.option}: unexpected '{self.peek()[1]}' after the end of the expression")
+
+
+def parse_expression(tokens: Tokens):
+    operands = [parse_and(tokens)]
+    while tokens.accept("or"):
+        operands.append(parse_and(tokens))
+    return operands[0] if len(operands) == 1 else BoolOp("or", operands)
+
+def parse_and(tokens: Tokens):
+    operands = [parse_not(tokens)]
+    while tokens.accept("and"):
+        operands.append(parse_not(tokens))
+    return operands[0] if len(operands) == 1 else BoolOp("and", operands)
+
+def parse_not(tokens: Tokens):
+    if tokens.accept("not"):
+        return Not(parse_not(tokens))
+    left = parse_operand(tokens)
+    kind, text = tokens.peek()
+    if kind == "name" and text.lower() in COMPARISON_OPERATORS:
+        if text not in COMPARISON_OPERATORS:
+            raise ODataQueryError(f"{tokens.option}: operators are lower case, use '{text.lower()}' instead of '{text}'")
+        tokens.next()
+        return Compare(text, left, parse_operand(tokens))
+    return left
+
+def parse_operand(tokens: Tokens):
+    kind, text = tokens.next()
+    if text == "(":
+        expression = parse_expression(tokens)
+        tokens.expect(")")
+        return expression
+    if kind == "string":
+        return Literal(text[1:-1].replace("''", "'"))
+    if kind == "number":
+        return Literal(float(text) if "." in text else int(text))
+    if kind == "name":
+        if text in ("true", "false"):
+            return Literal(text == "true")
+        if text == "null":
+            return Literal(None)
+        if tokens.peek()[1] == "(":
+            if text not in FUNCTIONS:
+                raise ODataQueryError(f"{tokens.option}: unsupported function '{text}'")
+            tokens.next()
+            args = [parse_expression(tokens)]
+            while tokens.accept(","):
+                args.append(parse_expression(tokens))
+            tokens.expect(")")
+            if len(args) != FUNCTIONS[text]:
+                raise ODataQueryError(f"{tokens.option}: {text}() takes {FUNCTIONS[text]} argument(s), got {len(args)}")
+            return Call(text, args)
+        return Field(text)
+    raise ODataQueryError(f"{tokens.option}: unexpected '{text}'")
+
+def parse_aggregates(tokens: Tokens) -> List[AggregateExpression]:
+    aggregates = []
+    while True:
+        if tokens.accept("$count"):
+            field_name, method = None, "count"
+        else:
+            field_name = tokens.name()
+            tokens.expect("with")
+            method = tokens.name()
+            if method not in AGGREGATE_METHODS:
+                raise ODataQueryError(f"$apply: unsupported aggregation method '{method}', use one of {', '.join(sorted(AGGREGATE_METHODS))} or $count")
+        tokens.expect("as")
+        aggregates.append(AggregateExpression(field_name, method, tokens.name()))
+        if not tokens.accept(","):
+            return aggregates
+
+def parse_apply(text: str) -> list:
+    tokens = Tokens(text, "$apply")
+    steps = []
+    while True:
+        step = tokens.name()
+        tokens.expect("(")
+        if step == "filter":
+            steps.append(FilterStep(parse_expression(tokens)))
+        elif step == "groupby":
+            tokens.expect("(")
+            fields = [tokens.name()]
+            while tokens.accept(","):
+                fields.append(tokens.name())
+            tokens.expect(")")
+            aggregates = []
+            if tokens.accept(","):
+                tokens.expect("aggregate")
+                tokens.expect("(")
+                aggregates = parse_aggregates(tokens)
+                tokens.expect(")")
+            steps.append(GroupByStep(fields, aggregates))
+        elif step == "aggregate":
+            steps.append(AggregateStep(parse_aggregates(tokens)))
+        else:
+            raise ODataQueryError(f"$apply: unsupported transformation '{step}', use filter, groupby or aggregate")
+        tokens.expect(")")
+        if not tokens.accept("/"):
+            tokens.done()
+            return steps
+
+def parse_name_list(text: str, option: str) -> List[str]:
+    tokens = Tokens(text, option)
+    names = [tokens.name()]
+    while tokens.accept(","):
+        names.append(tokens.name())
+    tokens.done()
+    return names
+
+def parse_orderby(text: str) -> List[Tuple[str, str]]:
+    keys = []
+    for part in split_outside_quotes(text, ","):
+        words = part.split()
+        if not words or len(words) > 2 or (len(words) == 2 and words[1] not in ("asc", "desc")):
+            raise ODataQueryError(f"$orderby: expected 'field [asc|desc]' but found '{part.strip()}'")
+        keys.append((words[0], words[1] if len(words) == 2 else "asc"))
+    return keys
+
+def parse_int(text: str, option: str) -> int:
+    if not text.strip().isdigit():
+        raise ODataQueryError(f"{option}: expected a non-negative integer but found '{text}'")
+    return int(text)
+
+def split_outside_quotes(text: str, separator: str) -> List[str]:
+    parts, current, quoted = [], [], False
+    for char in text:
+        if char == "'":
+            quoted = not quoted
+        if char == separator and not quoted:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+    parts.append("".join(current))
+    return parts
+
+
+def parse_odata_query(query: str) -> ODataQuery:
+    """Parses the query options of an OData v4 URL ($apply, $filter, $select, $orderby, $top, $skip, $count) into an AST."""
+    parsed = ODataQuery()
+    seen = set()
+    for param in split_outside_quotes(query.lstrip("?&"), "&"):
+        if not param.strip():
+            continue
+        name, separator, value = param.partition("=")
+        name = name.strip()
+        if not separator:
+            raise ODataQueryError(f"'{param}' is not a query option, expected name=value")
+        if name not in QUERY_OPTIONS:
+            raise ODataQueryError(f"Unsupported query option '{name}', use {', '.join(QUERY_OPTIONS)}")
+        if name in seen:
+            raise ODataQueryError(f"{name} is given more than once")
+        seen.add(name)
+
+        if name == "$apply":
+            parsed.apply = parse_apply(value)
+        elif name == "$filter":
+            tokens = Tokens(value, "$filter")
+            parsed.filter = parse_expression(tokens)
+            tokens.done()
+        elif name == "$select":
+            parsed.select = parse_name_list(value, "$select")
+        elif name == "$orderby":
+            parsed.orderby = parse_orderby(value)
+        elif name == "$top":
+            parsed.top = parse_int(value, "$top")
+        elif name == "$skip":
+            parsed.skip = parse_int(value, "$skip")
+        elif name == "$count":
+            if value.strip().lower() not in ("true", "false"):
+                raise ODataQueryError(f"$count: expected true or false but found '{value}'")
+            parsed.count = value.strip().lower() == "true"
+    return parsed
+
+
+def check_fields_in(expression, option: str, fields: List[str], date_fields: List[str], types: Dict[str, str]):
+    """
+    Checks field names, that date fields are only compared with valid 'YYYYMMDD' literals, and
+    that other literals match the EDM type of the field they are compared with.
+    """
+    if isinstance(expression, Field):
+        if expression.name not in fields:
+            raise ODataQueryError(f"{option}: unknown field '{expression.name}'. Valid fields are: {', '.join(fields)}")
+    elif isinstance(expression, Compare):
+        for side, other in ((expression.left, expression.right), (expression.right, expression.left)):
+            if isinstance(side, Field) and isinstance(other, Literal):
+                if side.name in date_fields:
+                    check_date_literal(other, side.name, option)
+                else:
+                    check_literal_type(other, side.name, types.get(side.name), option)
+        check_fields_in(expression.left, option, fields, date_fields, types)
+        check_fields_in(expression.right, option, fields, date_fields, types)
+    elif isinstance(expression, BoolOp):
+        for operand in expression.operands:
+            check_fields_in(operand, option, fields, date_fields, types)
+    elif isinstance(expression, Not):
+        check_fields_in(expression.operand, option, fields, date_fields, types)
+    elif isinstance(expression, Call):
+        for arg in expression.args:
+            if expression.name in TEXT_FUNCTIONS and isinstance(arg, Field) and types.get(arg.name, "Edm.String") != "Edm.String":
+                raise ODataQueryError(f"{option}: {expression.name}() needs a text field, but {arg.name} is {types[arg.name]}")
+            check_fields_in(arg, option, fields, date_fields, types)
+
+def check_literal_type(literal: Literal, field_name: str, edm_type: Optional[str], option: str):
+    value = literal.value
+    if value is None or edm_type is None:
+        return
+    if edm_type in INTEGER_TYPES:
+        valid, expected = isinstance(value, int) and not isinstance(value, bool), "a whole number"
+    elif edm_type in NUMBER_TYPES:
+        valid, expected = isinstance(value, (int, float)) and not isinstance(value, bool), "a number"
+    elif edm_type == "Edm.String":
+        valid, expected = isinstance(value, str), "a quoted string"
+    elif edm_type == "Edm.Boolean":
+        valid, expected = isinstance(value, bool), "true or false"
+    else:
+        return
+    if not valid:
+        raise ODataQueryError(f"{option}: {field_name} is {edm_type} and must be compared with {expected}, got {format_expression(literal)}")
+
+def check_date_literal(literal: Literal, field_name: str, option: str):
+    value = literal.value
+    try:
+        if not isinstance(value, str) or len(value) != 8:
+            raise ValueError
+        datetime.datetime.strptime(value, "%Y%m%d")
+    except ValueError:
+        raise ODataQueryError(f"{option}: {field_name} must be compared with a quoted date in YYYYMMDD format, got {format_expression(literal)}")
+
+def check_names(names: List[str], option: str, allowed: List[str]):
+    for name in names:
+        if name not in allowed:
+            raise ODataQueryError(f"{option}: unknown field '{name}'. Valid names here are: {', '.join(allowed)}")
+
+
+def validate_odata_query(query: Union[str, ODataQuery], fields: Optional[List[str]] = None,
+                         date_fields: Optional[List[str]] = None, types: Optional[Dict[str, str]] = None) -> ODataQuery:
+    """Parses the query if needed and checks it against the entity schema. Raises ODataQueryError on the first problem."""
+    parsed = parse_odata_query(query) if isinstance(query, str) else query
+    fields = fields or get_fields()
+    date_fields = date_fields if date_fields is not None else [DATE_FIELD]
+    types = types if types is not None else {name: prop.type for name, prop in get_entity().properties.items()}
+
+    # Names visible after each $apply step: groupby and aggregate replace the row shape
+    visible = list(fields)
+    for step in parsed.apply:
+        if isinstance(step, FilterStep):
+            check_fields_in(step.expression, "$apply", visible, date_fields, types)
+            continue
+        check_names(step.fields if isinstance(step, GroupByStep) else [], "$apply", visible)
+        for aggregate in step.aggregates:
+            if aggregate.field is not None:
+                check_names([aggregate.field], "$apply", visible)
+        visible = (step.fields if isinstance(step, GroupByStep) else []) + [aggregate.alias for aggregate in step.aggregates]
+
+    if parsed.filter is not None:
+        check_fields_in(parsed.filter, "$filter", visible, date_fields, types)
+    check_names(parsed.select, "$select", visible)
+    check_names([key for key, _ in parsed.orderby], "$orderby", visible)
+    return parsed
+
+
+def format_expression(expression, parent: Optional[str] = None) -> str:
+    if isinstance(expression, Field):
+        return expression.name
+    if isinstance(expression, Literal):
+        value = expression.value
+        if isinstance(value, bool):
+            return "true" if value else "false"
+        if value is None:
+            return "null"
+        if isinstance(value, str):
+            return "'" + value.replace("'", "''") + "'"
+        return str(value)
+    if isinstance(expression, Call):
+        return f"{expression.name}({','.join(format_expression(arg) for arg in expression.args)})"
+    if isinstance(expression, Compare):
+        text = f"{format_expression(expression.left, 'compare')} {expression.op} {format_expression(expression.right, 'compare')}"
+        return f"({text})" if parent == "not" else text
+    if isinstance(expression, Not):
+        return f"not {format_expression(expression.operand, 'not')}"
+    if isinstance(expression, BoolOp):
+        text = f" {expression.op} ".join(format_expression(operand, expression.op) for operand in expression.operands)
+        return text if parent in (None, expression.op) else f"({text})"
+    raise TypeError(f"Unknown expression node {expression!r}")
+
+def format_aggregates(aggregates: List[AggregateExpression]) -> str:
+    return ",".join(
+        f"$count as {aggregate.alias}" if aggregate.field is None else f"{aggregate.field} with {aggregate.method} as {aggregate.alias}"
+        for aggregate in aggregates
+    )
+
+def format_odata_query(parsed: ODataQuery) -> str:
+    """Serializes an AST into the canonical query string: fixed option order and normalized spacing."""
+    params = []
+    if parsed.apply:
+        steps = []
+        for step in parsed.apply:
+            if isinstance(step, FilterStep):
+                steps.append(f"filter({format_expression(step.expression)})")
+            elif isinstance(step, GroupByStep):
+                aggregates = f",aggregate({format_aggregates(step.aggregates)})" if step.aggregates else ""
+                steps.append(f"groupby(({','.join(step.fields)}){aggregates})")
+            else:
+                steps.append(f"aggregate({format_aggregates(step.aggregates)})")
+        params.append("$apply=" + "/".join(steps))
+    if parsed.filter is not None:
+        params.append("$filter=" + format_expression(parsed.filter))
+    if parsed.select:
+        params.append("$select=" + ",".join(parsed.select))
+    if parsed.orderby:
+        params.append("$orderby=" + ",".join(f"{key} desc" if direction == "desc" else key for key, direction in parsed.orderby))
+    if parsed.top is not None:
+        params.append(f"$top={parsed.top}")
+    if parsed.skip is not None:
+        params.append(f"$skip={parsed.skip}")
+    if parsed.count is not None:
+        params.append(f"$count={'true' if parsed.count else 'false'}")
+    return "&".join(params)
+
+
+def canonicalize_odata_query(query: str, **schema) -> str:
+    """Validates a query and returns its canonical form, which is also used as a cache key."""
+    return format_odata_query(validate_odata_query(query, **schema))
@@ -0,0 +1,95 @@
+import copy
+import datetime
+from typing import List, Optional, Tuple
+from src.utils.odata_parser import BoolOp, Compare, Field, Literal, ODataQuery, ODataQueryError, parse_odata_query, format_odata_query
+
+
+DATE_FORMAT = "%Y%m%d"
+
+def parse_date(value: str) -> datetime.date:
+    return datetime.datetime.strptime(value, DATE_FORMAT).date()
+
+def format_date(value: datetime.date) -> str:
+    return value.strftime(DATE_FORMAT)
+
+def conjuncts(expression) -> list:
+    if isinstance(expression, BoolOp) and expression.op == "and":
+        return [item for operand in expression.operands for item in conjuncts(operand)]
+    return [] if expression is None else [expression]
+
+def date_bound(expression, field: str) -> Optional[Tuple[str, datetime.date]]:
+    """Returns (operator, date) for a 'field op date' (or 'date op field') comparison, else None."""
+    if not isinstance(expression, Compare):
+        return None
+    op, left, right = expression.op, expression.left, expression.right
+    if isinstance(right, Field) and isinstance(left, Literal):
+        op = {"gt": "lt", "ge": "le", "lt": "gt", "le": "ge"}.get(op, op)
+        left, right = right, left
+    if not (isinstance(left, Field) and left.name == field and isinstance(right, Literal)):
+        return None
+    if op not in ("eq", "ge", "gt", "le", "lt") or not isinstance(right.value, str):
+        return None
+    try:
+        return op, parse_date(right.value)
+    except ValueError:
+        return None
+
+def find_date_range(parsed: ODataQuery, field: str) -> Optional[Tuple[datetime.date, datetime.date]]:
+    """Inclusive date range that the top-level 'and' of $filter imposes on field, if it is bounded on both sides."""
+    start = end = None
+    for expression in conjuncts(parsed.filter):
+        bound = date_bound(expression, field)
+        if bound is None:
+            continue
+        op, value = bound
+        if op in ("eq", "ge", "gt"):
+            value_start = value + datetime.timedelta(days=1) if op == "gt" else value
+            start = value_start if start is None else max(start, value_start)
+        if op in ("eq", "le", "lt"):
+            value_end = value - datetime.timedelta(days=1) if op == "lt" else value
+            end = value_end if end is None else min(end, value_end)
+    if start is None or end is None:
+        return None
+    return start, end
+
+def is_partitionable(parsed: ODataQuery, field: str) -> bool:
+    """
+    Partitions can be fetched separately and concatenated only for plain row queries:
+    no $apply (aggregates would be computed per partition), no $top/$skip, and an order,
+    if any, that starts with the partition field.
+    """
+    if parsed.apply or parsed.top is not None or parsed.skip is not None:
+        return False
+    return not parsed.orderby or parsed.orderby[0][0] == field
+
+def partition_query(parsed: ODataQuery, field: str, start: datetime.date, end: datetime.date) -> str:
+    """The query restricted to start <= field <= end, with $count so each partition reports its size."""
+    kept = [expression for expression in conjuncts(parsed.filter) if date_bound(expression, field) is None]
+    bounds = [
+        Compare("ge", Field(field), Literal(format_date(start))),
+        Compare("le", Field(field), Literal(format_date(end))),
+    ]
+    partition = copy.copy(parsed)
+    partition.filter = BoolOp("and", kept + bounds)
+    partition.count = True
+    return format_odata_query(partition)
+
+def split_range(start: datetime.date, end: datetime.date, parts: int) -> List[Tuple[datetime.date, datetime.date]]:
+    """Splits an inclusive date range into up to parts contiguous, non-empty sub-ranges of near-equal length."""
+    days = (end - start).days + 1
+    parts = max(1, min(parts, days))
+    edges = [start + datetime.timedelta(days=days * i // parts) for i in range(parts + 1)]
+    return [(edges[i], edges[i + 1] - datetime.timedelta(days=1)) for i in range(parts)]
+
+def plan_partitioning(query: str, field: str) -> Optional[Tuple[ODataQuery, datetime.date, datetime.date]]:
+    """Parses query and returns it with its date range if it can be fetched in partitions, else None."""
+    try:
+        parsed = parse_odata_query(query)
+    except ODataQueryError:
+        return None
+    if not is_partitionable(parsed, field):
+        return None
+    date_range = find_date_range(parsed, field)
+    if date_range is None or date_range[0] > date_range[1]:
+        return None
+    return (parsed, *date_range)
@@ -0,0 +1,105 @@
+import re
+from typing import Iterable, List, Optional, Set
+from src.utils.appconfig import get_config_instance
+from src.utils.odata_parser import (
+    BoolOp, Call, Compare, Field, Not, ODataQueryError, format_odata_query, parse_odata_query,
+)
+from src.utils.schema import BUILTIN_ENTITY, FIELD_PHRASES, get_entity, get_entity_schema, get_fields
+
+
+config = get_config_instance()
+
+def expression_fields(expression) -> Set[str]:
+    if isinstance(expression, Field):
+        return {expression.name}
+    if isinstance(expression, Compare):
+        return expression_fields(expression.left) | expression_fields(expression.right)
+    if isinstance(expression, (BoolOp, Call)):
+        operands = expression.operands if isinstance(expression, BoolOp) else expression.args
+        return set().union(*(expression_fields(operand) for operand in operands))
+    if isinstance(expression, Not):
+        return expression_fields(expression.operand)
+    return set()
+
+def keyword_groups(fields: List[str]) -> dict:
+    groups = {phrase: [field for field in group if field in fields] for phrase, group in FIELD_PHRASES.items()}
+    for field in fields:
+        groups.setdefault(field.lower(), []).append(field)
+    entity = get_entity_schema()
+    if entity is not None:
+        for prop in entity.properties.values():
+            if prop.label and len(prop.label) > 3:
+                groups.setdefault(prop.label.lower(), []).append(prop.name)
+    return {phrase: group for phrase, group in groups.items() if group}
+
+def mentioned_field_groups(text: str, fields: Optional[List[str]] = None) -> List[List[str]]:
+    """The groups of fields the phrases in text refer to, one group per phrase found."""
+    text = text.lower()
+    return [
+        group for phrase, group in keyword_groups(fields or get_fields()).items()
+        if re.search(rf"\b{re.escape(phrase)}(?:e?s)?\b", text)
+    ]
+
+def mentioned_fields(text: str, fields: Optional[List[str]] = None) -> Set[str]:
+    return {field for group in mentioned_field_groups(text, fields) for field in group}
+
+def key_fields() -> List[str]:
+    return get_entity().keys or BUILTIN_ENTITY.keys
+
+def plan_projection(query: str, text: str, requested: Optional[Iterable[str]] = None) -> str:
+    """
+    Adds a $select to a raw-row query when the question (or the caller, through requested,
+    e.g. chart axes) names the columns it is about, so only those are transferred.
+
+    The selection is the keys, the fields the query filters or sorts on, and the named
+    fields. A phrase that refers to a filtered field only describes the filter ("orders of
+    supplier X"), so a question without any other named field still gets every column.
+    Aggregations and queries that already have a $select are left alone.
+    """
+    if config.ODATA_PROJECTION != "auto":
+        return query
+    try:
+        parsed = parse_odata_query(query)
+    except ODataQueryError:
+        return query
+    if parsed.apply or parsed.select:
+        return query
+
+    fields = get_fields()
+    constrained = expression_fields(parsed.filter) | {key for key, _ in parsed.orderby}
+    named = {field for field in requested or [] if field in fields}
+    for group in mentioned_field_groups(text, fields):
+        if constrained.isdisjoint(group):
+            named.update(group)
+    keys = set(key_fields())
+    if not named - keys - constrained:
+        return query
+    selected = [field for field in fields if field in keys | constrained | named]
+    if len(selected) == len(fields):
+        return query
+    parsed.select = selected
+    return format_odata_query(parsed)
+
+def widen_projection(query: str, needed: Iterable[str]) -> str:
+    """
+    The query with the needed fields added to its $select, for a follow-up that uses more
+    columns than were fetched. Without $select (all columns), the query is returned as is.
+    """
+    parsed = parse_odata_query(query)
+    if not parsed.select:
+        return query
+    fields = get_fields()
+    wanted = set(parsed.select) | {field for field in needed if field in fields}
+    if wanted == set(parsed.select):
+        return query
+    parsed.select = [field for field in fields if field in wanted]
+    if len(parsed.select) == len(fields):
+        parsed.select = []
+    return format_odata_query(parsed)
+
+def projected_fields(query: str) -> Optional[List[str]]:
+    """The fields a query's $select fetches, or None when it fetches all of them."""
+    try:
+        return parse_odata_query(query).select or None
+    except ODataQueryError:
+        return None
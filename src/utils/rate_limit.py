@@ -0,0 +1,232 @@
+import asyncio
+import statistics
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+from src.utils.appconfig import get_config_instance
+
+
+config = get_config_instance()
+
+THROTTLE_STATUSES = {429, 503, 504}
+
+class AdaptiveLimiter:
+    """
+    AIMD limit on the concurrent requests to one gateway endpoint, shared by all queries.
+
+    Every successful response adds 1 / limit, so the limit grows by about one per round
+    trip while latency stays within tolerance times its baseline. The baseline is the median
+    latency of the last window page requests, so it follows the gateway up as well as down,
+    and latency is compared as a moving average, so single slow responses are not a spike.
+    Requests that are not comparable with full pages (counts, short $top probes) adjust the
+    limit but are left out of the latencies.
+    A throttling status (429, 503, 504), a failed request or a latency spike multiplies
+    the limit by backoff, at most once per baseline latency so that one burst of failures
+    counts once. Requests beyond the limit wait in FIFO order.
+    """
+    def __init__(self, initial: int, min_limit: int, max_limit: int, tolerance: float, backoff: float,
+                 window: int = 100, smoothing: float = 0.2):
+        self.min_limit = min_limit
+        self.max_limit = max(max_limit, min_limit)
+        self.limit = float(min(max(initial, min_limit), self.max_limit))
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.in_flight = 0
+        self._waiters = deque()
+        self.smoothing = smoothing
+        self._latencies = deque(maxlen=window)
+        self.baseline_latency: Optional[float] = None
+        self.recent_latency: Optional[float] = None  # moving average
+        self.last_latency: Optional[float] = None
+        self._last_decrease = 0.0
+        self.metrics = dict.fromkeys(["requests", "errors", "throttled", "latency_spikes", "decreases"], 0)
+
+    async def acquire(self):
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # The releasing request hands its slot over, so in_flight is already counted
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release_slot()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+
+    def _release_slot(self):
+        self.in_flight -= 1
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def release(self, latency: Optional[float], throttled: bool = False, failed: bool = False, sample: bool = True):
+        """Frees a slot and adjusts the limit from the outcome of the request."""
+        self.metrics["requests"] += 1
+        now = time.monotonic()
+        spike = False
+        if latency is not None and sample and not throttled and not failed:
+            self.last_latency = latency
+            if self.recent_latency is None:
+                self.recent_latency = latency
+            else:
+                self.recent_latency += self.smoothing * (latency - self.recent_latency)
+            spike = self.baseline_latency is not None and self.recent_latency > self.tolerance * self.baseline_latency
+            self._latencies.append(latency)
+            self.baseline_latency = statistics.median(self._latencies)
+
+        if throttled or failed or spike:
+            self.metrics["throttled" if throttled else "errors" if failed else "latency_spikes"] += 1
+            if now - self._last_decrease > (self.baseline_latency or 0.0):
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._last_decrease = now
+                self.metrics["decreases"] += 1
+        elif latency is not None:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        self._release_slot()
+
+    @asynccontextmanager
+    async def slot(self, operations: int = 1, sample: bool = True):
+        """
+        Holds a slot for one request. The body reports the HTTP status it got through
+        outcome["status"]. An exception before any status (connection error, timeout) counts as
+        a failure, and a cancelled request does not change the limit. A $batch request carries
+        several operations, and its latency is counted per operation. sample=False keeps the
+        latency of a request that is not a full page (see is_page_request) out of the baseline.
+        """
+        await self.acquire()
+        start = time.monotonic()
+        outcome = {"status": None}
+        try:
+            yield outcome
+        except asyncio.CancelledError:
+            self.release(None)
+            raise
+        except Exception:
+            self.release_with_status(outcome["status"], start, error=True, operations=operations, sample=sample)
+            raise
+        self.release_with_status(outcome["status"], start, operations=operations, sample=sample)
+
+    def release_with_status(self, status: Optional[int], start: float, error: bool = False, operations: int = 1,
+                            sample: bool = True):
+        if status is None:
+            self.release(None, failed=error)
+            return
+        # Client errors such as 400 say nothing about gateway load and count as normal responses
+        throttled = status in THROTTLE_STATUSES
+        latency = (time.monotonic() - start) / max(operations, 1)
+        self.release(latency, throttled=throttled, failed=status >= 500 and not throttled, sample=sample)
+
+    def stats(self) -> dict:
+        return {
+            "limit": round(self.limit, 2),
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiters),
+            "baseline_latency_ms": None if self.baseline_latency is None else round(self.baseline_latency * 1000, 1),
+            "recent_latency_ms": None if self.recent_latency is None else round(self.recent_latency * 1000, 1),
+            "last_latency_ms": None if self.last_latency is None else round(self.last_latency * 1000, 1),
+            **self.metrics,
+        }
+
+class TokenBucket:
+    """
+    Caps the request rate of the whole process at rate per second, with bursts of up to burst.
+    Callers reserve a token up front, so waiting callers are served in arrival order. A rate
+    of 0 disables the cap.
+    """
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waits = 0
+        self.waited = 0.0
+
+    def reserve(self) -> float:
+        """Takes a token and returns how long to wait before using it."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self.tokens -= 1
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            if delay:
+                self.waits += 1
+                self.waited += delay
+            return delay
+
+    async def acquire(self):
+        delay = self.reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "burst": self.burst,
+                "tokens": round(max(self.tokens, 0.0), 2),
+                "waits": self.waits,
+                "waited_s": round(self.waited, 3),
+            }
+
+
+def is_page_request(url: str) -> bool:
+    """
+    Whether url asks for a full page of rows. Counts ($top=0, /$count) and short $top requests
+    such as exists checks answer much faster, so their latency says little about page latency.
+    """
+    parts = urlsplit(url)
+    if parts.path.endswith("/$count"):
+        return False
+    top = parse_qs(parts.query).get("$top")
+    return not top or not top[0].isdigit() or int(top[0]) >= config.ODATA_MAX_PAGE_SIZE
+
+def endpoint_key(url: str) -> str:
+    """The ODATA_ENDPOINT_CONCURRENCY prefix matching url, else its scheme, host and path."""
+    for prefix in config.ODATA_ENDPOINT_CONCURRENCY:
+        if url.startswith(prefix):
+            return prefix
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}{parts.path}"
+
+limiters: Dict[str, AdaptiveLimiter] = {}
+limiters_lock = threading.Lock()
+def get_limiter(url: str) -> AdaptiveLimiter:
+    key = endpoint_key(url)
+    with limiters_lock:
+        if key not in limiters:
+            initial = config.ODATA_ENDPOINT_CONCURRENCY.get(key, config.ODATA_MAX_CONCURRENCY)
+            limiters[key] = AdaptiveLimiter(
+                int(initial),
+                config.ODATA_MIN_CONCURRENCY,
+                config.ODATA_ADAPTIVE_MAX_CONCURRENCY,
+                config.ODATA_LATENCY_TOLERANCE,
+                config.ODATA_BACKOFF_FACTOR,
+            )
+        return limiters[key]
+
+token_bucket = None
+def get_token_bucket() -> TokenBucket:
+    global token_bucket
+    if token_bucket is None:
+        token_bucket = TokenBucket(config.ODATA_MAX_REQUESTS_PER_SECOND, config.ODATA_REQUEST_BURST)
+    return token_bucket
+
+def gateway_stats() -> dict:
+    with limiters_lock:
+        endpoints = {key: limiter.stats() for key, limiter in limiters.items()}
+    return {"endpoints": endpoints, "rate_limit": get_token_bucket().stats()}
@@ -0,0 +1,170 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+from fastapi import HTTPException
+from src.utils.appconfig import get_config_instance
+from src.utils.rate_limit import endpoint_key
+
+
+config = get_config_instance()
+
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+class TransientODataError(Exception):
+    """A page request that may succeed when repeated: a retryable status or a connection error."""
+    def __init__(self, message: str, status: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    # Only the delay-seconds form; an HTTP date falls back to the computed backoff
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Full-jitter exponential backoff, or the server's Retry-After, capped at ODATA_RETRY_MAX_DELAY."""
+    if retry_after is not None:
+        return min(retry_after, config.ODATA_RETRY_MAX_DELAY)
+    return random.uniform(0, min(config.ODATA_RETRY_MAX_DELAY, config.ODATA_RETRY_BASE_DELAY * 2 ** attempt))
+
+class CircuitBreaker:
+    """
+    Fails fast while a gateway endpoint is down.
+
+    After failure_threshold consecutive failed requests the circuit opens and requests are
+    refused with 503 for reset_timeout seconds. Then a single trial request is let through
+    (half-open): its success closes the circuit, its failure opens it again.
+    """
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial: Optional[float] = None
+        self._lock = threading.Lock()
+        self.metrics = dict.fromkeys(["opened", "rejected"], 0)
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    def check(self):
+        """Raises 503 while the circuit is open, and lets one trial request through once it is half-open."""
+        with self._lock:
+            state = self.state
+            now = time.monotonic()
+            if state == "closed":
+                return
+            # A trial that never reported back (cancelled) is replaced after reset_timeout
+            if state == "half-open" and (self._trial is None or now - self._trial >= self.reset_timeout):
+                self._trial = now
+                return
+            self.metrics["rejected"] += 1
+            retry_in = max(0.0, self.reset_timeout - (now - self.opened_at))
+        raise HTTPException(status_code=503, detail=f"OData gateway unavailable, retry in {retry_in:.0f}s")
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self._trial is not None:
+                    self.metrics["opened"] += 1
+                self.opened_at = time.monotonic()
+                self._trial = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"state": self.state, "consecutive_failures": self.failures, **self.metrics}
+
+class LatencyTracker:
+    """Recent page latencies of an endpoint, to time hedged requests at a high quantile."""
+    def __init__(self, window: int = 200):
+        self.latencies = deque(maxlen=window)
+        self.hedged = 0
+        self.hedges_won = 0
+
+    def record(self, latency: float):
+        self.latencies.append(latency)
+
+    def quantile(self, q: float, min_samples: int) -> Optional[float]:
+        if len(self.latencies) < min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def stats(self) -> dict:
+        p50 = self.quantile(0.5, 1)
+        p95 = self.quantile(0.95, 1)
+        return {
+            "samples": len(self.latencies),
+            "p50_ms": None if p50 is None else round(p50 * 1000, 1),
+            "p95_ms": None if p95 is None else round(p95 * 1000, 1),
+            "hedged": self.hedged,
+            "hedges_won": self.hedges_won,
+        }
+
+async def hedge(request: Callable[[], Awaitable], delay: Optional[float], tracker: LatencyTracker):
+    """
+    Runs request(). If it has not answered after delay seconds, a duplicate is started and the
+    first successful answer wins; the other request is cancelled. With delay None no duplicate is sent.
+    """
+    first = asyncio.ensure_future(request())
+    tasks = [first]
+    try:
+        if delay is None:
+            return await first
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            tracker.hedged += 1
+            tasks.append(asyncio.ensure_future(request()))
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not first:
+                        tracker.hedges_won += 1
+                    return task.result()
+        return first.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+circuit_breakers: Dict[str, CircuitBreaker] = {}
+latency_trackers: Dict[str, LatencyTracker] = {}
+registry_lock = threading.Lock()
+def get_circuit_breaker(url: str) -> CircuitBreaker:
+    key = endpoint_key(url)
+    with registry_lock:
+        if key not in circuit_breakers:
+            circuit_breakers[key] = CircuitBreaker(config.ODATA_CIRCUIT_FAILURES, config.ODATA_CIRCUIT_RESET_TIMEOUT)
+        return circuit_breakers[key]
+
+def get_latency_tracker(url: str) -> LatencyTracker:
+    key = endpoint_key(url)
+    with registry_lock:
+        if key not in latency_trackers:
+            latency_trackers[key] = LatencyTracker()
+        return latency_trackers[key]
+
+def resilience_stats() -> dict:
+    with registry_lock:
+        return {
+            "circuits": {key: breaker.stats() for key, breaker in circuit_breakers.items()},
+            "latency": {key: tracker.stats() for key, tracker in latency_trackers.items()},
+        }
@@ -0,0 +1,250 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+import pyarrow as pa
+import pyarrow.ipc as ipc
+from src.utils.appconfig import get_config_instance
+from src.utils.odata_parser import ODataQueryError, canonicalize_odata_query
+
+
+config = get_config_instance()
+
+def rows_to_table(rows: List[dict]) -> pa.Table:
+    # Columns are the union of the row keys, the first row's in its order; inference
+    # sorts the struct fields by name
+    if not rows:
+        return pa.table({})
+    table = pa.Table.from_struct_array(pa.array(rows))
+    return table.select(list(dict.fromkeys(list(rows[0]) + table.column_names)))
+
+class ResultBuilder:
+    """
+    Collects a result page by page as Arrow tables for the cache. Pages are converted in the
+    default executor, one at a time, so the event loop never converts a whole result. The
+    result is given up once it outgrows max_bytes or mixes types Arrow cannot unify.
+    """
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.tables: Optional[List[pa.Table]] = []
+        self.nbytes = 0
+
+    async def add(self, rows: List[dict]):
+        if self.tables is None:
+            return
+        try:
+            table = await asyncio.get_running_loop().run_in_executor(None, rows_to_table, rows)
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            print(f"Result not cached: {e}")
+            self.tables = None
+            return
+        self.nbytes += table.nbytes
+        if self.nbytes > self.max_bytes:
+            print(f"Result not cached: larger than {self.max_bytes} bytes")
+            self.tables = None
+            return
+        self.tables.append(table)
+
+    def table(self) -> Optional[pa.Table]:
+        if self.tables is None:
+            return None
+        if not self.tables:
+            return pa.table({})
+        try:
+            # Columns missing from some pages, or all null in them, are filled with nulls
+            return pa.concat_tables(self.tables, promote_options="default")
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            print(f"Result not cached: {e}")
+            return None
+
+class ResultCache:
+    """
+    Two-tier cache of OData results, keyed on the endpoint and the canonical query string.
+
+    Results are held as Arrow tables in an in-memory LRU bounded by max_bytes. Tables evicted
+    from memory, or too large to fit, spill to Arrow IPC files in directory, bounded by
+    disk_max_bytes. Disk hits are read memory-mapped, so the file is not copied into the
+    heap, and are promoted back to memory. Every entry expires ttl seconds after it was set.
+    """
+    def __init__(self, max_bytes: int, ttl: float, directory: Optional[str] = None, disk_max_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.directory = directory
+        self.disk_max_bytes = disk_max_bytes if directory else 0
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> (table, expires)
+        self._memory_bytes = 0
+        self._disk = OrderedDict()  # key -> file size, oldest first
+        self._disk_bytes = 0
+        self.metrics = dict.fromkeys(
+            ["memory_hits", "disk_hits", "misses", "expired", "evictions", "spills", "disk_evictions", "uncacheable"], 0
+        )
+        if self.disk_max_bytes:
+            os.makedirs(directory, exist_ok=True)
+            self._scan_disk()
+
+    @staticmethod
+    def make_key(endpoint: str, query: str) -> str:
+        try:
+            query = canonicalize_odata_query(query)
+        except ODataQueryError:
+            pass
+        return hashlib.sha256(f"{endpoint}\n{query}".encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.arrow")
+
+    def _scan_disk(self):
+        files = [entry for entry in os.scandir(self.directory) if entry.name.endswith(".arrow")]
+        for entry in sorted(files, key=lambda entry: entry.stat().st_mtime):
+            self._disk[entry.name[:-len(".arrow")]] = entry.stat().st_size
+            self._disk_bytes += entry.stat().st_size
+        self._trim_disk()
+
+    def get(self, endpoint: str, query: str) -> Optional[pa.Table]:
+        key = self.make_key(endpoint, query)
+        with self._lock:
+            table = self._get_memory(key)
+            if table is None:
+                table = self._get_disk(key)
+            if table is None:
+                self.metrics["misses"] += 1
+                return None
+        return table
+
+    def _get_memory(self, key: str) -> Optional[pa.Table]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        table, expires = entry
+        if expires <= time.time():
+            self.metrics["expired"] += 1
+            self._drop_memory(key)
+            return None
+        self._memory.move_to_end(key)
+        self.metrics["memory_hits"] += 1
+        return table
+
+    def _get_disk(self, key: str) -> Optional[pa.Table]:
+        if key not in self._disk:
+            return None
+        try:
+            # Buffers of the table point into the mapped file instead of being read into memory
+            table = ipc.open_file(pa.memory_map(self._path(key))).read_all()
+            expires = float(table.schema.metadata[b"expires"])
+        except (OSError, pa.ArrowInvalid, KeyError, TypeError) as e:
+            print(f"Dropping unreadable result cache file {key}: {e}")
+            self._drop_disk(key)
+            return None
+        if expires <= time.time():
+            self.metrics["expired"] += 1
+            self._drop_disk(key)
+            return None
+        self.metrics["disk_hits"] += 1
+        self._drop_disk(key)
+        self._put_memory(key, table, expires)
+        return table
+
+    def set(self, endpoint: str, query: str, table: Optional[pa.Table], ttl: Optional[float] = None):
+        """Caches table as the result of query. None stands for a result that could not be cached."""
+        key = self.make_key(endpoint, query)
+        if table is None:
+            with self._lock:
+                self.metrics["uncacheable"] += 1
+            return
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._drop_memory(key)
+            self._drop_disk(key)
+            self._put_memory(key, table, expires)
+
+    def _put_memory(self, key: str, table: pa.Table, expires: float):
+        if table.nbytes > self.max_bytes:
+            self._spill(key, table, expires)
+            return
+        self._memory[key] = (table, expires)
+        self._memory_bytes += table.nbytes
+        while self._memory_bytes > self.max_bytes:
+            evicted, (evicted_table, evicted_expires) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted_table.nbytes
+            self.metrics["evictions"] += 1
+            if evicted_expires > time.time():
+                self._spill(evicted, evicted_table, evicted_expires)
+
+    def _spill(self, key: str, table: pa.Table, expires: float):
+        if not self.disk_max_bytes:
+            return
+        table = table.replace_schema_metadata({"expires": str(expires)})
+        path = self._path(key)
+        try:
+            # Written under a temporary name so readers never map a partial file
+            with pa.OSFile(path + ".tmp", "wb") as sink, ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            print(f"Could not spill result to {path}: {e}")
+            return
+        self._disk[key] = os.path.getsize(path)
+        self._disk_bytes += self._disk[key]
+        self.metrics["spills"] += 1
+        self._trim_disk()
+
+    def _trim_disk(self):
+        while self._disk_bytes > self.disk_max_bytes and self._disk:
+            key = next(iter(self._disk))
+            self._drop_disk(key)
+            self.metrics["disk_evictions"] += 1
+
+    def _drop_memory(self, key: str):
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= entry[0].nbytes
+
+    def _drop_disk(self, key: str):
+        size = self._disk.pop(key, None)
+        if size is not None:
+            self._disk_bytes -= size
+            try:
+                # Tables already mapped from the file stay readable after the unlink
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            for key in list(self._disk):
+                self._drop_disk(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.metrics["memory_hits"] + self.metrics["disk_hits"]
+            lookups = hits + self.metrics["misses"]
+            return {
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "max_bytes": self.max_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+                "disk_max_bytes": self.disk_max_bytes,
+                "ttl": self.ttl,
+                **self.metrics,
+                "hit_rate": hits / lookups if lookups else 0.0,
+            }
+
+
+result_cache = None
+def get_result_cache() -> ResultCache:
+    global result_cache
+    if result_cache is None:
+        result_cache = ResultCache(
+            config.RESULT_CACHE_MAX_BYTES,
+            config.RESULT_CACHE_TTL,
+            config.RESULT_CACHE_DIR,
+            config.RESULT_CACHE_DISK_MAX_BYTES,
+        )
+    return result_cache
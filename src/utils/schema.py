@@ -0,0 +1,244 @@
+import asyncio
+import aiohttp
+import hashlib
+import time
+import xml.etree.ElementTree as ElementTree
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlsplit, urlunsplit
+from src.utils.appconfig import get_config_instance
+from src.utils.odata_client import get_odata_client
+
+
+config = get_config_instance()
+
+@dataclass
+class Property:
+    name: str
+    type: str  # EDM type, e.g. Edm.String
+    nullable: bool = True
+    max_length: Optional[int] = None
+    precision: Optional[int] = None
+    scale: Optional[int] = None
+    label: Optional[str] = None  # sap:label, a short description
+
+@dataclass
+class EntityType:
+    name: str
+    keys: List[str] = field(default_factory=list)
+    properties: Dict[str, Property] = field(default_factory=dict)  # in document order
+
+@dataclass
+class ServiceSchema:
+    entity_types: Dict[str, EntityType] = field(default_factory=dict)  # by qualified and plain name
+    entity_sets: Dict[str, EntityType] = field(default_factory=dict)
+    digest: str = ""
+
+
+# The ZC_GRN_PO_DET entity the app was built for, used until the service's $metadata is loaded.
+# Labels describe the fields in the prompt.
+BUILTIN_ENTITY = EntityType("ZC_GRN_PO_DETType", keys=["ORDER_NO", "ORDER_NO_ITEM"], properties={prop.name: prop for prop in [
+    Property("ORDER_NO", "Edm.String", nullable=False, label="purchase order number"),
+    Property("ORDER_NO_ITEM", "Edm.String", nullable=False, label="line item of the order"),
+    Property("TSF_ENTITY_ID", "Edm.String", label="purchasing organization id"),
+    Property("PURCH_GRP", "Edm.String", label="purchase group or category"),
+    Property("SUPPLIER", "Edm.String", label="supplier id"),
+    Property("CreateDate", "Edm.String", label="creation date of the order, YYYYMMDD"),
+    Property("MATERIAL", "Edm.String", label="material of the line item"),
+    Property("STORE_NAME", "Edm.String", label="plant where the material is manufactured"),
+    Property("UNIT_COST", "Edm.Decimal", precision=15, scale=2, label="amount of the line item"),
+    Property("MATERIAL_DESC", "Edm.String", label="material description"),
+    Property("SUP_NAME", "Edm.String", label="supplier name"),
+]})
+FIELDS = list(BUILTIN_ENTITY.properties)
+# EDM types whose literals are bare numbers, and those of them that take whole numbers only
+NUMBER_TYPES = {"Edm.Decimal", "Edm.Double", "Edm.Single", "Edm.Int16", "Edm.Int32", "Edm.Int64", "Edm.Byte", "Edm.SByte"}
+INTEGER_TYPES = {"Edm.Int16", "Edm.Int32", "Edm.Int64", "Edm.Byte", "Edm.SByte"}
+# The service declares the creation date as text (YYYYMMDD), so it is named rather than typed
+DATE_FIELD = "CreateDate"
+
+# Phrases in a question that refer to fields, main field first: a phrase may stand for several
+# fields, e.g. "supplier" for the id and the name. $metadata labels are matched as well.
+FIELD_PHRASES = {
+    "order number": ["ORDER_NO"], "order no": ["ORDER_NO"], "po number": ["ORDER_NO"],
+    "line item": ["ORDER_NO_ITEM"],
+    "purchasing organization": ["TSF_ENTITY_ID"], "purchase organization": ["TSF_ENTITY_ID"],
+    "purchasing org": ["TSF_ENTITY_ID"], "purchase org": ["TSF_ENTITY_ID"],
+    "purchase group": ["PURCH_GRP"], "purchasing group": ["PURCH_GRP"], "category": ["PURCH_GRP"],
+    "supplier": ["SUPPLIER", "SUP_NAME"], "vendor": ["SUPPLIER", "SUP_NAME"],
+    "supplier name": ["SUP_NAME"], "vendor name": ["SUP_NAME"],
+    "date": ["CreateDate"], "created": ["CreateDate"], "creation": ["CreateDate"],
+    "material": ["MATERIAL", "MATERIAL_DESC"], "material description": ["MATERIAL_DESC"], "description": ["MATERIAL_DESC"],
+    "store": ["STORE_NAME"], "plant": ["STORE_NAME"],
+    "cost": ["UNIT_COST"], "price": ["UNIT_COST"], "amount": ["UNIT_COST"], "spend": ["UNIT_COST"],
+    "order": ["ORDER_NO"],
+}
+
+
+def local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+def attribute(element: ElementTree.Element, name: str) -> Optional[str]:
+    # Annotations such as sap:label are namespaced; the namespace URI differs between services
+    for key, value in element.attrib.items():
+        if local_name(key) == name:
+            return value
+    return None
+
+def optional_int(value: Optional[str]) -> Optional[int]:
+    return int(value) if value is not None and value.isdigit() else None
+
+def parse_metadata(document: bytes) -> ServiceSchema:
+    """
+    Parses an EDMX $metadata document (OData v2 or v4) into entity types and sets. Namespaces
+    are ignored, so both versions and any vendor annotations parse the same way.
+    """
+    schema = ServiceSchema(digest=hashlib.sha256(document).hexdigest()[:12])
+    root = ElementTree.fromstring(document)
+    sets = []
+    for namespace in (element for element in root.iter() if local_name(element.tag) == "Schema"):
+        prefix = namespace.get("Namespace", "")
+        for element in namespace:
+            if local_name(element.tag) == "EntityType":
+                entity = EntityType(element.get("Name"))
+                for child in element:
+                    if local_name(child.tag) == "Key":
+                        entity.keys = [ref.get("Name") for ref in child if local_name(ref.tag) == "PropertyRef"]
+                    elif local_name(child.tag) == "Property":
+                        prop = Property(
+                            name=child.get("Name"),
+                            type=child.get("Type", "Edm.String"),
+                            nullable=child.get("Nullable", "true").lower() != "false",
+                            max_length=optional_int(child.get("MaxLength")),
+                            precision=optional_int(child.get("Precision")),
+                            scale=optional_int(child.get("Scale")),
+                            label=attribute(child, "label"),
+                        )
+                        entity.properties[prop.name] = prop
+                schema.entity_types[entity.name] = entity
+                schema.entity_types[f"{prefix}.{entity.name}"] = entity
+            elif local_name(element.tag) == "EntityContainer":
+                sets += [child for child in element if local_name(child.tag) == "EntitySet"]
+    for entity_set in sets:
+        entity = schema.entity_types.get(entity_set.get("EntityType", ""))
+        if entity is not None:
+            schema.entity_sets[entity_set.get("Name")] = entity
+    return schema
+
+def metadata_url(endpoint: str) -> str:
+    """The $metadata URL of the service an entity set endpoint such as .../SERVICE_SRV/EntitySet? belongs to."""
+    parts = urlsplit(endpoint)
+    service = parts.path.rstrip("/").rsplit("/", 1)[0]
+    return urlunsplit((parts.scheme, parts.netloc, f"{service}/$metadata", "", ""))
+
+def entity_set_name(endpoint: str) -> str:
+    return urlsplit(endpoint).path.rstrip("/").rsplit("/", 1)[-1]
+
+
+class SchemaCache:
+    """
+    The service's $metadata, fetched once per process and revalidated after ttl seconds
+    with If-None-Match, so an unchanged schema costs a 304 rather than a full download.
+
+    If the document cannot be fetched the last good schema is kept; without one, callers fall
+    back to the built-in field list. Callbacks registered with on_change run when a refresh
+    returns a different schema, or the first one, e.g. to rebuild the prompt.
+    """
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.schema: Optional[ServiceSchema] = None
+        self.etag: Optional[str] = None
+        self.checked_at = 0.0
+        self._refreshing: Optional[asyncio.Task] = None
+        self._callbacks: List[Callable[[ServiceSchema], None]] = []
+        self.metrics = dict.fromkeys(["fetched", "not_modified", "changed", "errors"], 0)
+
+    def on_change(self, callback: Callable[[ServiceSchema], None]):
+        self._callbacks.append(callback)
+
+    def is_stale(self) -> bool:
+        return time.monotonic() - self.checked_at >= self.ttl
+
+    async def refresh(self) -> Optional[ServiceSchema]:
+        session = await get_odata_client().get_session()
+        url = metadata_url(config.ODATA_ENDPOINT)
+        headers = {"If-None-Match": self.etag} if self.etag and self.schema is not None else None
+        try:
+            async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=config.ODATA_METADATA_TIMEOUT)) as response:
+                if response.status == 304:
+                    self.metrics["not_modified"] += 1
+                elif response.status == 200:
+                    schema = parse_metadata(await response.read())
+                    self.metrics["fetched"] += 1
+                    self.etag = response.headers.get("ETag")
+                    previous = self.schema
+                    self.schema = schema
+                    # The first load counts too: the prompt may have been built from the built-in entity
+                    if previous is None or schema.digest != previous.digest:
+                        if previous is not None:
+                            self.metrics["changed"] += 1
+                        for callback in self._callbacks:
+                            callback(schema)
+                else:
+                    raise ValueError(f"status code {response.status}")
+        except Exception as e:
+            # Keeps serving the last good schema; the next check is after another ttl
+            self.metrics["errors"] += 1
+            print(f"Error fetching OData $metadata from {url}: {e}")
+        self.checked_at = time.monotonic()
+        return self.schema
+
+    def refresh_in_background(self):
+        """Starts a revalidation if the schema is stale, without making the caller wait for it."""
+        if not config.ODATA_METADATA_ENABLED or not self.is_stale():
+            return
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.ensure_future(self.refresh())
+
+    def entity(self, name: Optional[str] = None) -> Optional[EntityType]:
+        """The entity type of the entity set name, by default the one ODATA_ENDPOINT points to."""
+        if self.schema is None:
+            return None
+        name = name or entity_set_name(config.ODATA_ENDPOINT)
+        return self.schema.entity_sets.get(name) or self.schema.entity_types.get(name)
+
+    def stats(self) -> dict:
+        entity = self.entity()
+        return {
+            "entity": entity.name if entity else None,
+            "properties": len(entity.properties) if entity else 0,
+            "digest": self.schema.digest if self.schema else None,
+            "etag": self.etag,
+            **self.metrics,
+        }
+
+
+schema_cache = None
+def get_schema_cache() -> SchemaCache:
+    global schema_cache
+    if schema_cache is None:
+        schema_cache = SchemaCache(config.ODATA_METADATA_TTL)
+    return schema_cache
+
+async def aload_schema() -> Optional[EntityType]:
+    """Fetches the schema if it was not loaded yet or is stale. Call once at startup."""
+    cache = get_schema_cache()
+    if config.ODATA_METADATA_ENABLED and config.ODATA_ENDPOINT and cache.is_stale():
+        await cache.refresh()
+    return cache.entity()
+
+def load_schema() -> Optional[EntityType]:
+    """Blocking variant of aload_schema for the Streamlit app."""
+    return get_odata_client().run_sync(aload_schema())
+
+def get_entity_schema() -> Optional[EntityType]:
+    """The cached entity type of ODATA_ENDPOINT, or None when $metadata was not loaded."""
+    return get_schema_cache().entity()
+
+def get_entity() -> EntityType:
+    """The entity type from the cached $metadata, else BUILTIN_ENTITY."""
+    return get_entity_schema() or BUILTIN_ENTITY
+
+def get_fields() -> List[str]:
+    """Property names of the entity from the cached $metadata, else the built-in FIELDS."""
+    return list(get_entity().properties)
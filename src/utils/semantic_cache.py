@@ -0,0 +1,151 @@
+import atexit
+import datetime
+import json
+import os
+import re
+import threading
+import time
+from typing import List, Optional
+import numpy as np
+from src.utils.appconfig import get_config_instance
+from src.utils.projection import mentioned_field_groups
+
+
+config = get_config_instance()
+
+def literal_signature(text: str) -> tuple:
+    """
+    Collects the literals of a query: numbers, periods (Q1, H2, FY24...), quoted values and
+    upper-case identifiers. Paraphrases share them, while "orders in Q1 2023" and
+    "orders in Q2 2024" embed almost identically but must not share a translation.
+    """
+    tokens = re.findall(r"'[^']*'|\"[^\"]*\"|\b[A-Z0-9][A-Z0-9_\-]*[A-Z0-9]\b|\b\w*\d\w*\b", text)
+    tokens += re.findall(r"\b(?:ytd|last|this|next|previous|current)\b", text.lower())
+    return tuple(sorted(token.strip("'\"").lower() for token in tokens))
+
+def field_signature(text: str) -> tuple:
+    """
+    The field groups a query names. "total orders by supplier" and "total orders by plant"
+    share every literal and embed closely, but group by different fields.
+    """
+    return tuple(sorted({tuple(sorted(set(group))) for group in mentioned_field_groups(text)}))
+
+class SemanticCache:
+    """
+    Nearest-neighbour cache of NL -> OData translations over query embeddings.
+
+    Embeddings are kept L2-normalized in one (capacity x dim) float32 matrix, so a lookup
+    is a single matrix-vector product. A stored translation is reused when its cosine
+    similarity is at least threshold and it was made with the same prompt version, on the
+    same day and with the same query literals and named fields. Once full, the least
+    recently used row is overwritten. The cache is persisted to an .npz file and reloaded on startup.
+    """
+    def __init__(self, capacity: int, threshold: float, path: Optional[str] = None):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.path = path
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None
+        self._last_used = np.zeros(capacity, dtype=np.float64)
+        self._entries: List[Optional[dict]] = [None] * capacity
+        self._buckets = np.full(capacity, "", dtype=object)
+        self.hits = 0
+        self.misses = 0
+        if path and os.path.exists(path):
+            self.load()
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    @staticmethod
+    def _bucket(text: str, prompt_version: str) -> str:
+        # Only rows in the same bucket are eligible for reuse
+        return json.dumps([prompt_version, datetime.date.today().isoformat(), literal_signature(text), field_signature(text)])
+
+    def get(self, text: str, embedding, prompt_version: str) -> Optional[str]:
+        vector = self._normalize(embedding)
+        with self._lock:
+            if self._vectors is not None:
+                similarity = self._vectors @ vector
+                similarity[self._buckets != self._bucket(text, prompt_version)] = -1.0
+                best = int(np.argmax(similarity))
+                if similarity[best] >= self.threshold:
+                    self.hits += 1
+                    self._last_used[best] = time.time()
+                    return self._entries[best]["odata_query"]
+            self.misses += 1
+            return None
+
+    def set(self, text: str, embedding, prompt_version: str, odata_query: str):
+        vector = self._normalize(embedding)
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.capacity, vector.shape[0]), dtype=np.float32)
+            # Free rows have a last-used time of 0, so they are filled before any eviction
+            row = int(np.argmin(self._last_used))
+            self._vectors[row] = vector
+            self._last_used[row] = time.time()
+            self._buckets[row] = self._bucket(text, prompt_version)
+            self._entries[row] = {"text": text, "odata_query": odata_query, "bucket": self._buckets[row]}
+
+    def clear(self):
+        with self._lock:
+            self._vectors = None
+            self._last_used[:] = 0
+            self._entries = [None] * self.capacity
+            self._buckets[:] = ""
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            if self._vectors is None:
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            np.savez(
+                self.path,
+                vectors=self._vectors,
+                last_used=self._last_used,
+                entries=np.array(json.dumps(self._entries)),
+            )
+
+    def load(self):
+        with np.load(self.path) as data:
+            vectors, last_used = data["vectors"], data["last_used"]
+            entries = json.loads(str(data["entries"]))
+        # Keep the most recently used rows if the capacity shrank since the file was written
+        keep = np.argsort(last_used)[::-1][:self.capacity]
+        with self._lock:
+            self._vectors = np.zeros((self.capacity, vectors.shape[1]), dtype=np.float32)
+            self._vectors[:len(keep)] = vectors[keep]
+            self._last_used[:len(keep)] = last_used[keep]
+            self._entries[:len(keep)] = [entries[i] for i in keep]
+            self._buckets[:len(keep)] = [entry["bucket"] if entry else "" for entry in self._entries[:len(keep)]]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": sum(entry is not None for entry in self._entries),
+                "capacity": self.capacity,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+semantic_cache = None
+def get_semantic_cache() -> SemanticCache:
+    global semantic_cache
+    if semantic_cache is None:
+        semantic_cache = SemanticCache(
+            config.SEMANTIC_CACHE_CAPACITY,
+            config.SEMANTIC_CACHE_THRESHOLD,
+            config.SEMANTIC_CACHE_PATH,
+        )
+        atexit.register(semantic_cache.save)
+    return semantic_cache
@@ -0,0 +1,173 @@
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, Optional
+from src.utils.appconfig import get_config_instance
+
+
+config = get_config_instance()
+
+
+class Flight:
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.waiters = 0
+        self.pages = deque()
+        self.first = 0  # index of pages[0] among all pages of the flight
+        self.readers: Dict[object, int] = {}  # the index of the next page each stream caller reads
+        self.metadata = {}
+        self.changed: Optional[asyncio.Future] = None
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical work, such as translating the same question or pulling the
+    same OData query for several dashboard users at once.
+
+    The first caller for a key starts the work and later callers wait for the same result
+    instead of repeating it. Once the work finishes, the next call for the key starts afresh.
+    Async work runs in a task that is cancelled only when every caller waiting on it has given
+    up, so one caller's timeout does not fail the others. Flights are per event loop.
+    """
+    def __init__(self, max_buffered_pages: int = 8):
+        self.max_buffered_pages = max_buffered_pages
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._sync_flights = {}
+        self.started = 0
+        self.coalesced = 0
+
+    def _join(self, key: Hashable, start: Callable[[Flight], asyncio.Task],
+              joinable: Callable[[Flight], bool] = lambda flight: True) -> Flight:
+        flight_key = (asyncio.get_running_loop(), key)
+        with self._lock:
+            flight = self._flights.get(flight_key)
+            if flight is None or not joinable(flight):
+                flight = self._flights[flight_key] = Flight()
+                flight.task = start(flight)
+                flight.task.add_done_callback(lambda task: self._forget(flight_key, flight, task))
+                self.started += 1
+            else:
+                self.coalesced += 1
+            flight.waiters += 1
+        return flight
+
+    def _forget(self, flight_key, flight: Flight, task: asyncio.Task):
+        # Marks the error as retrieved, since every caller may have given up before it was raised
+        if not task.cancelled():
+            task.exception()
+        with self._lock:
+            if self._flights.get(flight_key) is flight:
+                del self._flights[flight_key]
+
+    def _leave(self, flight: Flight):
+        flight.waiters -= 1
+        if flight.waiters == 0 and not flight.task.done():
+            flight.task.cancel()
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Awaits factory() once for all concurrent callers with the same key."""
+        flight = self._join(key, lambda _: asyncio.ensure_future(factory()))
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            self._leave(flight)
+
+    async def stream(self, key: Hashable, factory: Callable[[dict], AsyncIterator[Any]],
+                     metadata: Optional[dict] = None) -> AsyncIterator[Any]:
+        """
+        Shares the pages of factory(metadata) between concurrent callers. Every caller gets all
+        pages from the first one on, as they arrive, and a copy of the metadata the pages filled in.
+        Only pages some caller has yet to read are kept, at most max_buffered_pages of them: the
+        fetch pauses for the slowest caller, and a caller arriving after the first page was dropped
+        starts a fetch of its own.
+        """
+        def start(flight: Flight) -> asyncio.Task:
+            flight.changed = asyncio.get_running_loop().create_future()
+            return asyncio.ensure_future(self._pump(flight, factory(flight.metadata)))
+
+        flight = self._join(key, start, lambda flight: flight.first == 0)
+        reader = object()
+        flight.readers[reader] = 0
+        try:
+            while True:
+                i = flight.readers[reader]
+                if i < flight.first + len(flight.pages):
+                    if metadata is not None:
+                        metadata.update(flight.metadata)
+                    page = flight.pages[i - flight.first]
+                    flight.readers[reader] = i + 1
+                    self._trim(flight)
+                    yield page
+                elif flight.task.done():
+                    flight.task.result()
+                    return
+                else:
+                    # asyncio.wait leaves the shared futures alone when this caller is cancelled
+                    await asyncio.wait([flight.changed, flight.task], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            del flight.readers[reader]
+            self._trim(flight)
+            self._leave(flight)
+
+    async def _pump(self, flight: Flight, pages: AsyncIterator[Any]):
+        try:
+            async for page in pages:
+                flight.pages.append(page)
+                self._notify(flight)
+                while len(flight.pages) >= self.max_buffered_pages:
+                    await asyncio.wait([flight.changed])
+        finally:
+            await pages.aclose()
+
+    def _trim(self, flight: Flight):
+        # Drops the pages every reader is past, which makes room for the pump
+        last = min(flight.readers.values(), default=flight.first + len(flight.pages))
+        if last > flight.first:
+            for _ in range(last - flight.first):
+                flight.pages.popleft()
+            flight.first = last
+            self._notify(flight)
+
+    @staticmethod
+    def _notify(flight: Flight):
+        changed, flight.changed = flight.changed, asyncio.get_running_loop().create_future()
+        if not changed.done():
+            changed.set_result(None)
+
+    def call(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """Blocking variant of run for threads without an event loop, such as Streamlit sessions."""
+        with self._lock:
+            future = self._sync_flights.get(key)
+            leader = future is None
+            if leader:
+                future = self._sync_flights[key] = Future()
+                self.started += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+        try:
+            future.set_result(func())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._sync_flights[key]
+        return future.result()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": len(self._flights) + len(self._sync_flights),
+                "started": self.started,
+                "coalesced": self.coalesced,
+            }
+
+
+single_flight = None
+def get_single_flight() -> SingleFlight:
+    global single_flight
+    if single_flight is None:
+        single_flight = SingleFlight(config.SINGLE_FLIGHT_BUFFER_PAGES)
+    return single_flight
@@ -0,0 +1,71 @@
+import datetime
+import re
+import threading
+from typing import Optional
+from cachetools import TTLCache
+from src.utils.appconfig import get_config_instance
+
+
+config = get_config_instance()
+
+def normalize_query_text(text: str) -> str:
+    """Lowercases, collapses whitespace and drops trailing punctuation so trivial variants share an entry."""
+    text = re.sub(r"\s+", " ", text.strip().lower())
+    return text.rstrip(" ?.!")
+
+class TranslationCache:
+    """
+    Exact-match cache of NL -> OData translations.
+
+    Entries are keyed on the normalized query text, the prompt version and today's date,
+    because relative periods such as "last quarter" resolve differently from day to day.
+    Eviction is LRU once maxsize is reached, and every entry expires after ttl seconds.
+    """
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(text: str, prompt_version: str) -> tuple:
+        return (normalize_query_text(text), prompt_version, datetime.date.today().isoformat())
+
+    def get(self, text: str, prompt_version: str) -> Optional[str]:
+        key = self.make_key(text, prompt_version)
+        with self._lock:
+            odata_query = self._cache.get(key)
+            if odata_query is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return odata_query
+
+    def set(self, text: str, prompt_version: str, odata_query: str):
+        key = self.make_key(text, prompt_version)
+        with self._lock:
+            self._cache[key] = odata_query
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._cache),
+                "maxsize": self._cache.maxsize,
+                "ttl": self._cache.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+translation_cache = None
+def get_translation_cache() -> TranslationCache:
+    global translation_cache
+    if translation_cache is None:
+        translation_cache = TranslationCache(config.TRANSLATION_CACHE_SIZE, config.TRANSLATION_CACHE_TTL)
+    return translation_cache
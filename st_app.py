@@ -1,7 +1,12 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from src.api.routes import convert_to_odata, Query  # Adjust import based on your structure
+from src.api.routes import generate_odata_query, Query  # Adjust import based on your structure
+from src.utils.call import iter_odata
+from src.utils.columnar import ColumnarBuilder, schema_types, to_pandas
+from src.utils.schema import get_entity_schema, get_fields, load_schema
+from src.utils.intents import plan_query
+from src.utils.projection import mentioned_fields, projected_fields, widen_projection
 from src.api.insights_generation import insights_generation, ConversationManager
 
 
@@ -13,28 +18,62 @@ if 'query_history' not in st.session_state:
     st.session_state['query_history'] = []
 if 'count' not in st.session_state:
     st.session_state['count'] = None
+if 'odata_query' not in st.session_state:
+    st.session_state['odata_query'] = None
 
 
 def get_response(query_input: str):
     try:
         query = Query(text=query_input)
-        # to get a DICTIONARY RESPONSE
-        values = convert_to_odata(query)
-        return values
+        # Field list for the prompt and column types, fetched once and revalidated after its TTL
+        load_schema()
+        # Counts, existence checks and top-N questions take a single request, and only the
+        # columns the question names are fetched, if it names any
+        odata_query = plan_query(generate_odata_query(query), query_input).query
+        st.session_state['odata_query'] = odata_query
+        # to get a generator over the result pages; cached results come as Arrow batches
+        return iter_odata(odata_query, arrow=True)
     except Exception as e:
         print(f"An error occurred: {e}")
         st.error("Failed to fetch the response from the server.")
         return None
 
-def parse_list_to_dataframe(list_data):
+def parse_pages_to_dataframe(pages):
+    # Convert each page to typed Arrow columns as it arrives, so the raw records of
+    # only one page are alive at a time. Cached pages are Arrow batches already and
+    # are not turned back into records. Pages are fetched while they are consumed, so
+    # fetch errors are raised here and reach the caller
+    builder = ColumnarBuilder(schema_types(get_entity_schema()))
+    progress = st.empty()
     try:
-        # Convert the list of records to a DataFrame
-        df = pd.DataFrame(list_data)
-        return df
-    
+        for page in pages:
+            builder.append(page)
+            progress.caption(f"Fetched {builder.num_rows} rows...")
+    finally:
+        progress.empty()
+    if not builder.num_rows:
+        return None
+    return to_pandas(builder.table())
+
+def widen_dataframe(needed):
+    # Refetches the last query with more columns when a follow-up uses fields it did not fetch
+    odata_query = st.session_state['odata_query']
+    if odata_query is None or st.session_state.get('last_dataframe') is None:
+        return
+    missing = set(needed) - set(st.session_state['last_dataframe'].columns)
+    wider_query = widen_projection(odata_query, missing)
+    if wider_query == odata_query:
+        return
+    try:
+        dataframe = parse_pages_to_dataframe(iter_odata(wider_query, arrow=True))
     except Exception as e:
+        # The columns already fetched stay usable
         print(f"An error occurred: {e}")
-        return None
+        st.error("Failed to fetch the additional columns from the server.")
+        return
+    if dataframe is not None:
+        st.session_state['odata_query'] = wider_query
+        st.session_state.last_dataframe = dataframe
 
 
 
@@ -116,10 +155,10 @@ with tab1:
                 with st.spinner("Processing query..."):
                     try:
                         
-                        list_response = get_response(query_input)
+                        page_response = get_response(query_input)
                         
-                        if list_response:
-                            dataframe = parse_list_to_dataframe(list_response)
+                        if page_response is not None:
+                            dataframe = parse_pages_to_dataframe(page_response)
                             # if count is not None:
                             #     st.session_state['count'] = count
                             if dataframe is not None and not dataframe.empty:
@@ -158,6 +197,11 @@ with tab1:
             use_container_width=True,
             height=400
         )
+        if projected_fields(st.session_state['odata_query'] or ""):
+            if st.button("Fetch all columns"):
+                with st.spinner("Fetching all columns..."):
+                    widen_dataframe(get_fields())
+                st.rerun()
 
 with tab2:
     st.subheader("AI Insights")
@@ -181,7 +225,7 @@ with tab2:
             if 'last_dataframe' in st.session_state and st.session_state['last_dataframe'] is not None:
                 # Show a spinner while processing
                 with st.spinner("🧠 Asking AI for insights..."):
-                    
+                    widen_dataframe(mentioned_fields(ai_prompt))
                     ai_response = insights_generation(prompt=ai_prompt, df=st.session_state['last_dataframe'], conversation_manager=manager)
                     # Display AI insights with improved layout
                     st.subheader("AI Insights")
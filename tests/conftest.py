@@ -0,0 +1,10 @@
+import os
+
+# AppConfig requires the service settings; the tests never reach the services
+for name, value in {
+    "ENV": "LOCAL", "SAP_PROVIDER_URL": "http://localhost", "SAP_CLIENT_ID": "test", "SAP_CLIENT_SECRET": "test",
+    "SAP_ENDPOINT_URL_GPT4O": "http://localhost", "SAP_EMBEDDING_ENDPOINT_URL": "http://localhost",
+    "ODATA_USERNAME": "test", "ODATA_PASSWORD": "test", "ODATA_ENDPOINT": "http://localhost/odata/ZC_GRN_PO_DET?",
+    "SAP_GPT4O_MODEL": "gpt-4o", "LEEWAY": "0", "ODATA_METADATA_ENABLED": "false",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from experiments.mock_gateway import MockGateway, make_rows, parse_operation, split_multipart
+from src.utils import batch
+from src.utils.batch import BatchTransport, encode_multipart, service_root
+from src.utils.odata_client import get_odata_client
+
+
+ROWS = make_rows(50)
+
+@pytest.fixture
+def run(monkeypatch):
+    # One limiter slot per batch is covered by the rate-limit tests; here only the wire format counts
+    monkeypatch.setattr(batch.config, "ODATA_ADAPTIVE_CONCURRENCY", False)
+    loop = get_odata_client().get_loop()
+    return lambda coro: asyncio.run_coroutine_threadsafe(coro, loop).result(timeout=30)
+
+def exchange(run, gateway: MockGateway, urls: list, format: str = "multipart") -> tuple:
+    """Starts gateway, sends urls (relative to the entity set) through one batch and returns the responses."""
+    async def main():
+        endpoint = await gateway.start()
+        try:
+            transport = BatchTransport(service_root(endpoint), max_size=len(urls), window=1.0, format=format)
+            responses = await asyncio.gather(*(transport.get(endpoint.rsplit("/", 1)[0] + "/" + url) for url in urls))
+            return responses, transport
+        finally:
+            await gateway.stop()
+    return run(main())
+
+def test_multipart_request_encoding():
+    requests = [("ZC_GRN_PO_DET?$top=2&$filter=SUPPLIER%20eq%20'S0001'", {"Prefer": "odata.maxpagesize=2"}), ("ZC_GRN_PO_DET/$count", None)]
+    operations = [parse_operation(part) for part in split_multipart(encode_multipart(requests, "b1"), "b1")]
+    assert [url for url, _ in operations] == [url for url, _ in requests]
+    assert operations[0][1]["Prefer"] == "odata.maxpagesize=2"
+
+@pytest.mark.parametrize("format", ["multipart", "json"])
+def test_round_trip(run, format):
+    urls = ["ZC_GRN_PO_DET?$top=2&$skip=3", "ZC_GRN_PO_DET?$filter=SUPPLIER eq 'S0001'", "ZC_GRN_PO_DET/$count"]
+    gateway = MockGateway(ROWS, latency=0.0)
+    responses, transport = exchange(run, gateway, urls, format)
+    assert [response.status for response in responses] == [200, 200, 200]
+    assert responses[0].json()["value"] == gateway.rows[3:5]
+    assert responses[1].json()["value"] == [row for row in gateway.rows if row["SUPPLIER"] == "S0001"]
+    assert int(responses[2].body if format == "multipart" else responses[2].data) == len(ROWS)
+    assert (gateway.batches, gateway.batched_requests, transport.metrics["batches"]) == (1, 3, 1)
+
+@pytest.mark.parametrize("format", ["multipart", "json"])
+def test_mixed_statuses_reach_their_callers(run, format):
+    # With one request served at a time, the second concurrent operation is throttled
+    gateway = MockGateway(ROWS, latency=0.05, throttle_above=1, batch_parallel=True)
+    urls = ["ZC_GRN_PO_DET?$top=1", "ZC_GRN_PO_DET?$top=1&$skip=1", "NO_SUCH_SET?$top=1"]
+    responses, _ = exchange(run, gateway, urls, format)
+    assert [response.status for response in responses] == [200, 429, 404]
+    assert responses[0].json()["value"] == gateway.rows[:1]
+    assert responses[1].json()["error"]["message"] == "Too many requests"
+    assert "NO_SUCH_SET" in responses[2].json()["error"]["message"]
+
+def test_csrf_token_is_fetched_when_required(run):
+    gateway = MockGateway(ROWS, latency=0.0, csrf=True)
+    responses, transport = exchange(run, gateway, ["ZC_GRN_PO_DET?$top=1", "ZC_GRN_PO_DET?$top=1&$skip=1"])
+    assert [response.status for response in responses] == [200, 200]
+    assert responses[1].json()["value"] == gateway.rows[1:2]
+    assert transport.csrf_token == "mock-csrf-token"
+    # The rejected POST and its retry
+    assert gateway.requests == 2 and gateway.batches == 1
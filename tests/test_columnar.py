@@ -0,0 +1,33 @@
+from decimal import Decimal
+
+import pyarrow as pa
+
+from src.utils.columnar import pages_to_table
+from src.utils.result_cache import rows_to_table
+
+
+COST = {"UNIT_COST": pa.decimal128(15, 2)}
+
+def test_untyped_numbers_widen_across_pages():
+    assert pages_to_table([[{"Total": 1}], [{"Total": 2.5}]]).column("Total").type == pa.float64()
+    assert pages_to_table([[{"Total": 1}], [{"Total": 2}]], {}).column("Total").type == pa.int64()
+
+def test_untyped_mixed_values_become_text():
+    table = pages_to_table([[{"Total": 1}], [{"Total": "n/a"}]], {})
+    assert table.column("Total").to_pylist() == ["1", "n/a"]
+
+def test_decimal_keeps_exact_values():
+    table = pages_to_table([[{"UNIT_COST": 1.24}], [{"UNIT_COST": "3.5"}]], COST)
+    assert table.column("UNIT_COST").type == COST["UNIT_COST"]
+    assert table.column("UNIT_COST").to_pylist() == [Decimal("1.24"), Decimal("3.50")]
+
+def test_decimal_falls_back_to_float_instead_of_rounding():
+    table = pages_to_table([[{"UNIT_COST": 1.24}], [{"UNIT_COST": 1.239}]], COST)
+    assert table.column("UNIT_COST").type == pa.float64()
+    assert table.column("UNIT_COST").to_pylist() == [1.24, 1.239]
+
+def test_record_batches_match_rows():
+    pages = [[{"SUPPLIER": "S1", "UNIT_COST": 1.5}], [{"SUPPLIER": "S2", "UNIT_COST": 2, "MATERIAL": "M1"}]]
+    batches = [batch for page in pages for batch in rows_to_table(page).to_batches()]
+    assert pages_to_table(batches).equals(pages_to_table(pages))
+    assert pages_to_table(batches).column_names == ["SUPPLIER", "UNIT_COST", "MATERIAL"]
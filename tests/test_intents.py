@@ -0,0 +1,39 @@
+import pytest
+
+from src.utils.intents import plan_query
+from src.utils.odata_parser import parse_odata_query
+
+
+QUERY = "$filter=SUPPLIER eq 'ABC'&$count=true"
+
+@pytest.mark.parametrize("text, intent, orderby, top", [
+    ("how many orders are there for supplier ABC", "count", [], 0),
+    ("What is the total number of orders for supplier ABC?", "count", [], 0),
+    ("count the orders of supplier ABC", "count", [], 0),
+    ("are there any orders for supplier ABC", "exists", [], 1),
+    ("top 5 orders for supplier ABC by unit cost", "top", [("UNIT_COST", "desc")], 5),
+    ("latest 10 items of supplier ABC", "top", [("CreateDate", "desc")], 10),
+    ("cheapest 3 open purchase orders from ABC", "top", [("UNIT_COST", "asc")], 3),
+    ("first 1 order of supplier ABC", "top", [], 1),
+])
+def test_fast_paths(text, intent, orderby, top):
+    plan = plan_query(QUERY, text)
+    parsed = parse_odata_query(plan.query)
+    assert (plan.intent, parsed.orderby or [], parsed.top) == (intent, orderby, top)
+
+@pytest.mark.parametrize("text", [
+    "orders of supplier ABC in the last 3 months",
+    "orders from the first 2 weeks of January",
+    "show the top 5 suppliers by number of orders",
+    "top 3 materials with orders from ABC",
+    "latest 2 quarters of purchase orders for ABC",
+    "list orders with the number of line items for supplier ABC",
+    "orders for supplier ABC and how many items each has",
+    "show orders where the count of items is above 10",
+    "orders of supplier ABC",
+])
+def test_no_fast_path(text):
+    plan = plan_query(QUERY, text)
+    parsed = parse_odata_query(plan.query)
+    assert plan.intent == "rows"
+    assert (parsed.top, parsed.count, parsed.orderby or []) == (None, True, [])
@@ -0,0 +1,25 @@
+import pytest
+
+from src.tools.nl_to_odata_tool import Condition, ODataComponents, compile_odata_query
+
+
+@pytest.mark.parametrize("condition, expected", [
+    (Condition(field="UNIT_COST", operator="gt", value="100"), "$filter=UNIT_COST gt 100"),
+    (Condition(field="UNIT_COST", operator="le", value="99.5"), "$filter=UNIT_COST le 99.5"),
+    (Condition(field="SUPPLIER", value="10000012"), "$filter=SUPPLIER eq '10000012'"),
+    (Condition(field="SUP_NAME", value="O'Neil"), "$filter=SUP_NAME eq 'O''Neil'"),
+    (Condition(field="CreateDate", operator="ge", value="20230101"), "$filter=CreateDate ge '20230101'"),
+    (Condition(field="MATERIAL_DESC", operator="contains", value="steel"), "$filter=contains(MATERIAL_DESC,'steel')"),
+])
+def test_literals_follow_the_field_type(condition, expected):
+    assert compile_odata_query(ODataComponents(filter=[condition])) == expected
+
+@pytest.mark.parametrize("condition", [
+    Condition(field="UNIT_COST", operator="gt", value="a lot"),
+    Condition(field="UNIT_COST", operator="contains", value="1"),
+    Condition(field="CreateDate", value="2023-01-01"),
+    Condition(field="PRICE", value="1"),
+])
+def test_invalid_conditions(condition):
+    with pytest.raises(ValueError):
+        compile_odata_query(ODataComponents(filter=[condition]))
@@ -0,0 +1,80 @@
+import pytest
+
+from src.utils.odata_parser import (
+    BoolOp, Call, Compare, Field, GroupByStep, Literal, Not, ODataQueryError,
+    canonicalize_odata_query, format_odata_query, parse_odata_query, validate_odata_query,
+)
+
+
+def test_parse_options():
+    parsed = parse_odata_query("$filter=SUPPLIER eq 'S1'&$select=ORDER_NO,SUPPLIER&$orderby=UNIT_COST desc,ORDER_NO&$top=5&$skip=10&$count=true")
+    assert parsed.filter == Compare("eq", Field("SUPPLIER"), Literal("S1"))
+    assert parsed.select == ["ORDER_NO", "SUPPLIER"]
+    assert parsed.orderby == [("UNIT_COST", "desc"), ("ORDER_NO", "asc")]
+    assert (parsed.top, parsed.skip, parsed.count) == (5, 10, True)
+
+def test_parse_precedence_and_literals():
+    parsed = parse_odata_query("$filter=not SUPPLIER eq 'O''Neil' or UNIT_COST gt 1.5 and contains(MATERIAL_DESC,'steel')")
+    assert parsed.filter == BoolOp("or", [
+        Not(Compare("eq", Field("SUPPLIER"), Literal("O'Neil"))),
+        BoolOp("and", [Compare("gt", Field("UNIT_COST"), Literal(1.5)), Call("contains", [Field("MATERIAL_DESC"), Literal("steel")])]),
+    ])
+
+def test_parse_apply():
+    parsed = parse_odata_query("$apply=filter(SUPPLIER eq 'S1')/groupby((STORE_NAME),aggregate(UNIT_COST with sum as Total))")
+    assert parsed.apply[1] == GroupByStep(["STORE_NAME"], parsed.apply[1].aggregates)
+    assert [(a.field, a.method, a.alias) for a in parsed.apply[1].aggregates] == [("UNIT_COST", "sum", "Total")]
+
+@pytest.mark.parametrize("query", [
+    "$filter=SUPPLIER eq",
+    "$filter=SUPPLIER eq 'S1' and",
+    "$filter=(SUPPLIER eq 'S1'",
+    "$filter=SUPPLIER eq 'S1')",
+    "$filter=frobnicate(SUPPLIER)",
+    "$filter=contains(SUPPLIER)",
+    "$top=five",
+    "$count=maybe",
+])
+def test_parse_errors(query):
+    with pytest.raises(ODataQueryError):
+        parse_odata_query(query)
+
+@pytest.mark.parametrize("query, canonical", [
+    ("$count=true&$filter=SUPPLIER   eq  'S1'", "$filter=SUPPLIER eq 'S1'&$count=true"),
+    ("$top=5&$orderby=UNIT_COST desc&$select=ORDER_NO", "$select=ORDER_NO&$orderby=UNIT_COST desc&$top=5"),
+    ("$filter=(SUPPLIER eq 'S1' or SUPPLIER eq 'S2') and UNIT_COST ge 10",
+     "$filter=(SUPPLIER eq 'S1' or SUPPLIER eq 'S2') and UNIT_COST ge 10"),
+    ("$filter=not (SUPPLIER eq 'S1')", "$filter=not (SUPPLIER eq 'S1')"),
+])
+def test_canonicalize(query, canonical):
+    assert canonicalize_odata_query(query) == canonical
+    assert format_odata_query(parse_odata_query(canonical)) == canonical
+
+@pytest.mark.parametrize("query", [
+    "$filter=CreateDate ge '20230101' and CreateDate le '20231231'",
+    "$filter=UNIT_COST gt 100 and SUPPLIER eq '10000012'",
+    "$filter=SUPPLIER eq null",
+    "$apply=groupby((SUPPLIER),aggregate(UNIT_COST with sum as Total))&$filter=Total gt 10&$orderby=Total desc",
+])
+def test_valid_queries(query):
+    validate_odata_query(query)
+
+@pytest.mark.parametrize("query, message", [
+    ("$filter=PRICE gt 100", "unknown field 'PRICE'"),
+    ("$filter=CreateDate ge '2023-01-01'", "YYYYMMDD"),
+    ("$filter=CreateDate ge 20230101", "YYYYMMDD"),
+    ("$filter=UNIT_COST gt '100'", "UNIT_COST is Edm.Decimal"),
+    ("$filter=SUPPLIER eq 10000012", "SUPPLIER is Edm.String"),
+    ("$filter=contains(UNIT_COST,'1')", "needs a text field"),
+    ("$select=ORDER_NO,PRICE", "unknown field 'PRICE'"),
+    ("$apply=groupby((SUPPLIER),aggregate($count as Total))&$select=STORE_NAME", "unknown field 'STORE_NAME'"),
+])
+def test_invalid_queries(query, message):
+    with pytest.raises(ODataQueryError, match=message):
+        validate_odata_query(query)
+
+def test_types_from_the_caller():
+    types = {"AMOUNT": "Edm.Int32"}
+    validate_odata_query("$filter=AMOUNT gt 5", fields=["AMOUNT"], types=types)
+    with pytest.raises(ODataQueryError, match="whole number"):
+        validate_odata_query("$filter=AMOUNT gt 5.5", fields=["AMOUNT"], types=types)
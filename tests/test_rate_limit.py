@@ -0,0 +1,70 @@
+import random
+
+import pytest
+
+from src.utils import rate_limit
+from src.utils.rate_limit import AdaptiveLimiter, is_page_request
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    return clock
+
+def new_limiter() -> AdaptiveLimiter:
+    return AdaptiveLimiter(initial=5, min_limit=1, max_limit=20, tolerance=1.5, backoff=0.5)
+
+def respond(limiter: AdaptiveLimiter, clock: Clock, latencies, sample: bool = True):
+    # Requests complete limit at a time, so one round trip passes per limit responses
+    for latency in latencies:
+        clock.now += latency / max(int(limiter.limit), 1)
+        limiter.in_flight += 1
+        limiter.release(latency, sample=sample)
+
+def jittered(count: int, median: float, seed: int = 0) -> list:
+    generator = random.Random(seed)
+    return [median * generator.lognormvariate(0, 0.3) for _ in range(count)]
+
+def test_jitter_does_not_collapse_the_limit(clock):
+    limiter = new_limiter()
+    respond(limiter, clock, jittered(2000, 0.1))
+    assert limiter.limit >= 5
+    assert limiter.baseline_latency == pytest.approx(0.1, rel=0.2)
+
+def test_one_fast_response_does_not_pin_the_baseline(clock):
+    limiter = new_limiter()
+    respond(limiter, clock, [0.02])
+    respond(limiter, clock, jittered(300, 0.1))
+    assert limiter.limit >= 5
+    assert limiter.metrics["latency_spikes"] < 30
+
+def test_probes_stay_out_of_the_baseline(clock):
+    limiter = new_limiter()
+    respond(limiter, clock, jittered(50, 0.1))
+    respond(limiter, clock, [0.005] * 50, sample=False)
+    assert limiter.baseline_latency == pytest.approx(0.1, rel=0.2)
+
+def test_sustained_slowdown_lowers_the_limit(clock):
+    limiter = new_limiter()
+    respond(limiter, clock, jittered(200, 0.1))
+    before = limiter.limit
+    respond(limiter, clock, jittered(20, 0.4, seed=1))
+    assert limiter.metrics["decreases"] > 0
+    assert limiter.limit < before
+
+@pytest.mark.parametrize("url, page", [
+    ("http://gw/svc/E?$filter=SUPPLIER eq 'S1'&$skip=1000", True),
+    ("http://gw/svc/E?$filter=SUPPLIER eq 'S1'&$top=0&$count=true", False),
+    ("http://gw/svc/E/$count?$filter=SUPPLIER eq 'S1'", False),
+    ("http://gw/svc/E?$select=ORDER_NO&$top=1", False),
+])
+def test_is_page_request(url, page):
+    assert is_page_request(url) == page
@@ -0,0 +1,23 @@
+import numpy as np
+
+from src.utils.semantic_cache import SemanticCache
+
+
+def make_cache():
+    cache = SemanticCache(capacity=4, threshold=0.9)
+    cache.set("total orders by supplier", np.ones(3), "v1", "$apply=groupby((SUPPLIER),aggregate($count as Total))")
+    return cache
+
+def test_paraphrase_is_reused():
+    assert make_cache().get("total orders per supplier", np.ones(3), "v1") is not None
+
+def test_other_grouping_field_is_not_reused():
+    assert make_cache().get("total orders by plant", np.ones(3), "v1") is None
+
+def test_other_literal_is_not_reused():
+    cache = SemanticCache(capacity=4, threshold=0.9)
+    cache.set("orders in Q1 2023", np.ones(3), "v1", "$filter=CreateDate ge '20230101'")
+    assert cache.get("orders in Q2 2024", np.ones(3), "v1") is None
+
+def test_other_prompt_version_is_not_reused():
+    assert make_cache().get("total orders by supplier", np.ones(3), "v2") is None
@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+from src.api import routes
+from src.utils.budget import BudgetExceeded, RequestBudget
+
+
+@pytest.fixture
+def slow_translation(monkeypatch):
+    async def atranslate_query(query, budget):
+        with budget.stage("agent"):
+            await asyncio.sleep(0.3)
+        budget.llm_calls += 2
+        return "$filter=SUPPLIER eq 'S1'"
+    monkeypatch.setattr(routes, "atranslate_query", atranslate_query)
+
+def budget(timeout):
+    return RequestBudget(timeout, max_llm_calls=5, recursion_limit=10)
+
+def test_starter_timeout_does_not_fail_the_shared_translation(slow_translation):
+    async def main():
+        query = routes.Query(text="orders of supplier S1")
+        impatient, patient = budget(0.1), budget(5)
+        return await asyncio.gather(
+            routes.agenerate_odata_query(query, impatient),
+            routes.agenerate_odata_query(query, patient),
+            return_exceptions=True,
+        ), patient
+    (first, second), patient = asyncio.run(main())
+    assert isinstance(first, BudgetExceeded)
+    assert second == "$filter=SUPPLIER eq 'S1'"
+    assert patient.llm_calls == 2 and patient.timings["agent"] >= 0.3
+
+def test_batch_charges_the_agent_stage_to_every_pending_query(monkeypatch):
+    class Graph:
+        async def abatch(self, inputs, configs, return_exceptions):
+            await asyncio.sleep(0.2)
+            return [{"messages": [routes.AIMessage(content="$top=1")]} for _ in inputs]
+
+    async def alookup_translation(query, budget):
+        return ("$top=2", None) if query.text == "cached" else (None, None)
+
+    monkeypatch.setattr(routes, "get_text2odata_graph", Graph)
+    monkeypatch.setattr(routes, "alookup_translation", alookup_translation)
+    monkeypatch.setattr(routes, "remember_translation", lambda *args: None)
+    queries = [routes.Query(text=text) for text in ("first", "cached", "second")]
+    budgets = [budget(5) for _ in queries]
+    asyncio.run(routes.abatch_generate_odata_queries(queries, budgets))
+    assert [b.timings["agent"] >= 0.2 for b in budgets] == [True, False, True]